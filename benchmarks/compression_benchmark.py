@@ -0,0 +1,72 @@
+"""Benchmark the size and decode throughput of compressed backend images.
+
+Writes synthetic sparse fluorescence planes (dim background with noise and
+a few bright spots) in the uncompressed layout and with each codec of
+:data:`jicbioimage.core.io.PLANE_COMPRESSIONS`.
+
+Usage::
+
+    python benchmarks/compression_benchmark.py [num_planes [size]]
+
+Defaults to 32 planes of 1024 x 1024 uint16 pixels.
+"""
+
+import os
+import sys
+import shutil
+import tempfile
+import time
+
+import numpy as np
+
+from jicbioimage.core.io import PLANE_COMPRESSIONS
+from jicbioimage.core.util import tiff
+
+
+def sparse_plane(random, size):
+    plane = random.poisson(20, (size, size)).astype(np.uint16)
+    for _ in range(30):
+        y, x = random.randint(8, size - 8, 2)
+        radius = random.randint(2, 8)
+        yy, xx = np.ogrid[-y:size - y, -x:size - x]
+        spot = yy * yy + xx * xx <= radius * radius
+        plane[spot] += random.randint(500, 4000)
+    return plane
+
+
+def main(num_planes, size):
+    random = np.random.RandomState(0)
+    planes = [sparse_plane(random, size) for _ in range(num_planes)]
+    raw_bytes = sum(plane.nbytes for plane in planes)
+    layouts = [("uncompressed", dict())]
+    layouts += sorted(PLANE_COMPRESSIONS.items())
+    print("{} planes of {} x {} uint16 ({:.1f} MB)".format(
+        num_planes, size, size, raw_bytes / 1e6))
+    print("  {:<20} {:>10} {:>7} {:>11} {:>11}".format(
+        "layout", "size MB", "ratio", "write MB/s", "read MB/s"))
+    directory = tempfile.mkdtemp()
+    try:
+        for name, options in layouts:
+            fpaths = [os.path.join(directory, "{}_{}.tif".format(name, i))
+                      for i in range(num_planes)]
+            start = time.time()
+            for fpath, plane in zip(fpaths, planes):
+                tiff.write(fpath, plane, **options)
+            write_time = time.time() - start
+            stored = sum(os.path.getsize(fpath) for fpath in fpaths)
+            start = time.time()
+            for fpath in fpaths:
+                tiff.read(fpath)
+            read_time = time.time() - start
+            print("  {:<20} {:>10.1f} {:>7.2f} {:>11.0f} {:>11.0f}".format(
+                name, stored / 1e6, raw_bytes / float(stored),
+                raw_bytes / 1e6 / write_time, raw_bytes / 1e6 / read_time))
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == "__main__":
+    args = [int(a) for a in sys.argv[1:]]
+    num_planes = args[0] if len(args) > 0 else 32
+    size = args[1] if len(args) > 1 else 1024
+    main(num_planes, size)
@@ -0,0 +1,58 @@
+"""Benchmark the hashing strategies used to key backend entries.
+
+Usage::
+
+    python benchmarks/hashing_benchmark.py [size_in_mb ...]
+
+Defaults to 64 MB and 512 MB files.
+"""
+
+import os
+import sys
+import hashlib
+import tempfile
+import time
+
+from jicbioimage.core.io import HASHING_STRATEGIES
+
+
+def md5_64k_reads(fpath):
+    """The md5 strategy as it was before mmap-backed reads."""
+    md5_hash = hashlib.md5()
+    with open(fpath, "rb") as fh:
+        buf = fh.read(65536)
+        while len(buf) > 0:
+            md5_hash.update(buf)
+            buf = fh.read(65536)
+    return md5_hash.hexdigest()
+
+
+def timed(label, func, fpath, size):
+    func(fpath)  # Warm the page cache.
+    start = time.time()
+    func(fpath)
+    elapsed = time.time() - start
+    print("  {:<16} {:8.3f} s {:8.2f} GB/s".format(
+        label, elapsed, size / elapsed / 1e9))
+
+
+def main(sizes):
+    for size_mb in sizes:
+        size = size_mb * 1024 * 1024
+        fd, fpath = tempfile.mkstemp()
+        try:
+            with os.fdopen(fd, "wb") as fh:
+                block = os.urandom(1024 * 1024)
+                for _ in range(size_mb):
+                    fh.write(block)
+            print("{} MB".format(size_mb))
+            timed("md5 (64k reads)", md5_64k_reads, fpath, size)
+            for name in sorted(HASHING_STRATEGIES):
+                timed(name, HASHING_STRATEGIES[name], fpath, size)
+        finally:
+            os.unlink(fpath)
+
+
+if __name__ == "__main__":
+    sizes = [int(a) for a in sys.argv[1:]] or [64, 512]
+    main(sizes)
@@ -0,0 +1,74 @@
+"""Benchmark writing and parsing json and binary manifests.
+
+Usage::
+
+    python benchmarks/manifest_benchmark.py [num_planes ...]
+
+Defaults to 10k, 100k and 1M planes.
+"""
+
+import os
+import sys
+import json
+import shutil
+import tempfile
+import time
+import tracemalloc
+
+from jicbioimage.core.image import MicroscopyCollection
+from jicbioimage.core.io import Manifest, ManifestWriter
+
+
+def entries(num_planes):
+    for i in range(num_planes):
+        s, c, z, t = i // 1000, (i // 100) % 10, (i // 10) % 10, i % 10
+        yield ("S{}_C{}_Z{}_T{}.tif".format(s, c, z, t),
+               dict(md5_hexdigest="d41d8cd98f00b204e9800998ecf8427e",
+                    series=s, channel=c, zslice=z, timepoint=t))
+
+
+def timed(label, func):
+    start = time.time()
+    func()
+    elapsed = time.time() - start
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print("  {:<32} {:8.3f} s {:10.1f} MB peak".format(
+        label, elapsed, peak / 1e6))
+
+
+def write_json(fpath, num_planes):
+    manifest = Manifest()
+    for fname, metadata in entries(num_planes):
+        manifest.add(fname, **metadata)
+    with open(fpath, "w") as fh:
+        fh.write(manifest.json)
+
+
+def write_streaming(fpath, num_planes):
+    with ManifestWriter(fpath) as writer:
+        for fname, metadata in entries(num_planes):
+            writer.add(fname, **metadata)
+
+
+def main(sizes):
+    directory = tempfile.mkdtemp()
+    fpath = os.path.join(directory, "manifest.json")
+    try:
+        for num_planes in sizes:
+            print("{} planes".format(num_planes))
+            timed("Manifest.json", lambda: write_json(fpath, num_planes))
+            timed("json.load", lambda: json.load(open(fpath)))
+            timed("parse_manifest (json)",
+                  lambda: MicroscopyCollection(fpath))
+            timed("ManifestWriter", lambda: write_streaming(fpath, num_planes))
+            timed("parse_manifest (binary)",
+                  lambda: MicroscopyCollection(fpath))
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or [10000, 100000, 1000000])
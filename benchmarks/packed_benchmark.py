@@ -0,0 +1,82 @@
+"""Benchmark reading many small planes from files and from a container.
+
+Writes the planes as one uncompressed TIFF file per plane, as converted by
+bfconvert, and packed into a single container file, as stored by
+:class:`jicbioimage.core.io.PackedBackend`, then times reading every plane
+of a collection. Plane files are read with
+:func:`jicbioimage.core.util.tiff.read`, so that the freeimage plugin is not
+needed.
+
+Usage::
+
+    python benchmarks/packed_benchmark.py [num_planes [size]]
+
+Defaults to 5000 planes of 64 x 64 uint16 pixels.
+"""
+
+import os
+import sys
+import shutil
+import tempfile
+import time
+
+import numpy as np
+
+from jicbioimage.core.image import ImageCollection
+from jicbioimage.core.io import Manifest
+from jicbioimage.core.util import tiff
+from jicbioimage.core.util.packed import PackedWriter
+
+
+def read_files(collection):
+    for proxy_image in collection:
+        tiff.read(proxy_image.fpath)
+
+
+def read_packed(collection):
+    for proxy_image in collection:
+        proxy_image.image
+
+
+def main(num_planes, size):
+    random = np.random.RandomState(0)
+    plane = random.randint(0, 4096, (size, size)).astype(np.uint16)
+    print("{} planes of {} x {} uint16".format(num_planes, size, size))
+    directory = tempfile.mkdtemp()
+    try:
+        files_dir = os.path.join(directory, "files")
+        packed_dir = os.path.join(directory, "packed")
+        os.mkdir(files_dir)
+        os.mkdir(packed_dir)
+        files_manifest = Manifest()
+        packed_manifest = Manifest()
+        with PackedWriter(os.path.join(packed_dir, "planes.bin")) as writer:
+            for i in range(num_planes):
+                fname = "S0_C0_Z{}_T0.tif".format(i)
+                tiff.write(os.path.join(files_dir, fname), plane)
+                files_manifest.add(fname, zslice=i)
+                packed_manifest.add("planes.bin", zslice=i,
+                                    offset=writer.add(plane),
+                                    shape=list(plane.shape),
+                                    dtype=plane.dtype.str)
+        files_manifest.write(os.path.join(files_dir, "manifest.json"))
+        packed_manifest.write(os.path.join(packed_dir, "manifest.json"))
+
+        for name, entry_dir, read in [("files", files_dir, read_files),
+                                      ("packed", packed_dir, read_packed)]:
+            collection = ImageCollection(os.path.join(entry_dir,
+                                                      "manifest.json"))
+            start = time.time()
+            read(collection)
+            elapsed = time.time() - start
+            print("  {:<8} {:>8.3f} s {:>10.0f} planes/s".format(
+                name, elapsed, num_planes / elapsed))
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == "__main__":
+    args = [int(a) for a in sys.argv[1:]]
+    num_planes = args[0] if len(args) > 0 else 5000
+    size = args[1] if len(args) > 1 else 64
+    main(num_planes, size)
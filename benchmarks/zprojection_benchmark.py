@@ -0,0 +1,72 @@
+"""Benchmark streaming z-projections against reducing a materialised stack.
+
+Compares :func:`jicbioimage.core.image.MicroscopyCollection.zprojection`
+with the ``reduce_stack(collection.zstack(...), max)`` idiom. The planes are
+stored as .npy files so that the benchmark does not depend on the image
+decoding plugin.
+
+Usage::
+
+    python benchmarks/zprojection_benchmark.py [size] [depth]
+"""
+
+import os
+import sys
+import shutil
+import tempfile
+import time
+
+import numpy as np
+
+from jicbioimage.core.image import MicroscopyCollection, MicroscopyImage, Image
+from jicbioimage.core.util.array import reduce_stack
+
+
+class NpyImage(MicroscopyImage):
+    """Microscopy image stored as a .npy file."""
+
+    @property
+    def image(self):
+        return Image.from_array(np.load(self.fpath))
+
+
+def build_collection(directory, size, depth):
+    collection = MicroscopyCollection()
+    for z in range(depth):
+        fpath = os.path.join(directory, "S0_C0_Z{}_T0.npy".format(z))
+        np.save(fpath, np.random.randint(0, 4096, (size, size), np.uint16))
+        collection.append(NpyImage(fpath, dict(series=0, channel=0,
+                                               zslice=z, timepoint=0)))
+    return collection
+
+
+def timed(label, func):
+    start = time.time()
+    result = func()
+    print("{:<40} {:8.3f} s".format(label, time.time() - start))
+    return result
+
+
+def main(size=512, depth=32):
+    directory = tempfile.mkdtemp()
+    try:
+        collection = build_collection(directory, size, depth)
+        print("{} z-slices of {}x{} uint16".format(depth, size, size))
+        expected = timed("reduce_stack(zstack(), max)",
+                         lambda: reduce_stack(collection.zstack(), max))
+        for workers in [1, 4]:
+            for reducer in ["max", "mean", "std"]:
+                result = timed(
+                    "zprojection({!r}, workers={})".format(reducer, workers),
+                    lambda: collection.zprojection(reducer=reducer,
+                                                   workers=workers))
+                if reducer == "max":
+                    assert np.array_equal(result, expected)
+        timed("np.max(zstack(), axis=2)",
+              lambda: np.max(collection.zstack(), axis=2))
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:]])
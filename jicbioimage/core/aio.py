@@ -0,0 +1,307 @@
+"""Module for converting microscopy files from asyncio; requires Python 3.5.
+
+The :class:`jicbioimage.core.aio.AsyncBFConvertWrapper` runs bfconvert with
+:func:`asyncio.create_subprocess_exec`, so that an event loop can drive many
+conversions without dedicating a thread to each one.
+"""
+
+import asyncio
+import shutil
+import tempfile
+import time
+import weakref
+from functools import partial
+
+from jicbioimage.core.image import _default_workers
+from jicbioimage.core.io import FileBackend
+
+
+async def _finish(future):
+    """Await a future, letting it finish even if the task is cancelled.
+
+    Used for steps that write into the temporary entry, which must not be
+    removed while they are still running.
+    """
+    try:
+        return await asyncio.shield(future)
+    except asyncio.CancelledError:
+        await future
+        raise
+
+
+class AsyncBFConvertWrapper(object):
+    """Class for unpacking microscopy files using bfconvert from asyncio.
+
+    Uses the commands, manifest creation and backend of a
+    :class:`jicbioimage.core.io.BFConvertWrapper`. Blocking steps, such as
+    hashing the converted images, are run in the default executor of the
+    event loop.
+
+    The time spent in each phase of a conversion is reported by calling
+    :attr:`on_timing` with the input file, the name of the phase and the
+    number of seconds. The phases are "wait", waiting for a converter slot,
+    "convert", "compress", "manifest", "layout", for backends that change
+    the layout of converted entries, and "move".
+    """
+
+    def __init__(self, wrapper, max_concurrent=None, on_timing=None):
+        """Initialise the wrapper.
+
+        :param wrapper: :class:`jicbioimage.core.io.BFConvertWrapper`
+        :param max_concurrent: maximum number of bftools processes running
+                               at any one time; defaults to the number of
+                               CPUs
+        :param on_timing: callable taking the input file, the name of a
+                          phase and its duration in seconds
+        """
+        if max_concurrent is None:
+            max_concurrent = _default_workers()
+        self.wrapper = wrapper
+        self.max_concurrent = max_concurrent
+        self.on_timing = on_timing
+        # asyncio primitives are bound to the event loop they are first
+        # used in, so each loop gets its own.
+        self._semaphores = weakref.WeakKeyDictionary()
+        self._key_locks = weakref.WeakKeyDictionary()
+
+    @property
+    def backend(self):
+        """Backend the files are converted into."""
+        return self.wrapper.backend
+
+    def _timing(self, input_file, phase, start):
+        if self.on_timing is not None:
+            self.on_timing(input_file, phase, time.perf_counter() - start)
+
+    def _key_lock(self, key):
+        """Return the lock serialising the conversion of a backend entry."""
+        key_locks = self._key_locks.setdefault(asyncio.get_event_loop(), {})
+        return key_locks.setdefault(key, asyncio.Lock())
+
+    def _semaphore(self):
+        """Return the semaphore limiting the bftools processes."""
+        loop = asyncio.get_event_loop()
+        semaphore = self._semaphores.get(loop)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(self.max_concurrent)
+            self._semaphores[loop] = semaphore
+        return semaphore
+
+    async def _exec(self, cmd, input_file):
+        """Run a command once a converter slot is free.
+
+        The process is killed if the task is cancelled.
+
+        :param cmd: command as a list
+        :param input_file: path to the microscopy file, used for timings
+        :returns: tuple of return code, stdout and stderr
+        """
+        start = time.perf_counter()
+        async with self._semaphore():
+            self._timing(input_file, "wait", start)
+            proc = await asyncio.create_subprocess_exec(
+                *cmd, stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE)
+            try:
+                stdout, stderr = await proc.communicate()
+            except asyncio.CancelledError:
+                proc.kill()
+                await proc.wait()
+                raise
+        return proc.returncode, stdout, stderr
+
+    async def series_count(self, input_file):
+        """Return the number of series in a microscopy file.
+
+        :param input_file: path to microscopy image
+        :raises: RuntimeError
+        :returns: int
+        """
+        cmd = self.wrapper.series_count_command(input_file)
+        try:
+            returncode, stdout, stderr = await self._exec(cmd, input_file)
+        except OSError as e:
+            msg = 'showinf tool not found in PATH\n{}'.format(e)
+            raise(RuntimeError(msg))
+        return self.wrapper._parse_series_count(input_file, returncode,
+                                                stdout, stderr)
+
+    async def _run(self, cmd, input_file):
+        """Run a bfconvert command.
+
+        The command is run in the converter worker of the wrapper, if it
+        has one, falling back on a new bfconvert process. Worker jobs take
+        a converter slot like bftools processes.
+
+        :param cmd: command as a list
+        :param input_file: path to the microscopy file, used for timings
+        :raises: RuntimeError
+        """
+        result = None
+        if self.wrapper.converter_worker is not None:
+            # A job cannot be taken back from a worker process; let it
+            # finish before the temporary entry is removed.
+            loop = asyncio.get_event_loop()
+            async with self._semaphore():
+                result = await _finish(loop.run_in_executor(
+                    None, self.wrapper._worker_job, cmd))
+        if result is None:
+            try:
+                result = await self._exec(cmd, input_file)
+            except OSError as e:
+                msg = 'bfconvert tool not found in PATH\n{}'.format(e)
+                raise(RuntimeError(msg))
+        returncode, stdout, stderr = result
+        self.wrapper._check_output(stdout, stderr)
+
+    async def _convert(self, input_file, output_dir):
+        """Convert a file, splitting the work over its series.
+
+        See :meth:`jicbioimage.core.io.BFConvertWrapper._convert`. If one
+        of the bfconvert processes fails the others are cancelled.
+
+        :param input_file: path to the microscopy file
+        :param output_dir: directory to write output tiff files to
+        :raises: RuntimeError
+        """
+        num_series = 1
+        if self.wrapper.workers > 1:
+            num_series = await self.series_count(input_file)
+        if num_series == 1:
+            cmds = [self.wrapper.run_command(input_file, output_dir)]
+        else:
+            cmds = [self.wrapper.run_command(input_file, output_dir,
+                                             series=s)
+                    for s in range(num_series)]
+        start = time.perf_counter()
+        tasks = [asyncio.ensure_future(self._run(cmd, input_file))
+                 for cmd in cmds]
+        try:
+            await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+        self._timing(input_file, "convert", start)
+
+    async def __call__(self, input_file, key=None, keep=()):
+        """Run the conversion.
+
+        See :meth:`jicbioimage.core.io.BFConvertWrapper.__call__`. If the
+        task is cancelled the bfconvert processes are killed, jobs running in
+        the converter worker are finished, and the temporary entry is
+        removed.
+
+        :param input_file: path to the microscopy file
+        :param key: key of the backend entry for the file, if already known
+        :param keep: keys of other entries not to remove
+        :raises: RuntimeError
+        :returns: path to manifest file
+        """
+        loop = asyncio.get_event_loop()
+        if key is None:
+            key = await loop.run_in_executor(None, self.wrapper.entry_key,
+                                             input_file)
+
+        lock = self.wrapper.entry_lock(key)
+        if lock is not None:
+            # Poll rather than block, so that waiting can be cancelled.
+            while not lock.acquire(blocking=False):
+                await asyncio.sleep(lock.poll_interval)
+        try:
+            converted = await loop.run_in_executor(
+                None, partial(self.wrapper.already_converted, input_file,
+                              key=key))
+            if not converted:
+                await self._convert_entry(input_file, key)
+            manifest_fpath = await loop.run_in_executor(
+                None, self.wrapper._register, key, input_file)
+        finally:
+            if lock is not None:
+                lock.release()
+        await loop.run_in_executor(None, self.wrapper._collect_garbage, key,
+                                   keep)
+        return manifest_fpath
+
+    async def _convert_entry(self, input_file, key):
+        """Convert a file into a backend entry; the entry lock must be held.
+
+        :param input_file: path to the microscopy file
+        :param key: key of the backend entry for the file
+        :raises: RuntimeError
+        """
+        loop = asyncio.get_event_loop()
+
+        # Create an entry in a temporary directory.
+        tempdir = tempfile.mkdtemp()
+        try:
+            entry = FileBackend.Entry(tempdir, input_file, key=key)
+            await self._convert(input_file, entry.directory)
+
+            start = time.perf_counter()
+            await _finish(loop.run_in_executor(
+                None, self.wrapper._compress_images, entry))
+            self._timing(input_file, "compress", start)
+
+            start = time.perf_counter()
+            await _finish(loop.run_in_executor(
+                None, self.wrapper._write_manifest, entry))
+            self._timing(input_file, "manifest", start)
+
+            if hasattr(self.backend, "finalise_entry"):
+                start = time.perf_counter()
+                await _finish(loop.run_in_executor(
+                    None, self.wrapper._finalise_entry, entry))
+                self._timing(input_file, "layout", start)
+
+            start = time.perf_counter()
+            await _finish(loop.run_in_executor(
+                None, self._move, entry, key))
+            self._timing(input_file, "move", start)
+        finally:
+            shutil.rmtree(tempdir)
+
+    def _move(self, entry, key):
+        """Move a converted entry into the backend."""
+        self.wrapper._remove_incomplete_entry(key)
+        shutil.move(entry.directory, self.backend.directory)
+
+
+async def aload(data_manager, fpath, strict=False):
+    """Load a microscopy file into a data manager.
+
+    Reports the time spent hashing the file, in the "hash" phase, and
+    parsing its manifest, in the "parse" phase, to the ``on_timing``
+    callable of the converter as well as the phases of the conversion.
+
+    :param data_manager: :class:`jicbioimage.core.io.DataManager`
+    :param fpath: path to microscopy file
+    :param strict: hash the file even if the backend has cached its key
+    :returns: :class:`jicbioimage.core.image.ImageCollection`
+    """
+    loop = asyncio.get_event_loop()
+    aconvert = data_manager.aconvert
+
+    start = time.perf_counter()
+    key = await loop.run_in_executor(
+        None, partial(data_manager.convert.entry_key, fpath, strict=strict))
+    aconvert._timing(fpath, "hash", start)
+
+    keep = data_manager._use(key)
+    async with aconvert._key_lock(key):
+        path_to_manifest = await loop.run_in_executor(
+            None, data_manager._converted_manifest, fpath, key)
+        if path_to_manifest is None:
+            path_to_manifest = await loop.run_in_executor(
+                None, data_manager._import, fpath, key, keep)
+        if path_to_manifest is None:
+            path_to_manifest = await aconvert(fpath, key=key, keep=keep)
+
+    start = time.perf_counter()
+    collection = await loop.run_in_executor(
+        None, data_manager._collection, fpath, path_to_manifest)
+    aconvert._timing(fpath, "parse", start)
+
+    data_manager.append(collection)
+    return collection
@@ -1,18 +1,34 @@
 """Module for managing and accessing images."""
 
 import os
+import sys
 import json
 import base64
 import tempfile
 import math
 import re
 import shutil
+import zipfile
+import itertools
+import threading
+import multiprocessing
+from collections import OrderedDict, deque
+from functools import partial
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    wait,
+)
 
 import numpy as np
 import scipy.ndimage
 import skimage.io
 
-from jicbioimage.core.util.array import normalise
+from jicbioimage.core.util.array import normalise, _normalise_key
+from jicbioimage.core.util import tiff
+from jicbioimage.core.util.chunked import ChunkedArray
+from jicbioimage.core.util.packed import PackedFile
 
 
 def _sorted_listdir(directory):
@@ -36,6 +52,307 @@ def _sorted_listdir(directory):
     return _sorted_nicely(fpaths)
 
 
+def _default_workers():
+    """Return the default number of worker threads."""
+    try:
+        return multiprocessing.cpu_count()
+    except NotImplementedError:
+        return 1
+
+
+def _for_each(func, items, workers=None):
+    """Call func on every item, using a pool of threads if workers > 1.
+
+    Exceptions raised by func are re-raised in the calling thread.
+
+    :param func: function taking a single argument
+    :param items: list of arguments
+    :param workers: number of threads; defaults to the number of CPUs
+    """
+    if workers is None:
+        workers = _default_workers()
+    workers = min(workers, len(items))
+    if workers <= 1:
+        for item in items:
+            func(item)
+        return
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for _ in executor.map(func, items):
+            pass
+
+
+_EXECUTORS = dict(thread=ThreadPoolExecutor, process=ProcessPoolExecutor)
+
+
+def _imap(func, items, workers=None, max_in_flight=None, executor="thread",
+          ordered=True):
+    """Yield func(item) for every item, computing ahead in a pool if
+    workers > 1.
+
+    At most max_in_flight results are pending at any time, bounding the
+    memory used by results waiting to be consumed.
+
+    :param func: function taking a single argument; needs to be picklable
+                 when using a process pool
+    :param items: iterable of arguments
+    :param workers: number of threads or processes; with one, each result
+                    is computed in the calling thread when it is needed;
+                    defaults to the number of CPUs
+    :param max_in_flight: maximum number of pending results; defaults to
+                          the number of workers
+    :param executor: "thread" or "process"
+    :param ordered: whether to yield the results in the order of the items,
+                    rather than in the order they are completed
+    """
+    if workers is None:
+        workers = _default_workers()
+    if workers <= 1:
+        return (func(item) for item in items)
+    return _pool_imap(func, items, workers, max_in_flight, executor, ordered)
+
+
+def _pool_imap(func, items, workers, max_in_flight=None, executor="thread",
+               ordered=True):
+    """Yield func(item) for every item, computing ahead in a pool.
+
+    Unlike :func:`_imap` a pool is used even with a single worker, so that
+    results are computed in the background ahead of the one being
+    consumed. See :func:`_imap` for the parameters.
+    """
+    if max_in_flight is None:
+        max_in_flight = workers
+    max_in_flight = max(max_in_flight, 1)
+    pending = deque()
+
+    def take():
+        """Remove and return the next finished futures from pending."""
+        if ordered:
+            return [pending.popleft()]
+        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            pending.remove(future)
+        return done
+
+    with _EXECUTORS[executor](max_workers=workers) as pool:
+        try:
+            for item in items:
+                pending.append(pool.submit(func, item))
+                while len(pending) >= max_in_flight:
+                    for future in take():
+                        yield future.result()
+            while pending:
+                for future in take():
+                    yield future.result()
+        finally:
+            for future in pending:
+                future.cancel()
+
+
+def _apply_to_image(func, proxy_image):
+    """Return func applied to the image of a proxy image.
+
+    Defined at module level so that it can be pickled for process pools.
+    """
+    return func(proxy_image.image)
+
+
+def _allocate(shape, dtype, out=None, mmap_path=None):
+    """Return an array to assemble images into.
+
+    :param shape: shape of the array
+    :param dtype: dtype of the array
+    :param out: caller provided array
+    :param mmap_path: path to a .npy file to memory map
+    :raises: ValueError
+    :returns: :class:`numpy.ndarray` or :class:`numpy.memmap`
+    """
+    shape = tuple(shape)
+    if out is not None and mmap_path is not None:
+        raise(ValueError("Only one of out and mmap_path can be given"))
+    if out is not None:
+        if tuple(out.shape) != shape:
+            msg = "Output array has shape {}; expected {}"
+            raise(ValueError(msg.format(out.shape, shape)))
+        return out
+    if mmap_path is not None:
+        return np.lib.format.open_memmap(mmap_path, mode="w+",
+                                         dtype=dtype, shape=shape)
+    return np.empty(shape, dtype=dtype)
+
+
+def _probe(proxy_images, workers=None):
+    """Return the shape and dtype shared by images, read from their headers.
+
+    Images whose headers cannot be read are skipped; problems reading them
+    are reported when they are decoded.
+
+    :param proxy_images: list of :class:`jicbioimage.core.image.ProxyImage`
+                         instances
+    :param workers: number of probing threads; defaults to the number of
+                    CPUs
+    :raises: ValueError if the images differ in shape or dtype
+    :returns: tuple (shape, :class:`numpy.dtype`), or None if no header
+              could be read
+    """
+    def probe(proxy_image):
+        try:
+            shape, dtype = proxy_image.probe()
+        except (ValueError, IOError, OSError):
+            return None
+        return tuple(shape), np.dtype(dtype)
+    probed = set(_imap(probe, proxy_images, workers))
+    probed.discard(None)
+    shapes = set(shape for shape, _ in probed)
+    if len(shapes) > 1:
+        msg = "Images differ in shape: {}"
+        raise(ValueError(msg.format(sorted(shapes))))
+    dtypes = set(str(dtype) for _, dtype in probed)
+    if len(dtypes) > 1:
+        msg = "Images differ in dtype: {}"
+        raise(ValueError(msg.format(sorted(dtypes))))
+    if len(probed) == 0:
+        return None
+    return probed.pop()
+
+
+def _binary_manifest_fpath(fpath):
+    """Return path of the binary manifest accompanying a json manifest.
+
+    :param fpath: path to the json manifest file
+    :returns: path to the binary manifest file
+    """
+    return os.path.splitext(fpath)[0] + ".npz"
+
+
+def _manifest_column(values):
+    """Return list of manifest values as a numpy array.
+
+    :param values: list of values of one key of the manifest entries
+    :returns: :class:`numpy.ndarray` or None if the values cannot be
+              stored in a column without loss
+    """
+    types = set(type(v) for v in values)
+    if types == set([list]):
+        # Lists of integers of the same length, such as image shapes.
+        lengths = set(len(v) for v in values)
+        items = set(type(i) for v in values for i in v)
+        if len(lengths) != 1 or not items <= set([int]):
+            return None
+        try:
+            return np.array(values, dtype=np.int64).reshape(
+                (len(values), lengths.pop()))
+        except OverflowError:
+            return None
+    if types == set([str]):
+        return np.array(values, dtype=np.str_)
+    if types == set([bool]):
+        return np.array(values, dtype=np.bool_)
+    if types == set([int]):
+        try:
+            return np.array(values, dtype=np.int64)
+        except OverflowError:
+            return None
+    if types == set([float]):
+        return np.array(values, dtype=np.float64)
+    return None
+
+
+def _file_signature(fpath):
+    """Return (size, modification time in nanoseconds) of a file.
+
+    :param fpath: path to file
+    :returns: tuple of ints
+    """
+    stat = os.stat(fpath)
+    mtime_ns = getattr(stat, "st_mtime_ns", None)
+    if mtime_ns is None:
+        mtime_ns = int(stat.st_mtime * 1e9)
+    return stat.st_size, mtime_ns
+
+
+def _manifest_columns(entries):
+    """Return manifest entries as lists of values keyed on manifest key.
+
+    :param entries: list of manifest entry dictionaries
+    :returns: dictionary, or None if the entries do not all have the same
+              keys
+    """
+    if len(entries) == 0:
+        return {}
+    keys = set(entries[0])
+    if any(set(entry) != keys for entry in entries):
+        return None
+    return dict((key, [entry[key] for entry in entries]) for key in keys)
+
+
+def _write_binary_manifest(fpath, columns, length):
+    """Write columns of manifest values to a binary manifest file.
+
+    The binary manifest is an uncompressed .npz file with one array per
+    manifest key. It records the size and modification time of the json
+    manifest it was written alongside, so that a stale binary manifest can
+    be detected.
+
+    :param fpath: path to the json manifest file
+    :param columns: dictionary of lists of values keyed on manifest key
+    :param length: number of entries in the manifest
+    :returns: True if the binary manifest was written
+    """
+    arrays = {}
+    for key, values in columns.items():
+        array = _manifest_column(values)
+        if key.startswith("__") or len(values) != length or array is None:
+            return False
+        arrays[key] = array
+    json_size, json_mtime_ns = _file_signature(fpath)
+    arrays["__length__"] = np.array(length, dtype=np.int64)
+    arrays["__json_size__"] = np.array(json_size, dtype=np.int64)
+    arrays["__json_mtime_ns__"] = np.array(json_mtime_ns, dtype=np.int64)
+    with open(_binary_manifest_fpath(fpath), "wb") as fh:
+        np.savez(fh, **arrays)
+    return True
+
+
+def _read_binary_manifest(fpath):
+    """Return manifest entries from the binary manifest, if it is usable.
+
+    :param fpath: path to the json manifest file
+    :returns: list of dictionaries, or None if there is no binary manifest or
+              if it was not written alongside the current json manifest
+    """
+    binary_fpath = _binary_manifest_fpath(fpath)
+    if not os.path.isfile(binary_fpath):
+        return None
+    try:
+        with np.load(binary_fpath, allow_pickle=False) as npz:
+            signature = (int(npz["__json_size__"]),
+                         int(npz["__json_mtime_ns__"]))
+            if signature != _file_signature(fpath):
+                return None
+            length = int(npz["__length__"])
+            keys = [k for k in npz.files if not k.startswith("__")]
+            columns = [npz[k].tolist() for k in keys]
+    except (IOError, OSError, ValueError, KeyError, zipfile.BadZipfile):
+        return None
+    if length == 0:
+        return []
+    return [dict(zip(keys, values)) for values in zip(*columns)]
+
+
+def _read_manifest(fpath):
+    """Return the entries of a manifest.
+
+    :param fpath: path to the json manifest file
+    :returns: tuple (list of dictionaries, whether the entries were read from
+              the binary manifest)
+    """
+    entries = _read_binary_manifest(fpath)
+    if entries is not None:
+        return entries, True
+    with open(fpath, 'r') as fh:
+        return json.load(fh), False
+
+
 class _TemporaryFilePath(object):
     """Temporary file path context manager."""
     def __init__(self, suffix):
@@ -126,6 +443,14 @@ class History(list):
         self.creation = other.creation
         super(History, self).extend(other)
 
+    def __reduce__(self):
+        # Unpickling a list subclass extends it with the pickled items,
+        # which would not carry a creation event.
+        return (History, (self.creation,), list(self))
+
+    def __setstate__(self, events):
+        super(History, self).extend(events)
+
     class Event(object):
         """An event in the history of an image."""
 
@@ -134,6 +459,17 @@ class History(list):
             self.args = args
             self.kwargs = kwargs
 
+        def __reduce__(self):
+            # Transformations record the function they decorate, which
+            # cannot be pickled by name; pickle the decorated function,
+            # defined at the top level of its module, instead.
+            module = sys.modules.get(self.function.__module__)
+            decorated = getattr(module, self.function.__name__, None)
+            if getattr(decorated, "__wrapped__", None) is self.function:
+                return (_undecorated_event,
+                        (decorated, self.args, self.kwargs))
+            return (History.Event, (self.function, self.args, self.kwargs))
+
         def __repr__(self):
             return str(self)
 
@@ -161,6 +497,11 @@ class History(list):
         return event
 
 
+def _undecorated_event(decorated, args, kwargs):
+    """Return history event of the function wrapped by a decorated one."""
+    return History.Event(decorated.__wrapped__, args, kwargs)
+
+
 class _BaseImageWithHistory(_BaseImage):
     """Private image base class that adds history on creation."""
 
@@ -206,6 +547,17 @@ class _BaseImageWithHistory(_BaseImage):
         self.name = getattr(obj, 'name', None)
         self.history = getattr(obj, 'history', History())
 
+    def __reduce__(self):
+        # Pickle the name and history with the array, so that they survive
+        # the trip to and from a process pool.
+        reconstruct, args, state = super(_BaseImageWithHistory,
+                                         self).__reduce__()
+        return reconstruct, args, (state, self.name, self.history)
+
+    def __setstate__(self, state):
+        state, self.name, self.history = state
+        super(_BaseImageWithHistory, self).__setstate__(state)
+
 
 class Image(_BaseImageWithHistory):
     """Image class."""
@@ -222,7 +574,13 @@ class Image(_BaseImageWithHistory):
         """
         skimage.io.use_plugin('freeimage')
         ar = skimage.io.imread(fpath, plugin="freeimage")
+        return cls._from_file_pixels(ar, fpath, name, log_in_history)
 
+    @classmethod
+    def _from_file_pixels(cls, ar, fpath, name=None, log_in_history=True):
+        """Return :class:`jicbioimage.core.image.Image` of pixels read from a
+        file, logging its creation from the file.
+        """
         # Create a :class:`jicbioimage.core.image.Image` instance.
         image = Image.from_array(ar, name)
 
@@ -300,8 +658,7 @@ class ProxyImage(object):
 
     def __init__(self, fpath, metadata={}):
         self.fpath = fpath
-        for key, value in metadata.items():
-            self.__setattr__(key, value)
+        self.__dict__.update(metadata)
 
     def __repr__(self):
         return "<ProxyImage object at {}>".format(hex(id(self)))
@@ -312,9 +669,27 @@ class ProxyImage(object):
 
     @property
     def image(self):
-        """Underlying :class:`jicbioimage.core.image.Image` instance."""
+        """Underlying :class:`jicbioimage.core.image.Image` instance.
+
+        Images the manifest marks as compressed by the backend are decoded
+        by :func:`jicbioimage.core.util.tiff.read`.
+        """
+        if getattr(self, "compressed", False):
+            return Image._from_file_pixels(tiff.read(self.fpath), self.fpath)
         return Image.from_file(self.fpath)
 
+    def probe(self):
+        """Return the shape and dtype of the image without decoding it.
+
+        Only TIFF file headers can be read.
+
+        :raises: ValueError
+        :returns: tuple (shape, :class:`numpy.dtype`)
+        """
+        if os.path.splitext(self.fpath)[1].lower() not in (".tif", ".tiff"):
+            raise(ValueError("Cannot probe {}".format(self.fpath)))
+        return tiff.read_header(self.fpath)
+
     def _repr_png_(self):
         """Return image as png string.
 
@@ -389,6 +764,91 @@ class MicroscopyImage(ProxyImage):
         return False
 
 
+class ChunkedProxyImage(ProxyImage):
+    """Lightweight image class for a plane of a chunked array.
+
+    The plane is read from a (t, c, z, y, x)
+    :class:`jicbioimage.core.util.chunked.ChunkedArray`, at the position
+    given by the "array_t", "array_c" and "array_z" meta data.
+    """
+
+    def __init__(self, fpath, metadata={}, chunked_array=None):
+        """Initialise a proxy image.
+
+        :param fpath: path to the directory of the chunked array
+        :param metadata: meta data of the plane
+        :param chunked_array: the opened chunked array, so that it can be
+                              shared between the planes of a series
+        """
+        super(ChunkedProxyImage, self).__init__(fpath, metadata)
+        if chunked_array is None:
+            chunked_array = ChunkedArray(fpath)
+        self.chunked_array = chunked_array
+
+    @property
+    def image(self):
+        """Underlying :class:`jicbioimage.core.image.Image` instance."""
+        ar = self.chunked_array[self.array_t, self.array_c, self.array_z]
+        image = Image.from_array(ar)
+        image.history = History()
+        image.history.creation = 'Created Image from {}'.format(self.fpath)
+        return image
+
+    def probe(self):
+        """Return the shape and dtype of the image without decoding it.
+
+        :returns: tuple (shape, :class:`numpy.dtype`)
+        """
+        return self.chunked_array.shape[3:], self.chunked_array.dtype
+
+
+class ChunkedMicroscopyImage(ChunkedProxyImage, MicroscopyImage):
+    """Lightweight image class for a plane of a chunked microscopy series."""
+
+
+class PackedProxyImage(ProxyImage):
+    """Lightweight image class for an image in a container file.
+
+    The image is resolved to the (container, offset, shape, dtype) given by
+    its path and its "offset", "shape" and "dtype" meta data, and read from a
+    memory map of the container; see
+    :class:`jicbioimage.core.util.packed.PackedFile`.
+    """
+
+    def __init__(self, fpath, metadata={}, packed_file=None):
+        """Initialise a proxy image.
+
+        :param fpath: path to the container file
+        :param metadata: meta data of the image
+        :param packed_file: the container, so that it can be shared between
+                            the images stored in it
+        """
+        super(PackedProxyImage, self).__init__(fpath, metadata)
+        if packed_file is None:
+            packed_file = PackedFile(fpath)
+        self.packed_file = packed_file
+
+    @property
+    def image(self):
+        """Underlying :class:`jicbioimage.core.image.Image` instance."""
+        ar = self.packed_file.read(self.offset, self.shape, self.dtype)
+        image = Image.from_array(ar)
+        image.history = History()
+        image.history.creation = 'Created Image from {}'.format(self.fpath)
+        return image
+
+    def probe(self):
+        """Return the shape and dtype of the image without decoding it.
+
+        :returns: tuple (shape, :class:`numpy.dtype`)
+        """
+        return tuple(self.shape), np.dtype(self.dtype)
+
+
+class PackedMicroscopyImage(PackedProxyImage, MicroscopyImage):
+    """Lightweight image class for a microscopy image in a container file."""
+
+
 class ImageCollection(list):
     """Class for storing related images."""
 
@@ -412,32 +872,187 @@ class ImageCollection(list):
         """
         return self.proxy_image(index=index).image
 
+    def map(self, func, workers=None, executor="thread", ordered=True,
+            max_in_flight=None):
+        """Yield the result of applying a function to every image.
+
+        The images are decoded, and the function applied, in a pool of
+        threads or processes, overlapping decoding and computation. Results
+        are yielded as they become available. At most max_in_flight results
+        are pending at any time, which bounds the memory used when the
+        results are consumed more slowly than they are produced.
+
+        When using a process pool the function needs to be picklable, i.e.
+        defined at the top level of a module; functions decorated with
+        :func:`jicbioimage.core.transform.transformation` qualify.
+
+        :param func: function taking a :class:`jicbioimage.core.image.Image`
+                     as its only argument
+        :param workers: number of threads or processes, or 1 to apply the
+                        function in the calling thread; defaults to the
+                        number of CPUs
+        :param executor: "thread" or "process"
+        :param ordered: whether to yield the results in the order of the
+                        collection, rather than in order of completion
+        :param max_in_flight: maximum number of pending results; defaults
+                              to twice the number of workers
+        :raises: ValueError
+        :returns: iterator of results
+        """
+        if executor not in _EXECUTORS:
+            msg = "Unknown executor {}; choose from {}"
+            raise(ValueError(msg.format(executor, sorted(_EXECUTORS))))
+        if workers is None:
+            workers = _default_workers()
+        if max_in_flight is None:
+            max_in_flight = 2 * workers
+        return _imap(partial(_apply_to_image, func), list(self),
+                     workers=workers, max_in_flight=max_in_flight,
+                     executor=executor, ordered=ordered)
+
+    def to_batch(self, indices=None, out=None, workers=None,
+                 shared_memory=False):
+        """Return images as a single contiguous (n, y, x) array.
+
+        Before anything is decoded the file headers are probed, see
+        :func:`jicbioimage.core.image.ProxyImage.probe`, to check that all
+        the images have the same shape and dtype and to allocate the batch.
+        The images are then decoded in parallel straight into their slot in
+        the batch. Images are never cast to the dtype of the batch.
+
+        With shared_memory=True the batch is allocated in a
+        :class:`multiprocessing.shared_memory.SharedMemory` block, which can
+        be attached to by name from other processes. The caller is
+        responsible for calling ``close()`` and ``unlink()`` on the block.
+        Shared memory needs Python 3.8 or later.
+
+        :param indices: list of indices of the images to include; defaults
+                        to all images
+        :param out: array of shape (n, y, x) to write the batch into
+        :param workers: number of decoding threads; defaults to the number
+                        of CPUs
+        :param shared_memory: whether to allocate the batch in shared memory
+        :raises: ValueError
+        :returns: :class:`numpy.ndarray`, or a tuple of the
+                  :class:`numpy.ndarray` and its
+                  :class:`multiprocessing.shared_memory.SharedMemory` block
+                  if shared_memory is True
+        """
+        if indices is None:
+            indices = range(len(self))
+        proxy_images = [self[i] for i in indices]
+        if len(proxy_images) == 0:
+            raise(ValueError("No images to batch"))
+        if out is not None and shared_memory:
+            raise(ValueError("Only one of out and shared_memory can be given"))
+        if shared_memory:
+            try:
+                from multiprocessing.shared_memory import SharedMemory
+            except ImportError:
+                raise(ValueError("Shared memory needs Python 3.8 or later"))
+
+        first = None
+        plane = _probe(proxy_images, workers)
+        if plane is None:
+            # No header could be read; decode the first image instead.
+            first = proxy_images[0].image
+            plane = first.shape, first.dtype
+        plane_shape, dtype = plane
+        shape = (len(proxy_images),) + plane_shape
+        shm = None
+        if shared_memory:
+            nbytes = int(np.prod(shape)) * dtype.itemsize
+            shm = SharedMemory(create=True, size=max(nbytes, 1))
+            out = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+        try:
+            batch = _allocate(shape, dtype, out)
+
+            def put(i, image):
+                if image.shape != plane_shape:
+                    msg = "Image {} has shape {}; expected {}"
+                    raise(ValueError(msg.format(proxy_images[i].fpath,
+                                                image.shape, plane_shape)))
+                if image.dtype != dtype:
+                    msg = "Image {} has dtype {}; expected {}"
+                    raise(ValueError(msg.format(proxy_images[i].fpath,
+                                                image.dtype, dtype)))
+                batch[i] = image
+
+            positions = range(len(proxy_images))
+            if first is not None:
+                put(0, first)
+                del first
+                positions = positions[1:]
+            _for_each(lambda i: put(i, proxy_images[i].image), positions,
+                      workers)
+        except Exception:
+            if shm is not None:
+                out = batch = None
+                shm.close()
+                shm.unlink()
+            raise
+        if shm is not None:
+            return batch, shm
+        return batch
+
     def parse_manifest(self, fpath):
         """Parse manifest file to build up the collection of images.
 
+        If an up to date binary manifest, see
+        :class:`jicbioimage.core.io.ManifestWriter`, exists alongside the
+        json manifest it is used in preference.
+
+        :param fpath: path to the manifest file
+        :raises: RuntimeError
+        """
+        entries, _ = _read_manifest(fpath)
+        self._add_manifest_entries(fpath, entries)
+
+    def _add_manifest_entries(self, fpath, entries):
+        """Add proxy images for the entries of a manifest to the collection.
+
         :param fpath: path to the manifest file
+        :param entries: list of manifest entry dictionaries; the "filename"
+                        key is removed from each entry
         :raises: RuntimeError
         """
         directory = os.path.dirname(fpath)
-        with open(fpath, 'r') as fh:
-            for entry in json.load(fh):
-
-                # Every entry of a manifest file needs to have a "filename"
-                # attribute. It is the only requirement so we check for it in a
-                # strict fashion.
-                if "filename" not in entry:
-                    raise(RuntimeError(
-                        'Entries in {} need to have "filename"'.format(fpath)))
-
-                filename = entry.pop("filename")
-                fpath = os.path.join(directory, os.path.basename(filename))
-
-                proxy_image = None
-                if isinstance(self, MicroscopyCollection):
-                    proxy_image = MicroscopyImage(fpath, entry)
-                else:
-                    proxy_image = ProxyImage(fpath, entry)
-                self.append(proxy_image)
+        proxy_class = ProxyImage
+        chunked_class = ChunkedProxyImage
+        packed_class = PackedProxyImage
+        if isinstance(self, MicroscopyCollection):
+            proxy_class = MicroscopyImage
+            chunked_class = ChunkedMicroscopyImage
+            packed_class = PackedMicroscopyImage
+        chunked_arrays = {}
+        packed_files = {}
+        for entry in entries:
+
+            # Every entry of a manifest file needs to have a "filename"
+            # attribute. It is the only requirement so we check for it in a
+            # strict fashion.
+            if "filename" not in entry:
+                raise(RuntimeError(
+                    'Entries in {} need to have "filename"'.format(fpath)))
+
+            filename = entry.pop("filename")
+            image_fpath = os.path.join(directory, os.path.basename(filename))
+
+            # Entries of chunked arrays point at a plane of the array.
+            if "array_t" in entry:
+                if image_fpath not in chunked_arrays:
+                    chunked_arrays[image_fpath] = ChunkedArray(image_fpath)
+                self.append(chunked_class(image_fpath, entry,
+                                          chunked_arrays[image_fpath]))
+
+            # Entries of container files point at the pixels of an image.
+            elif "offset" in entry:
+                if image_fpath not in packed_files:
+                    packed_files[image_fpath] = PackedFile(image_fpath)
+                self.append(packed_class(image_fpath, entry,
+                                         packed_files[image_fpath]))
+            else:
+                self.append(proxy_class(image_fpath, entry))
 
     def _repr_html_(self):
         """Return image collection as html.
@@ -464,15 +1079,484 @@ class ImageCollection(list):
         return '\n'.join(lines)
 
 
+def _invalidates_index(name):
+    """Return list method that discards the cached index before mutating.
+
+    :param name: name of the :class:`list` method to wrap
+    :returns: method
+    """
+    list_method = getattr(list, name)
+
+    def method(self, *args, **kwargs):
+        self._index = None
+        return list_method(self, *args, **kwargs)
+    method.__name__ = name
+    method.__doc__ = list_method.__doc__
+    return method
+
+
+def _select_identifiers(selector, identifiers):
+    """Return the identifiers picked out by a selector.
+
+    :param selector: None (all), identifier, iterable of identifiers or
+                     :class:`slice` over identifier values
+    :param identifiers: sorted list of available identifiers
+    :raises: ValueError
+    :returns: sorted list of identifiers
+    """
+    if selector is None:
+        return identifiers
+    if isinstance(selector, slice):
+        start, stop, step = selector.start, selector.stop, selector.step
+        if step is None:
+            step = 1
+        if step < 1:
+            raise(ValueError("Slice step must be a positive integer"))
+        offset = start if start is not None else 0
+        return [i for i in identifiers
+                if (start is None or i >= start)
+                and (stop is None or i < stop)
+                and (i - offset) % step == 0]
+    if not hasattr(selector, "__iter__") or isinstance(selector, str):
+        selector = [selector]
+    wanted = set(selector)
+    return [i for i in identifiers if i in wanted]
+
+
+class _MicroscopyIndex(object):
+    """Lookup tables of a MicroscopyCollection.
+
+    Built in a single pass over the collection. Stores the proxy images keyed
+    on (series, channel, zslice, timepoint) and a summary of the channels,
+    z-slices and time points present in each series.
+    """
+
+    def __init__(self, proxy_images):
+        self.planes = {}
+        summaries = {}
+        for proxy_image in proxy_images:
+            s = proxy_image.series
+            key = (s,
+                   proxy_image.channel,
+                   proxy_image.zslice,
+                   proxy_image.timepoint)
+
+            # Keep the first match, as the linear search used to.
+            self.planes.setdefault(key, proxy_image)
+
+            if s not in summaries:
+                summaries[s] = (set(), set(), set())
+            channels, zslices, timepoints = summaries[s]
+            channels.add(key[1])
+            zslices.add(key[2])
+            timepoints.add(key[3])
+
+        self.series = sorted(summaries)
+        self.summaries = dict(
+            (s, tuple(sorted(ids) for ids in summary))
+            for s, summary in summaries.items())
+
+    def summary(self, s):
+        """Return (channels, zslices, timepoints) sorted lists for series s."""
+        return self.summaries.get(s, ([], [], []))
+
+
+class _Projection(object):
+    """Running accumulator for projecting a stack of planes."""
+
+    def __init__(self):
+        self.count = 0
+        self.acc = None
+
+    def update(self, plane):
+        """Add a plane to the projection."""
+        if self.acc is None:
+            self.first(plane)
+        else:
+            self.add(plane)
+        self.count += 1
+
+    def first(self, plane):
+        self.acc = plane.copy()
+
+    def result(self):
+        """Return the projection."""
+        return self.acc
+
+
+class _MaxProjection(_Projection):
+    def add(self, plane):
+        np.maximum(self.acc, plane, out=self.acc)
+
+
+class _MinProjection(_Projection):
+    def add(self, plane):
+        np.minimum(self.acc, plane, out=self.acc)
+
+
+class _SumProjection(_Projection):
+    def first(self, plane):
+        dtype = np.add.reduce(np.zeros(1, dtype=plane.dtype)).dtype
+        self.acc = plane.astype(dtype)
+
+    def add(self, plane):
+        np.add(self.acc, plane, out=self.acc, casting="unsafe")
+
+
+class _MeanProjection(_SumProjection):
+    def first(self, plane):
+        self.acc = plane.astype(np.float64)
+
+    def result(self):
+        return self.acc / self.count
+
+
+class _StdProjection(_Projection):
+    """Population standard deviation using Welford's algorithm."""
+
+    def first(self, plane):
+        self.acc = plane.astype(np.float64)
+        self.m2 = np.zeros(plane.shape, dtype=np.float64)
+
+    def add(self, plane):
+        delta = plane - self.acc
+        self.acc += delta / (self.count + 1)
+        delta *= plane - self.acc
+        self.m2 += delta
+
+    def result(self):
+        return np.sqrt(self.m2 / self.count)
+
+
+class _ArgmaxProjection(_Projection):
+    """Position in the stack of the first maximum value."""
+
+    def first(self, plane):
+        self.acc = plane.copy()
+        self.argmax = np.zeros(plane.shape, dtype=np.intp)
+
+    def add(self, plane):
+        greater = plane > self.acc
+        self.argmax[greater] = self.count
+        np.maximum(self.acc, plane, out=self.acc)
+
+    def result(self):
+        return self.argmax
+
+
+_PROJECTIONS = dict(max=_MaxProjection,
+                    min=_MinProjection,
+                    sum=_SumProjection,
+                    mean=_MeanProjection,
+                    std=_StdProjection,
+                    argmax=_ArgmaxProjection)
+
+
+def _normalise_axis(axis, ndim):
+    """Return sorted tuple of non-negative axes."""
+    if axis is None:
+        return tuple(range(ndim))
+    if not isinstance(axis, tuple):
+        axis = (axis,)
+    return tuple(sorted(set(a % ndim for a in axis)))
+
+
+def _series_chunked_array(axes, planes):
+    """Return the chunked array storing all the planes of a series, or None.
+
+    :param axes: tuple of (timepoints, channels, zslices) identifiers
+    :param planes: list of ((t, c, z) position, proxy image or None) tuples
+    :returns: :class:`jicbioimage.core.util.chunked.ChunkedArray` or None
+    """
+    chunked_array = None
+    for pos, proxy_image in planes:
+        if not isinstance(proxy_image, ChunkedProxyImage):
+            return None
+        if chunked_array is None:
+            chunked_array = proxy_image.chunked_array
+        if proxy_image.chunked_array is not chunked_array:
+            return None
+        if (proxy_image.array_t, proxy_image.array_c,
+                proxy_image.array_z) != pos:
+            return None
+    if chunked_array.shape[:3] != tuple(len(ids) for ids in axes):
+        return None
+    return chunked_array
+
+
+class LazyArray(object):
+    """Read only (t, c, z, y, x) array view of a series in a collection.
+
+    Planes are only decoded when a slice touches them. Decoded planes are kept
+    in a least recently used cache. Reductions such as :func:`max` stream
+    through the series plane by plane rather than materialising it.
+
+    If the series is stored as a single chunked array, see
+    :class:`jicbioimage.core.io.ChunkedBackend`, slices are read straight
+    from the chunks they overlap rather than from whole planes.
+
+    Use :func:`numpy.asarray` to materialise the whole array.
+    """
+
+    def __init__(self, collection, s=0, cache_size=16, workers=None):
+        """Initialise a lazy array.
+
+        Decodes a single plane to determine the plane shape and dtype.
+
+        :param collection: :class:`jicbioimage.core.image.MicroscopyCollection`
+        :param s: series
+        :param cache_size: maximum number of decoded planes to keep in memory
+        :param workers: number of decoding threads used when a slice touches
+                        several planes; defaults to the number of CPUs
+        """
+        axes, planes = collection._hyperstack_planes(s, None, None, None)
+        self.timepoints, self.channels, self.zslices = axes
+        self._proxy_images = dict(planes)
+        self._cache = OrderedDict()
+        self._cache_size = cache_size
+        self._lock = threading.Lock()
+        self._workers = workers
+
+        self._chunked_array = _series_chunked_array(axes, planes)
+        if self._chunked_array is not None:
+            self.shape = self._chunked_array.shape
+            self.dtype = self._chunked_array.dtype
+            return
+
+        pos, proxy_image = [(pos, p) for pos, p in planes if p is not None][0]
+        first = self._cache_put(pos, proxy_image.image)
+        self.shape = tuple(len(ids) for ids in axes) + first.shape
+        self.dtype = first.dtype
+
+    def __repr__(self):
+        return "<LazyArray shape={} dtype={} object at {}>".format(
+            self.shape, self.dtype, hex(id(self)))
+
+    def __len__(self):
+        return self.shape[0]
+
+    @property
+    def ndim(self):
+        """Number of dimensions."""
+        return len(self.shape)
+
+    @property
+    def size(self):
+        """Number of elements."""
+        return int(np.prod(self.shape))
+
+    @property
+    def nbytes(self):
+        """Number of bytes of the materialised array."""
+        return self.size * self.dtype.itemsize
+
+    def _cache_put(self, pos, image):
+        array = np.asarray(image)
+        with self._lock:
+            self._cache[pos] = array
+            while len(self._cache) > self._cache_size:
+                self._cache.popitem(last=False)
+        return array
+
+    def plane(self, pos):
+        """Return the plane at a (t, c, z) position as a numpy array.
+
+        Planes missing from the collection are returned as zeros.
+
+        :param pos: tuple of (t, c, z) positional indices
+        :returns: :class:`numpy.ndarray`
+        """
+        with self._lock:
+            if pos in self._cache:
+                array = self._cache.pop(pos)
+                self._cache[pos] = array
+                return array
+        proxy_image = self._proxy_images[pos]
+        if proxy_image is None:
+            return np.zeros(self.shape[3:], dtype=self.dtype)
+        return self._cache_put(pos, proxy_image.image)
+
+    def __getitem__(self, key):
+        if self._chunked_array is not None:
+            return self._chunked_array[key]
+        key = _normalise_key(key, self.shape)
+        ranges = []
+        for k, n in zip(key[:3], self.shape[:3]):
+            if isinstance(k, slice):
+                ranges.append(range(*k.indices(n)))
+            else:
+                ranges.append(range(k, k + 1))
+        positions = list(itertools.product(*ranges))
+
+        plane_key = key[3:]
+        sample = np.broadcast_to(0, self.shape[3:])[plane_key]
+        result = np.empty(tuple(len(r) for r in ranges) + sample.shape,
+                          dtype=self.dtype)
+        lookup = dict((pos, i) for i, pos in enumerate(positions))
+        flat = result.reshape((len(positions),) + sample.shape)
+
+        def put(pos):
+            flat[lookup[pos]] = self.plane(pos)[plane_key]
+
+        _for_each(put, positions, self._workers)
+
+        # Drop the dimensions indexed by integers.
+        squeeze = tuple(i for i, k in enumerate(key[:3])
+                        if not isinstance(k, slice))
+        if squeeze:
+            result = result.squeeze(axis=squeeze)
+        return result
+
+    def __array__(self, dtype=None, copy=None):
+        array = self[...]
+        if dtype is not None:
+            array = array.astype(dtype, copy=False)
+        return array
+
+    def _reduce(self, ufunc, axis=None, keepdims=False, dtype=None):
+        """Return reduction of the array streamed plane by plane.
+
+        :param ufunc: binary :class:`numpy.ufunc`, e.g. :func:`numpy.maximum`
+        :param axis: axis or tuple of axes to reduce over
+        :param keepdims: whether to keep the reduced axes with size one
+        :param dtype: accumulator dtype
+        :returns: :class:`numpy.ndarray`
+        """
+        axes = _normalise_axis(axis, self.ndim)
+        plane_axes = tuple(a - 3 for a in axes if a >= 3)
+        kept = [a for a in range(3) if a not in axes]
+        acc = None
+        seen = set()
+        for pos in itertools.product(*[range(n) for n in self.shape[:3]]):
+            reduced = self.plane(pos)
+            if plane_axes:
+                reduced = ufunc.reduce(reduced, axis=plane_axes, dtype=dtype)
+            if acc is None:
+                shape = tuple(self.shape[a] for a in kept) + reduced.shape
+                acc = np.empty(shape, dtype=dtype or reduced.dtype)
+            out_pos = tuple(pos[a] for a in kept)
+            if out_pos in seen:
+                acc[out_pos] = ufunc(acc[out_pos], reduced)
+            else:
+                acc[out_pos] = reduced
+                seen.add(out_pos)
+        if keepdims:
+            acc = acc.reshape(tuple(1 if a in axes else n
+                                    for a, n in enumerate(self.shape)))
+        if acc.ndim == 0:
+            return acc[()]
+        return acc
+
+    def max(self, axis=None, keepdims=False):
+        """Return maximum along the given axes.
+
+        :param axis: axis or tuple of axes to reduce over
+        :param keepdims: whether to keep the reduced axes with size one
+        :returns: :class:`numpy.ndarray`
+        """
+        return self._reduce(np.maximum, axis, keepdims)
+
+    def min(self, axis=None, keepdims=False):
+        """Return minimum along the given axes.
+
+        :param axis: axis or tuple of axes to reduce over
+        :param keepdims: whether to keep the reduced axes with size one
+        :returns: :class:`numpy.ndarray`
+        """
+        return self._reduce(np.minimum, axis, keepdims)
+
+    def sum(self, axis=None, keepdims=False):
+        """Return sum along the given axes.
+
+        :param axis: axis or tuple of axes to reduce over
+        :param keepdims: whether to keep the reduced axes with size one
+        :returns: :class:`numpy.ndarray`
+        """
+        dtype = np.add.reduce(np.zeros(1, dtype=self.dtype)).dtype
+        return self._reduce(np.add, axis, keepdims, dtype=dtype)
+
+    def mean(self, axis=None, keepdims=False):
+        """Return mean along the given axes.
+
+        :param axis: axis or tuple of axes to reduce over
+        :param keepdims: whether to keep the reduced axes with size one
+        :returns: :class:`numpy.ndarray`
+        """
+        axes = _normalise_axis(axis, self.ndim)
+        count = int(np.prod([self.shape[a] for a in axes]))
+        total = self._reduce(np.add, axis, keepdims, dtype=np.float64)
+        return total / count
+
+    def __array_function__(self, func, types, args, kwargs):
+        method = _LAZY_ARRAY_FUNCTIONS.get(func)
+        if (method is not None
+                and len(args) > 0 and args[0] is self
+                and set(kwargs).issubset(["axis", "keepdims"])):
+            return getattr(self, method)(*args[1:], **kwargs)
+
+        # Fall back on materialising any lazy arrays in the arguments.
+        def materialise(value):
+            if isinstance(value, LazyArray):
+                return np.asarray(value)
+            if isinstance(value, (list, tuple)):
+                return type(value)(materialise(v) for v in value)
+            return value
+        args = materialise(args)
+        kwargs = dict((k, materialise(v)) for k, v in kwargs.items())
+        return func(*args, **kwargs)
+
+
+_LAZY_ARRAY_FUNCTIONS = {}
+for _name, _method in [("max", "max"), ("amax", "max"),
+                       ("min", "min"), ("amin", "min"),
+                       ("sum", "sum"), ("mean", "mean")]:
+    if hasattr(np, _name):
+        _LAZY_ARRAY_FUNCTIONS[getattr(np, _name)] = _method
+
+
 class MicroscopyCollection(ImageCollection):
     """
     Collection of :class:`jicbioimage.core.image.MicroscopyImage` instances.
+
+    The dimensions of the collection and the lookup of individual proxy images
+    are answered from an index that is built on first use and discarded
+    whenever the collection is modified through the :class:`list` interface.
+    Modifying the metadata of a proxy image already in the collection is not
+    tracked.
     """
 
+    def __init__(self, fpath=None):
+        self._index = None
+        super(MicroscopyCollection, self).__init__(fpath)
+
+    append = _invalidates_index("append")
+    extend = _invalidates_index("extend")
+    insert = _invalidates_index("insert")
+    remove = _invalidates_index("remove")
+    pop = _invalidates_index("pop")
+    sort = _invalidates_index("sort")
+    reverse = _invalidates_index("reverse")
+    __setitem__ = _invalidates_index("__setitem__")
+    __delitem__ = _invalidates_index("__delitem__")
+    __iadd__ = _invalidates_index("__iadd__")
+    __imul__ = _invalidates_index("__imul__")
+    if hasattr(list, "clear"):
+        clear = _invalidates_index("clear")
+    if hasattr(list, "__setslice__"):
+        __setslice__ = _invalidates_index("__setslice__")
+        __delslice__ = _invalidates_index("__delslice__")
+
+    @property
+    def _plane_index(self):
+        """Return the (cached) lookup index of the collection."""
+        if self._index is None:
+            self._index = _MicroscopyIndex(self)
+        return self._index
+
     @property
     def series(self):
         """Return list of series in the collection."""
-        return sorted(list(set([mi.series for mi in self])))
+        return list(self._plane_index.series)
 
     def channels(self, s=0):
         """Return list of channels in the collection.
@@ -480,7 +1564,7 @@ class MicroscopyCollection(ImageCollection):
         :param s: series
         :returns: list of channel identifiers
         """
-        return sorted(list(set([mi.channel for mi in self if mi.series == s])))
+        return list(self._plane_index.summary(s)[0])
 
     def zslices(self, s=0):
         """Return list of z-slices in the collection.
@@ -488,7 +1572,7 @@ class MicroscopyCollection(ImageCollection):
         :param s: series
         :returns: list of zslice identifiers
         """
-        return sorted(list(set([mi.zslice for mi in self if mi.series == s])))
+        return list(self._plane_index.summary(s)[1])
 
     def timepoints(self, s=0):
         """Return list of time points in the collection.
@@ -496,8 +1580,53 @@ class MicroscopyCollection(ImageCollection):
         :param s: series
         :returns: list of time point identifiers
         """
-        return sorted(list(set([mi.timepoint for mi in self
-                                if mi.series == s])))
+        return list(self._plane_index.summary(s)[2])
+
+    def dims(self, s=0):
+        """Return all the dimensions of the collection at once.
+
+        :param s: series
+        :returns: dictionary with the keys "series", "channels", "zslices"
+                  and "timepoints"
+        """
+        index = self._plane_index
+        channels, zslices, timepoints = index.summary(s)
+        return dict(series=list(index.series),
+                    channels=list(channels),
+                    zslices=list(zslices),
+                    timepoints=list(timepoints))
+
+    def select(self, s=None, c=None, z=None, t=None):
+        """Return a sub-collection of the images matching the selection.
+
+        Each argument can be None (everything), a single identifier, a list of
+        identifiers or a :class:`slice` over the identifier values, e.g.
+        ``select(c=1, t=slice(10, 51))``.
+
+        The returned collection shares its
+        :class:`jicbioimage.core.image.MicroscopyImage` instances with this
+        collection; no proxy images are copied.
+
+        :param s: series selector
+        :param c: channel selector
+        :param z: zslice selector
+        :param t: timepoint selector
+        :returns: :class:`jicbioimage.core.image.MicroscopyCollection`
+        """
+        index = self._plane_index
+        selection = MicroscopyCollection()
+        for series in _select_identifiers(s, index.series):
+            channels, zslices, timepoints = index.summary(series)
+            zslices = _select_identifiers(z, zslices)
+            timepoints = _select_identifiers(t, timepoints)
+            for channel in _select_identifiers(c, channels):
+                for zslice in zslices:
+                    for timepoint in timepoints:
+                        key = (series, channel, zslice, timepoint)
+                        proxy_image = index.planes.get(key)
+                        if proxy_image is not None:
+                            selection.append(proxy_image)
+        return selection
 
     def proxy_image(self, s=0, c=0, z=0, t=0):
         """Return a :class:`jicbioimage.core.image.MicroscopyImage` instance.
@@ -508,44 +1637,328 @@ class MicroscopyCollection(ImageCollection):
         :param t: timepoint
         :returns: :class:`jicbioimage.core.image.MicroscopyImage`
         """
-        for proxy_image in self:
-            if proxy_image.is_me(s=s, c=c, z=z, t=t):
-                return proxy_image
+        return self._plane_index.planes.get((s, c, z, t))
 
     def zstack_proxy_iterator(self, s=0, c=0, t=0):
         """
         Return zstack :class:`jicbioimage.core.image.ProxyImage` iterator.
 
+        The proxy images are yielded in order of increasing z-slice.
+
         :param s: series
         :param c: channel
         :param t: timepoint
         :returns: zstack as a :class:`jicbioimage.core.image.ProxyImage`
                   iterator
         """
-        for proxy_image in self:
-            if proxy_image.in_zstack(s=s, c=c, t=t):
+        index = self._plane_index
+        for z in index.summary(s)[1]:
+            proxy_image = index.planes.get((s, c, z, t))
+            if proxy_image is not None:
                 yield proxy_image
 
-    def zstack_array(self, s=0, c=0, t=0):
+    def zstack_array(self, s=0, c=0, t=0, out=None, mmap_path=None,
+                     workers=None):
         """Return zstack as a :class:`numpy.ndarray`.
 
+        The z-slices are decoded in parallel, straight into their position in
+        a preallocated array of shape (y, x, z). The array is allocated from
+        the shape and dtype in the file headers, see
+        :func:`jicbioimage.core.image.ProxyImage.probe`, which must be the
+        same for all the z-slices; alternatively it can be provided by the
+        caller or be memory mapped to a .npy file, allowing stacks larger
+        than the available memory.
+
         :param s: series
         :param c: channel
         :param t: timepoint
+        :param out: array of shape (y, x, z) to write the zstack into
+        :param mmap_path: path of .npy file to memory map the zstack to
+        :param workers: number of decoding threads; defaults to the number
+                        of CPUs
+        :raises: ValueError
         :returns: zstack as a :class:`numpy.ndarray`
         """
-        zstack = [x.image for x in self.zstack_proxy_iterator(s=s, c=c, t=t)]
-        return np.dstack(zstack)
-
-    def zstack(self, s=0, c=0, t=0):
+        proxy_images = list(self.zstack_proxy_iterator(s=s, c=c, t=t))
+        if len(proxy_images) == 0:
+            msg = "No z-slices for s={}, c={}, t={}"
+            raise(ValueError(msg.format(s, c, t)))
+
+        first = None
+        plane = _probe(proxy_images, workers)
+        if plane is None:
+            # No header could be read; decode the first z-slice instead.
+            first = proxy_images[0].image
+            plane = first.shape, first.dtype
+        plane_shape, dtype = plane
+        depth = plane_shape[2] if len(plane_shape) == 3 else 1
+        shape = plane_shape[:2] + (len(proxy_images) * depth,)
+        zstack = _allocate(shape, dtype, out, mmap_path)
+
+        def put(i, image):
+            if image.shape != plane_shape:
+                msg = "Z-slice {} has shape {}; expected {}"
+                raise(ValueError(msg.format(proxy_images[i].zslice,
+                                            image.shape, plane_shape)))
+            if image.dtype != dtype:
+                msg = "Z-slice {} has dtype {}; expected {}"
+                raise(ValueError(msg.format(proxy_images[i].zslice,
+                                            image.dtype, dtype)))
+            zstack[:, :, i * depth:(i + 1) * depth] = image.reshape(
+                plane_shape[:2] + (depth,))
+
+        positions = range(len(proxy_images))
+        if first is not None:
+            put(0, first)
+            del first
+            positions = positions[1:]
+        _for_each(lambda i: put(i, proxy_images[i].image), positions,
+                  workers)
+        return zstack
+
+    def zstack(self, s=0, c=0, t=0, out=None, mmap_path=None, workers=None):
         """Return zstack as a :class:`jicbioimage.core.image.Image3D`.
 
         :param s: series
         :param c: channel
         :param t: timepoint
+        :param out: array of shape (y, x, z) to write the zstack into
+        :param mmap_path: path of .npy file to memory map the zstack to
+        :param workers: number of decoding threads; defaults to the number
+                        of CPUs
         :returns: zstack as a :class:`jicbioimage.core.image.Image3D`
         """
-        return Image3D.from_array(self.zstack_array(s=s, c=c, t=t))
+        return Image3D.from_array(self.zstack_array(s=s, c=c, t=t, out=out,
+                                                    mmap_path=mmap_path,
+                                                    workers=workers))
+
+    def zprojection(self, s=0, c=0, t=0, reducer="max", workers=None):
+        """Return projection of a zstack as a 2D image.
+
+        The z-slices are decoded in a pool of threads and added one at a
+        time to a running accumulator. The zstack is never materialised:
+        at most workers z-slices are decoded, or being decoded, at any
+        time, so peak memory is about workers + 2 planes, a couple more for
+        "std" and "argmax", whatever the number of z-slices. With
+        workers=1 the z-slices are decoded one at a time in the calling
+        thread.
+
+        The result matches applying the corresponding numpy function along
+        the z-axis of :func:`zstack_array`; "std" is the population standard
+        deviation and "argmax" gives the position of the first maximum
+        within the zstack.
+
+        :param s: series
+        :param c: channel
+        :param t: timepoint
+        :param reducer: one of "max", "min", "mean", "sum", "std" or
+                        "argmax"
+        :param workers: number of decoding threads; defaults to the number
+                        of CPUs
+        :raises: ValueError
+        :returns: :class:`jicbioimage.core.image.Image`
+        """
+        if reducer not in _PROJECTIONS:
+            msg = "Unknown reducer {}; choose from {}"
+            raise(ValueError(msg.format(reducer, sorted(_PROJECTIONS))))
+        proxy_images = list(self.zstack_proxy_iterator(s=s, c=c, t=t))
+        if len(proxy_images) == 0:
+            msg = "No z-slices for s={}, c={}, t={}"
+            raise(ValueError(msg.format(s, c, t)))
+
+        projection = _PROJECTIONS[reducer]()
+        planes = _imap(lambda p: np.asarray(p.image), proxy_images, workers)
+        for proxy_image, plane in zip(proxy_images, planes):
+            if (projection.acc is not None
+                    and plane.shape != projection.acc.shape):
+                msg = "Z-slice {} has shape {}; expected {}"
+                raise(ValueError(msg.format(proxy_image.zslice, plane.shape,
+                                            projection.acc.shape)))
+            projection.update(plane)
+        return Image.from_array(projection.result())
+
+    def time_windows(self, s=0, c=0, z=0, size=2, step=1, readahead=1):
+        """Yield windows of consecutive time points as (size, y, x) arrays.
+
+        Every plane is decoded exactly once, in a background thread that
+        reads ahead of the window being consumed. The windows are views into
+        a ring buffer and are only valid until the next window is yielded;
+        take a copy to keep one. Time points that are not part of any window,
+        i.e. when step is larger than size, are not decoded. The time points
+        are those of the series; if any of them has no image for the
+        channel and zslice a ValueError is raised, rather than windows
+        spanning the gap.
+
+        :param s: series
+        :param c: channel
+        :param z: zslice
+        :param size: number of time points in each window
+        :param step: number of time points between the start of successive
+                     windows
+        :param readahead: number of planes to decode ahead of the window being
+                          consumed; 0 decodes in the calling thread
+        :raises: ValueError
+        :returns: iterator of read only :class:`numpy.ndarray` instances
+        """
+        if size < 1 or step < 1:
+            raise(ValueError("Window size and step must be positive"))
+        index = self._plane_index
+        proxy_images = []
+        for t in index.summary(s)[2]:
+            if (s, c, z, t) not in index.planes:
+                msg = "No image for s={}, c={}, z={}, t={}"
+                raise(ValueError(msg.format(s, c, z, t)))
+            proxy_images.append(index.planes[(s, c, z, t)])
+        starts = range(0, len(proxy_images) - size + 1, step)
+        frames = sorted(set(f for start in starts
+                            for f in range(start, start + size)))
+        if len(frames) == 0:
+            return
+
+        # Each frame is written to two slots of a buffer holding two windows,
+        # so that the frames of every window are contiguous in the buffer.
+        buf = None
+
+        def decode(f):
+            return np.asarray(proxy_images[f].image)
+
+        if readahead > 0:
+            planes = _pool_imap(decode, frames, 1,
+                                max_in_flight=readahead + 1)
+        else:
+            planes = (decode(f) for f in frames)
+        frames = iter(frames)
+        for start in starts:
+            for f in frames:
+                plane = next(planes)
+                if buf is None:
+                    buf = np.empty((2 * size,) + plane.shape, plane.dtype)
+                if plane.shape != buf.shape[1:]:
+                    msg = "Time point {} has shape {}; expected {}"
+                    raise(ValueError(msg.format(proxy_images[f].timepoint,
+                                                plane.shape, buf.shape[1:])))
+                buf[f % size] = plane
+                buf[f % size + size] = plane
+                if f == start + size - 1:
+                    break
+            window = buf[start % size:start % size + size]
+            window.flags.writeable = False
+            yield window
+
+    def _hyperstack_planes(self, s, c, z, t):
+        """Return the selected identifiers and the proxy image of each plane.
+
+        :returns: tuple ((timepoints, channels, zslices), planes) where
+                  planes is a list of ((t, c, z) position, proxy image or
+                  None) tuples
+        """
+        index = self._plane_index
+        channels, zslices, timepoints = index.summary(s)
+        timepoints = _select_identifiers(t, timepoints)
+        channels = _select_identifiers(c, channels)
+        zslices = _select_identifiers(z, zslices)
+        planes = []
+        for ti, timepoint in enumerate(timepoints):
+            for ci, channel in enumerate(channels):
+                for zi, zslice in enumerate(zslices):
+                    key = (s, channel, zslice, timepoint)
+                    planes.append(((ti, ci, zi), index.planes.get(key)))
+        if all(proxy_image is None for _, proxy_image in planes):
+            msg = "No images for s={}, c={}, z={}, t={}"
+            raise(ValueError(msg.format(s, c, z, t)))
+        return (timepoints, channels, zslices), planes
+
+    def hyperstack_info(self, s=0, c=None, z=None, t=None):
+        """Return the size of the hyperstack that would be assembled.
+
+        Decodes a single image to determine the shape and dtype of the
+        planes.
+
+        :param s: series
+        :param c: channel selector, see :func:`select`
+        :param z: zslice selector, see :func:`select`
+        :param t: timepoint selector, see :func:`select`
+        :raises: ValueError
+        :returns: dictionary with the keys "shape", "dtype", "nbytes",
+                  "timepoints", "channels" and "zslices"
+        """
+        axes, planes = self._hyperstack_planes(s, c, z, t)
+        proxy_image = [p for _, p in planes if p is not None][0]
+        image = proxy_image.image
+        shape = tuple(len(ids) for ids in axes) + image.shape
+        return dict(shape=shape,
+                    dtype=image.dtype,
+                    nbytes=int(np.prod(shape)) * image.dtype.itemsize,
+                    timepoints=axes[0],
+                    channels=axes[1],
+                    zslices=axes[2])
+
+    def hyperstack(self, s=0, c=None, z=None, t=None, out=None,
+                   mmap_path=None, workers=None):
+        """Return a series as a (t, c, z, y, x) :class:`numpy.ndarray`.
+
+        All the planes are decoded in a single parallel pass straight into
+        their position in the output array, which is allocated from the
+        shape and dtype in the file headers; all the planes must have the
+        same shape and dtype. Planes missing from the collection are filled
+        with zeros. Use :func:`hyperstack_info` to find
+        out how much memory is needed before assembling the hyperstack.
+
+        :param s: series
+        :param c: channel selector, see :func:`select`
+        :param z: zslice selector, see :func:`select`
+        :param t: timepoint selector, see :func:`select`
+        :param out: array of shape (t, c, z, y, x) to write into
+        :param mmap_path: path of .npy file to memory map the hyperstack to
+        :param workers: number of decoding threads; defaults to the number
+                        of CPUs
+        :raises: ValueError
+        :returns: :class:`numpy.ndarray`
+        """
+        axes, planes = self._hyperstack_planes(s, c, z, t)
+        present = [(pos, p) for pos, p in planes if p is not None]
+        first = None
+        plane = _probe([p for _, p in present], workers)
+        if plane is None:
+            # No header could be read; decode the first plane instead.
+            first = present[0][1].image
+            plane = first.shape, first.dtype
+        plane_shape, dtype = plane
+        shape = tuple(len(ids) for ids in axes) + plane_shape
+        hyperstack = _allocate(shape, dtype, out, mmap_path)
+
+        def put(pos, image):
+            if image.shape != plane_shape:
+                msg = "Plane at (t, c, z) {} has shape {}; expected {}"
+                raise(ValueError(msg.format(pos, image.shape, plane_shape)))
+            if image.dtype != dtype:
+                msg = "Plane at (t, c, z) {} has dtype {}; expected {}"
+                raise(ValueError(msg.format(pos, image.dtype, dtype)))
+            hyperstack[pos] = image
+
+        if first is not None:
+            put(present[0][0], first)
+            del first
+            present = present[1:]
+        if mmap_path is None:
+            # Memory mapped files are created zero filled.
+            for pos, proxy_image in planes:
+                if proxy_image is None:
+                    hyperstack[pos] = 0
+        _for_each(lambda item: put(item[0], item[1].image), present, workers)
+        return hyperstack
+
+    def lazy_array(self, s=0, cache_size=16, workers=None):
+        """Return a series as a lazily decoded (t, c, z, y, x) array.
+
+        :param s: series
+        :param cache_size: maximum number of decoded planes to keep in memory
+        :param workers: number of decoding threads; defaults to the number
+                        of CPUs
+        :raises: ValueError
+        :returns: :class:`jicbioimage.core.image.LazyArray`
+        """
+        return LazyArray(self, s=s, cache_size=cache_size, workers=workers)
 
     def image(self, s=0, c=0, z=0, t=0):
         """Return image as a :class:`jicbioimage.core.image.Image`.
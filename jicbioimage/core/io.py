@@ -5,27 +5,168 @@ import os
 import os.path
 import subprocess
 import json
-from collections import namedtuple
+import re
+from collections import namedtuple, OrderedDict
 import hashlib
 import tempfile
 import shutil
+import threading
+import sqlite3
+import mmap
+import struct
+import multiprocessing
+import socket
+import uuid
+import time
+import errno
+from contextlib import closing
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
 
 from jicbioimage.core.image import (
+    _default_workers,
+    _imap,
+    _pool_imap,
     _sorted_listdir,
+    _binary_manifest_fpath,
+    _file_signature,
+    _manifest_columns,
+    _read_manifest,
+    _write_binary_manifest,
+    Image,
     ImageCollection,
     MicroscopyCollection,
 )
+from jicbioimage.core.util import tiff, chunked, packed, ome
 
 
-def _md5_hexdigest_from_file(fpath, blocksize=65536):
-    """Return md5 hex digest of a file."""
-    md5_hash = hashlib.md5()
+def _hexdigest_from_file(fpath, hash_factory, blocksize=1 << 20):
+    """Return hex digest of a file.
+
+    The file is memory mapped and hashed in large blocks without copying,
+    falling back on reading it if it cannot be memory mapped.
+
+    :param fpath: path to file
+    :param hash_factory: hashlib constructor, e.g. :func:`hashlib.md5`
+    :param blocksize: number of bytes to hash at a time
+    :returns: hex digest
+    """
+    file_hash = hash_factory()
     with open(fpath, "rb") as fh:
-        buf = fh.read(blocksize)
-        while len(buf) > 0:
-            md5_hash.update(buf)
+        try:
+            mm = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+        except (ValueError, OSError, mmap.error):
+            # Empty files and some special files cannot be memory mapped.
+            mm = None
+        if mm is None:
             buf = fh.read(blocksize)
-        return md5_hash.hexdigest()
+            while len(buf) > 0:
+                file_hash.update(buf)
+                buf = fh.read(blocksize)
+        else:
+            with closing(mm):
+                view = memoryview(mm)
+                try:
+                    for offset in range(0, len(mm), blocksize):
+                        file_hash.update(view[offset:offset + blocksize])
+                finally:
+                    view.release()
+    return file_hash.hexdigest()
+
+
+def _md5_hexdigest_from_file(fpath, blocksize=1 << 20):
+    """Return md5 hex digest of a file."""
+    return _hexdigest_from_file(fpath, hashlib.md5, blocksize)
+
+
+def _blake2b_hexdigest_from_file(fpath, blocksize=1 << 20):
+    """Return blake2b hex digest of a file."""
+    return _hexdigest_from_file(fpath, hashlib.blake2b, blocksize)
+
+
+#: Size of the chunks hashed in parallel by the "blake2b-tree" strategy.
+#: Changing it changes the digests.
+_TREE_CHUNK_SIZE = 64 * 1024 * 1024
+
+
+def _blake2b_tree_hexdigest_from_file(fpath, workers=None,
+                                      blocksize=1 << 20):
+    """Return blake2b tree hex digest of a file.
+
+    The file is split into chunks of 64 MiB that are hashed in parallel.
+    The digest is the blake2b digest of the file size, as a little endian
+    unsigned 64 bit integer, followed by the digests of the chunks.
+
+    :param fpath: path to file
+    :param workers: number of threads; defaults to the number of CPUs
+    :param blocksize: number of bytes to read at a time
+    :returns: hex digest
+    """
+    size = os.path.getsize(fpath)
+
+    def chunk_digest(offset):
+        chunk_hash = hashlib.blake2b()
+        remaining = min(_TREE_CHUNK_SIZE, size - offset)
+        with open(fpath, "rb") as fh:
+            fh.seek(offset)
+            while remaining > 0:
+                buf = fh.read(min(blocksize, remaining))
+                if len(buf) == 0:
+                    break
+                chunk_hash.update(buf)
+                remaining -= len(buf)
+        return chunk_hash.digest()
+
+    offsets = range(0, size, _TREE_CHUNK_SIZE)
+    if workers is None:
+        workers = multiprocessing.cpu_count()
+    workers = max(1, min(workers, len(offsets)))
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        digests = list(executor.map(chunk_digest, offsets))
+    root_hash = hashlib.blake2b()
+    root_hash.update(struct.pack("<Q", size))
+    for digest in digests:
+        root_hash.update(digest)
+    return root_hash.hexdigest()
+
+
+#: Codecs that backends can store converted images with, as keyword
+#: arguments of :func:`jicbioimage.core.util.tiff.write`. "deflate-predictor"
+#: applies horizontal differencing before compressing, which makes smooth
+#: integer images compress better. The fastest zlib level is used; on noisy
+#: microscopy images it compresses almost as well as the default level at
+#: ten times the speed.
+PLANE_COMPRESSIONS = {
+    "deflate": dict(compression="deflate", predictor=False, level=1),
+    "deflate-predictor": dict(compression="deflate", predictor=True,
+                              level=1),
+}
+
+
+def _is_compressed_tiff(fpath):
+    """Return True if a file is a deflate compressed TIFF file.
+
+    :param fpath: path to image file
+    :returns: bool
+    """
+    if os.path.splitext(fpath)[1].lower() not in (".tif", ".tiff"):
+        return False
+    try:
+        ifds = tiff.read_ifds(fpath, limit=1)
+    except ValueError:
+        return False
+    return len(ifds) == 1 and tiff.ifd_compression(ifds[0]) == 8
+
+
+#: Hashing strategies that can be used to key backend entries. The blake2b
+#: strategies need :func:`hashlib.blake2b`, added in Python 3.6.
+HASHING_STRATEGIES = {
+    "md5": _md5_hexdigest_from_file,
+}
+if hasattr(hashlib, "blake2b"):
+    HASHING_STRATEGIES["blake2b"] = _blake2b_hexdigest_from_file
+    HASHING_STRATEGIES["blake2b-tree"] = _blake2b_tree_hexdigest_from_file
 
 
 class AutoName(object):
@@ -80,13 +221,671 @@ class Manifest(list):
         """Return json representation."""
         return json.dumps(self, sort_keys=True)
 
+    def write(self, fpath):
+        """Write the manifest to a json file and a binary manifest file.
+
+        :param fpath: path to the json manifest file
+        """
+        with ManifestWriter(fpath) as writer:
+            for entry in self:
+                writer.add(**entry)
+
+
+class ManifestWriter(object):
+    """Class for writing manifest files incrementally.
+
+    Entries are written to the json manifest file as they are added, so the
+    manifest is never held in memory as a single string. The json output is
+    identical to :attr:`jicbioimage.core.io.Manifest.json`.
+
+    When the writer is closed a compact binary manifest, with one column per
+    manifest key, is written alongside the json manifest; see
+    :func:`jicbioimage.core.image.ImageCollection.parse_manifest`. The binary
+    manifest is only written if all entries have the same keys and the values
+    of each key are all strings, integers, floats or booleans.
+
+    >>> with ManifestWriter("manifest.json") as writer:  # doctest: +SKIP
+    ...     writer.add("S0_C0_Z0_T0.tif", series=0)
+    """
+
+    def __init__(self, fpath):
+        """Initialise a manifest writer.
+
+        :param fpath: path to the json manifest file
+        """
+        self.fpath = fpath
+        binary_fpath = _binary_manifest_fpath(fpath)
+        if os.path.isfile(binary_fpath):
+            os.unlink(binary_fpath)
+        self._encoder = json.JSONEncoder(sort_keys=True)
+        self._fh = open(fpath, "w")
+        self._fh.write("[")
+        self._length = 0
+        self._columns = {}
+
+    def add(self, filename, **kwargs):
+        """Add an entry to the manifest.
+
+        :param filename: relative path to image
+        :param kwargs: custom parameters, e.g. series, channel, zslice
+        :returns: the added entry
+        """
+        entry = dict(filename=filename, **kwargs)
+        if self._length > 0:
+            self._fh.write(", ")
+        self._fh.write(self._encoder.encode(entry))
+
+        if self._columns is not None:
+            if self._length == 0:
+                self._columns = dict((key, []) for key in entry)
+            if set(entry) != set(self._columns):
+                # Entries with different keys cannot be stored in columns.
+                self._columns = None
+            else:
+                for key, value in entry.items():
+                    self._columns[key].append(value)
+        self._length += 1
+        return entry
+
+    def close(self):
+        """Finish writing the json manifest and write the binary manifest."""
+        self._fh.write("]")
+        self._fh.close()
+        if self._columns is not None:
+            _write_binary_manifest(self.fpath, self._columns, self._length)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, type, value, tb):
+        if type is None:
+            self.close()
+        else:
+            self._fh.close()
+
+
+class ManifestCache(object):
+    """Class for caching parsed manifests in memory.
+
+    Loading a manifest that has already been parsed, and that has not changed
+    since, costs a single :func:`os.stat` call. A manifest is considered
+    unchanged if its size and modification time are unchanged.
+
+    Collections loaded from the cache share their proxy images with each
+    other. At most ``cache_size`` manifests are kept, the least recently
+    loaded being removed first. The container files memory mapped by the
+    proxy images of a removed manifest are closed; proxy images still in
+    use map them again when next read.
+    """
+
+    def __init__(self, persist=True, cache_size=128):
+        """Initialise a manifest cache.
+
+        :param persist: whether to write a binary manifest alongside json
+                        manifests lacking an up to date one, so that
+                        subsequent processes can parse the manifest quickly
+        :param cache_size: maximum number of parsed manifests to keep
+        """
+        self.persist = persist
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._cache)
+
+    def clear(self):
+        """Remove all parsed manifests from the cache."""
+        with self._lock:
+            removed = list(self._cache.values())
+            self._cache.clear()
+        self._close(removed)
+
+    def forget(self, fpath):
+        """Remove a parsed manifest from the cache.
+
+        :param fpath: path to the manifest file
+        """
+        realpath = os.path.realpath(fpath)
+        with self._lock:
+            removed = [self._cache.pop(k) for k in list(self._cache)
+                       if k[0] == realpath]
+        self._close(removed)
+
+    @staticmethod
+    def _close(removed):
+        """Close the container files of removed manifests.
+
+        :param removed: list of cached (signature, proxy images, index)
+                        tuples
+        """
+        packed_files = {}
+        for _, proxy_images, _ in removed:
+            for proxy_image in proxy_images:
+                packed_file = getattr(proxy_image, "packed_file", None)
+                if packed_file is not None:
+                    packed_files[id(packed_file)] = packed_file
+        for packed_file in packed_files.values():
+            try:
+                packed_file.close()
+            except BufferError:
+                # Views of the container are still in use.
+                pass
+
+    def _persist(self, fpath, entries):
+        columns = _manifest_columns(entries)
+        if columns is None:
+            return
+        try:
+            _write_binary_manifest(fpath, columns, len(entries))
+        except (IOError, OSError):
+            # The backend may be read only.
+            pass
+
+    def load(self, fpath, collection_class=ImageCollection):
+        """Return collection built from a manifest file.
+
+        :param fpath: path to the manifest file
+        :param collection_class: class of the returned collection
+        :raises: RuntimeError
+        :returns: instance of collection_class
+        """
+        key = (os.path.realpath(fpath), collection_class)
+        signature = _file_signature(fpath)
+        with self._lock:
+            cached = self._cache.pop(key, None)
+            if cached is not None:
+                # Mark the manifest as the most recently loaded.
+                self._cache[key] = cached
+        if cached is None or cached[0] != signature:
+            entries, from_binary = _read_manifest(fpath)
+            if self.persist and not from_binary:
+                self._persist(fpath, entries)
+            template = collection_class()
+            template._add_manifest_entries(fpath, entries)
+            index = None
+            if isinstance(template, MicroscopyCollection):
+                index = template._plane_index
+            removed = [] if cached is None else [cached]
+            cached = (signature, tuple(template), index)
+            with self._lock:
+                self._cache.pop(key, None)
+                self._cache[key] = cached
+                while len(self._cache) > self.cache_size:
+                    removed.append(self._cache.popitem(last=False)[1])
+            self._close(removed)
+
+        _, proxy_images, index = cached
+        collection = collection_class()
+        collection.extend(proxy_images)
+        if index is not None:
+            collection._index = index
+        return collection
+
+
+class BackendIndex(object):
+    """Class for indexing the entries of a backend in a SQLite database.
+
+    The database has three tables:
+
+    - ``entries(key, source, manifest, num_planes)``: one row per backend
+      entry; ``source`` is the path of the file most recently converted to or
+      loaded from the entry
+    - ``planes(entry, filename, md5_hexdigest, series, channel, zslice,
+      timepoint)``: one row per image in the manifest of an entry
+    - ``dimensions(entry, series, num_channels, num_zslices, num_timepoints)``:
+      one row per series of an entry
+
+    For example, to find the entries with more than three channels:
+
+    >>> index.query("SELECT DISTINCT entry FROM dimensions "
+    ...             "WHERE num_channels > ?", (3,))  # doctest: +SKIP
+    """
+
+    _SCHEMA = """
+        CREATE TABLE IF NOT EXISTS entries (
+            key TEXT PRIMARY KEY,
+            source TEXT,
+            manifest TEXT NOT NULL,
+            num_planes INTEGER NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS planes (
+            entry TEXT NOT NULL,
+            filename TEXT NOT NULL,
+            md5_hexdigest TEXT,
+            series INTEGER,
+            channel INTEGER,
+            zslice INTEGER,
+            timepoint INTEGER
+        );
+        CREATE INDEX IF NOT EXISTS planes_entry ON planes (entry);
+        CREATE INDEX IF NOT EXISTS planes_md5_hexdigest
+            ON planes (md5_hexdigest);
+        CREATE TABLE IF NOT EXISTS dimensions (
+            entry TEXT NOT NULL,
+            series INTEGER NOT NULL,
+            num_channels INTEGER NOT NULL,
+            num_zslices INTEGER NOT NULL,
+            num_timepoints INTEGER NOT NULL,
+            PRIMARY KEY (entry, series)
+        );
+    """
+
+    def __init__(self, fpath):
+        """Initialise an index; creates the database if it does not exist.
+
+        :param fpath: path to the SQLite database file
+        """
+        self.fpath = fpath
+        with closing(self._connect()) as conn:
+            with conn:
+                conn.executescript(self._SCHEMA)
+
+    def _connect(self):
+        return sqlite3.connect(self.fpath, timeout=60)
+
+    def query(self, sql, params=()):
+        """Return the rows resulting from a SQL query.
+
+        :param sql: SQL statement
+        :param params: parameters to substitute into the statement
+        :returns: list of tuples
+        """
+        with closing(self._connect()) as conn:
+            return conn.execute(sql, params).fetchall()
+
+    def has_entry(self, key):
+        """Return True if the entry is in the index.
+
+        :param key: name of the entry directory in the backend
+        :returns: bool
+        """
+        rows = self.query("SELECT 1 FROM entries WHERE key = ?", (key,))
+        return len(rows) > 0
+
+    def add_entry(self, key, manifest_fpath, source=None):
+        """Add an entry to the index, replacing any existing rows for it.
+
+        :param key: name of the entry directory in the backend
+        :param manifest_fpath: path to the manifest file of the entry
+        :param source: path to the file converted to the entry
+        """
+        entries, _ = _read_manifest(manifest_fpath)
+        planes = []
+        dimensions = {}
+        for entry in entries:
+            s = entry.get("series")
+            c = entry.get("channel")
+            z = entry.get("zslice")
+            t = entry.get("timepoint")
+            planes.append((key, os.path.basename(entry["filename"]),
+                           entry.get("md5_hexdigest"), s, c, z, t))
+            if s is not None:
+                ids = dimensions.setdefault(s, (set(), set(), set()))
+                ids[0].add(c)
+                ids[1].add(z)
+                ids[2].add(t)
+        with closing(self._connect()) as conn:
+            with conn:
+                self._delete(conn, key)
+                conn.execute("INSERT INTO entries VALUES (?, ?, ?, ?)",
+                             (key, source, os.path.abspath(manifest_fpath),
+                              len(planes)))
+                conn.executemany(
+                    "INSERT INTO planes VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    planes)
+                conn.executemany(
+                    "INSERT INTO dimensions VALUES (?, ?, ?, ?, ?)",
+                    [(key, s) + tuple(len(i) for i in ids)
+                     for s, ids in dimensions.items()])
+
+    def set_source(self, key, source):
+        """Record the path of the file most recently loaded from an entry.
+
+        :param key: name of the entry directory in the backend
+        :param source: path to the file
+        """
+        with closing(self._connect()) as conn:
+            with conn:
+                conn.execute("UPDATE entries SET source = ? WHERE key = ?",
+                             (source, key))
+
+    @staticmethod
+    def _delete(conn, key):
+        for table, column in [("entries", "key"),
+                              ("planes", "entry"),
+                              ("dimensions", "entry")]:
+            conn.execute("DELETE FROM {} WHERE {} = ?".format(table, column),
+                         (key,))
+
+    def remove_entry(self, key):
+        """Remove an entry from the index.
+
+        :param key: name of the entry directory in the backend
+        """
+        with closing(self._connect()) as conn:
+            with conn:
+                self._delete(conn, key)
+
+    def rebuild(self, directory):
+        """Rebuild the index from the manifest files in a backend directory.
+
+        Sources recorded for entries that are still present are kept.
+
+        :param directory: backend directory
+        """
+        sources = dict(self.query("SELECT key, source FROM entries"))
+        with closing(self._connect()) as conn:
+            with conn:
+                for table in ["entries", "planes", "dimensions"]:
+                    conn.execute("DELETE FROM {}".format(table))
+        for key in _sorted_listdir(directory):
+            manifest_fpath = os.path.join(directory, key, "manifest.json")
+            if os.path.isfile(manifest_fpath):
+                self.add_entry(key, manifest_fpath, sources.get(key))
+
+    def find_planes(self, md5_hexdigest):
+        """Return the images with a given md5 hex digest.
+
+        :param md5_hexdigest: md5 hex digest of the image file
+        :returns: list of dictionaries with the keys "entry", "fpath",
+                  "series", "channel", "zslice" and "timepoint"
+        """
+        rows = self.query(
+            "SELECT planes.entry, entries.manifest, planes.filename, "
+            "planes.series, planes.channel, planes.zslice, planes.timepoint "
+            "FROM planes JOIN entries ON planes.entry = entries.key "
+            "WHERE planes.md5_hexdigest = ?", (md5_hexdigest,))
+        return [dict(entry=key,
+                     fpath=os.path.join(os.path.dirname(manifest), filename),
+                     series=s, channel=c, zslice=z, timepoint=t)
+                for key, manifest, filename, s, c, z, t in rows]
+
+
+class FingerprintCache(object):
+    """Class for caching the content hashes of files in a SQLite database.
+
+    A hash is cached against the real path, size, modification time and
+    inode of the file, so looking up the hash of an unchanged file costs a
+    ``stat()`` rather than reading the whole file. A file rewritten in place
+    within the resolution of the file system's modification times keeps its
+    fingerprint; use ``strict=True`` to force it to be hashed again.
+    """
+
+    _SCHEMA = """
+        CREATE TABLE IF NOT EXISTS fingerprints (
+            realpath TEXT NOT NULL,
+            hashing TEXT NOT NULL,
+            size INTEGER NOT NULL,
+            mtime_ns INTEGER NOT NULL,
+            inode INTEGER NOT NULL,
+            key TEXT NOT NULL,
+            PRIMARY KEY (realpath, hashing)
+        );
+    """
+
+    def __init__(self, fpath):
+        """Initialise a cache; creates the database if it does not exist.
+
+        :param fpath: path to the SQLite database file
+        """
+        self.fpath = fpath
+        with closing(self._connect()) as conn:
+            with conn:
+                conn.executescript(self._SCHEMA)
+
+    def _connect(self):
+        return sqlite3.connect(self.fpath, timeout=60)
+
+    @staticmethod
+    def _fingerprint(fpath):
+        """Return (realpath, (size, mtime_ns, inode)) of a file."""
+        realpath = os.path.realpath(fpath)
+        stat = os.stat(realpath)
+        mtime_ns = getattr(stat, "st_mtime_ns", None)
+        if mtime_ns is None:
+            mtime_ns = int(stat.st_mtime * 1e9)
+        return realpath, (stat.st_size, mtime_ns, stat.st_ino)
+
+    def key(self, fpath, hashing, hash_func, strict=False):
+        """Return the content hash of a file, hashing it only if needed.
+
+        :param fpath: path to file
+        :param hashing: name of the hashing strategy
+        :param hash_func: function returning the content hash of a file
+        :param strict: hash the file even if its fingerprint is unchanged
+        :returns: content hash
+        """
+        try:
+            realpath, fingerprint = self._fingerprint(fpath)
+        except OSError:
+            return hash_func(fpath)
+        with closing(self._connect()) as conn:
+            if not strict:
+                row = conn.execute(
+                    "SELECT size, mtime_ns, inode, key FROM fingerprints "
+                    "WHERE realpath = ? AND hashing = ?",
+                    (realpath, hashing)).fetchone()
+                if row is not None and tuple(row[:3]) == fingerprint:
+                    return row[3]
+            key = hash_func(fpath)
+            # Do not cache the hash of a file modified while it was hashed.
+            if self._fingerprint(fpath) == (realpath, fingerprint):
+                with conn:
+                    conn.execute(
+                        "INSERT OR REPLACE INTO fingerprints "
+                        "VALUES (?, ?, ?, ?, ?, ?)",
+                        (realpath, hashing) + fingerprint + (key,))
+        return key
+
+    def clear(self):
+        """Remove all cached hashes."""
+        with closing(self._connect()) as conn:
+            with conn:
+                conn.execute("DELETE FROM fingerprints")
+
+    def __len__(self):
+        with closing(self._connect()) as conn:
+            return conn.execute(
+                "SELECT COUNT(*) FROM fingerprints").fetchone()[0]
+
+
+class EntryLock(object):
+    """Class for a lock file giving one process the right to create an entry.
+
+    The lock is taken by creating the lock file exclusively, so it works
+    across threads, processes and machines sharing a backend directory. The
+    file holds the host name and process id of the owner, and its
+    modification time is refreshed by a heartbeat thread while the lock is
+    held. The owner is written to a temporary file that is then hard linked
+    to the lock file, so that the lock file is never without its owner
+    where hard links are supported.
+
+    A lock is stale, and is broken by the next process trying to take it,
+    if its heartbeat is older than ``stale_after`` seconds, or if its owner
+    ran on the same host and is no longer running.
+    """
+
+    def __init__(self, fpath, stale_after=120, poll_interval=0.1):
+        """Initialise a lock; the lock file is not created until acquired.
+
+        :param fpath: path to the lock file
+        :param stale_after: seconds without a heartbeat after which the lock
+                            is considered abandoned
+        :param poll_interval: seconds between attempts to take the lock
+        """
+        self.fpath = fpath
+        self.stale_after = stale_after
+        self.poll_interval = poll_interval
+        self._owner = None
+        self._stop_heartbeat = None
+
+    @property
+    def locked(self):
+        """Whether this instance holds the lock."""
+        return self._owner is not None
+
+    def _try_create(self):
+        """Return True if the lock file was created by this call."""
+        owner = "{}:{}:{}\n".format(socket.gethostname(), os.getpid(),
+                                    uuid.uuid4().hex)
+        if not self._create(owner):
+            return False
+        self._owner = owner
+        self._stop_heartbeat = threading.Event()
+        thread = threading.Thread(target=self._heartbeat,
+                                  args=(self._stop_heartbeat,))
+        thread.daemon = True
+        thread.start()
+        return True
+
+    def _create(self, owner):
+        """Create the lock file holding the owner, if it does not exist.
+
+        :param owner: contents of the lock file
+        :returns: True if the lock file was created by this call
+        """
+        tmp_fpath = "{}.{}.tmp".format(self.fpath, uuid.uuid4().hex)
+        with open(tmp_fpath, "w") as fh:
+            fh.write(owner)
+        try:
+            os.link(tmp_fpath, self.fpath)
+            return True
+        except OSError as e:
+            if e.errno == errno.EEXIST:
+                return False
+        except AttributeError:
+            pass
+        finally:
+            os.unlink(tmp_fpath)
+
+        # The file system does not support hard links.
+        try:
+            fd = os.open(self.fpath, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except OSError as e:
+            if e.errno == errno.EEXIST:
+                return False
+            raise
+        with os.fdopen(fd, "w") as fh:
+            fh.write(owner)
+        return True
+
+    def _heartbeat(self, stop):
+        interval = self.stale_after / 4.0
+        while not stop.wait(interval):
+            try:
+                os.utime(self.fpath, None)
+            except OSError:
+                pass
+
+    def _read_owner(self):
+        """Return (contents of the lock file, its age in seconds) or None."""
+        try:
+            with open(self.fpath) as fh:
+                owner = fh.read()
+            age = time.time() - os.path.getmtime(self.fpath)
+        except (IOError, OSError):
+            return None
+        return owner, age
+
+    @staticmethod
+    def _owner_is_dead(owner):
+        """Return True if the owner ran on this host and has exited."""
+        try:
+            hostname, pid, _ = owner.split(":")
+            pid = int(pid)
+        except ValueError:
+            return False
+        if hostname != socket.gethostname() or sys.platform == "win32":
+            return False
+        if pid == os.getpid():
+            return False
+        try:
+            os.kill(pid, 0)
+        except OSError as e:
+            return e.errno == errno.ESRCH
+        return False
+
+    def _break_if_stale(self):
+        """Remove the lock file if it is stale."""
+        state = self._read_owner()
+        if state is None:
+            return
+        owner, age = state
+        if age < self.stale_after:
+            # A lock whose file is still being written has no owner yet.
+            if not owner.endswith("\n") or not self._owner_is_dead(owner):
+                return
+        # Move the lock aside before removing it, so that a lock taken by
+        # another process in the meantime is not removed by mistake.
+        aside = "{}.{}.stale".format(self.fpath, uuid.uuid4().hex)
+        try:
+            os.rename(self.fpath, aside)
+        except OSError:
+            return
+        try:
+            with open(aside) as fh:
+                taken = fh.read()
+            if taken != owner:
+                try:
+                    os.link(aside, self.fpath)
+                except (OSError, AttributeError):
+                    pass
+        finally:
+            os.unlink(aside)
+
+    def acquire(self, blocking=True, timeout=None):
+        """Take the lock.
+
+        :param blocking: wait for the lock if it is held
+        :param timeout: maximum number of seconds to wait; wait for as long
+                        as it takes by default
+        :raises: RuntimeError if the lock is already held by this instance
+        :returns: True if the lock was taken
+        """
+        if self.locked:
+            raise(RuntimeError("Lock already held: {}".format(self.fpath)))
+        start = time.time()
+        while True:
+            if self._try_create():
+                return True
+            self._break_if_stale()
+            if self._try_create():
+                return True
+            if not blocking:
+                return False
+            if timeout is not None and time.time() - start >= timeout:
+                return False
+            time.sleep(self.poll_interval)
+
+    def release(self):
+        """Release the lock.
+
+        :raises: RuntimeError if the lock is not held by this instance
+        """
+        if not self.locked:
+            raise(RuntimeError("Lock not held: {}".format(self.fpath)))
+        self._stop_heartbeat.set()
+        state = self._read_owner()
+        if state is not None and state[0] == self._owner:
+            os.unlink(self.fpath)
+        self._owner = None
+        self._stop_heartbeat = None
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.release()
+
 
 class FileBackend(object):
     """Class for storing image files."""
 
     class Entry(object):
         """Class representing a backend entry."""
-        def __init__(self, base_dir, fpath):
+        def __init__(self, base_dir, fpath, key=None):
             """Initialise a new entry; to be populated with images.
 
             The base name of the fpath argument is used to create a
@@ -95,9 +894,15 @@ class FileBackend(object):
 
             :param base_dir: backend directory
             :param fpath: path to the microscopy image of interest
+            :param key: name of the entry subdirectory; defaults to the md5
+                        hex digest of the file
             """
-            self.md5_hexdigest = _md5_hexdigest_from_file(fpath)
-            self._directory = os.path.join(base_dir, self.md5_hexdigest)
+            if key is None:
+                key = _md5_hexdigest_from_file(fpath)
+            self.key = key
+            #: Kept for backwards compatibility; the same as :attr:`key`.
+            self.md5_hexdigest = key
+            self._directory = os.path.join(base_dir, self.key)
             if not os.path.isdir(self.directory):
                 os.mkdir(self.directory)
 
@@ -106,16 +911,72 @@ class FileBackend(object):
             """Where the images are stored."""
             return self._directory
 
-    def __init__(self, directory):
+    def __init__(self, directory, persist_manifest_cache=True, index=False,
+                 hashing="md5", fingerprint_cache=True, capacity=None,
+                 compression=None):
         """Initialise a backend.
 
         Creates the backend directory if it does not already exist.
 
+        Entries are keyed on a hash of the content of the input file. The
+        default "md5" strategy keys entries on the plain md5 hex digest, as
+        in earlier versions. The other strategies in
+        :data:`jicbioimage.core.io.HASHING_STRATEGIES` prefix the hex digest
+        with the name of the strategy, e.g. "blake2b-tree-3a7f...", so that
+        entries created with different strategies never collide.
+
         :param directory: location of the backend
+        :param persist_manifest_cache: whether the manifest cache may write
+                                       binary manifests to the backend
+        :param index: whether to maintain a
+                      :class:`jicbioimage.core.io.BackendIndex` of the
+                      entries in the backend; if the index is created for an
+                      existing backend it is built from the manifest files
+        :param hashing: name of the hashing strategy used to key entries
+        :param fingerprint_cache: whether to cache the keys of input files
+                                  in a
+                                  :class:`jicbioimage.core.io.FingerprintCache`
+                                  in the backend
+        :param capacity: number of bytes the entries may take up; if given,
+                         :meth:`gc` is run after each conversion
+        :param compression: name of the codec in
+                            :data:`jicbioimage.core.io.PLANE_COMPRESSIONS`
+                            to recompress converted images with; by default
+                            images are stored as converted
+        :raises: ValueError if the hashing strategy or codec is not known
         """
+        if (hashing in ("blake2b", "blake2b-tree") and
+                hashing not in HASHING_STRATEGIES):
+            msg = "Hashing strategy {} needs Python 3.6 or later".format(
+                hashing)
+            raise(ValueError(msg))
+        if hashing not in HASHING_STRATEGIES:
+            msg = "Unknown hashing strategy: {}; expected one of: {}".format(
+                hashing, ", ".join(sorted(HASHING_STRATEGIES)))
+            raise(ValueError(msg))
+        if compression is not None and compression not in PLANE_COMPRESSIONS:
+            msg = "Unknown compression: {}; expected one of: {}".format(
+                compression, ", ".join(sorted(PLANE_COMPRESSIONS)))
+            raise(ValueError(msg))
         if not os.path.isdir(directory):
             os.mkdir(directory)
         self._directory = directory
+        self.hashing = hashing
+        self.capacity = capacity
+        self.compression = compression
+        self._entry_sizes = {}
+        self.fingerprint_cache = None
+        if fingerprint_cache:
+            self.fingerprint_cache = FingerprintCache(
+                os.path.join(directory, "fingerprints.sqlite"))
+        self.manifest_cache = ManifestCache(persist=persist_manifest_cache)
+        self.index = None
+        if index:
+            index_fpath = os.path.join(directory, "index.sqlite")
+            rebuild = not os.path.isfile(index_fpath)
+            self.index = BackendIndex(index_fpath)
+            if rebuild:
+                self.index.rebuild(directory)
 
     @property
     def directory(self):
@@ -128,14 +989,636 @@ class FileBackend(object):
         :param fpath: path to microscopy image
         :returns: :class:`jiciimagelib.image.FileBackend.Entry` instance
         """
-        return FileBackend.Entry(self.directory, fpath)
+        return FileBackend.Entry(self.directory, fpath,
+                                 key=self.entry_key(fpath))
+
+    def entry_lock(self, key):
+        """Return the lock serialising the creation of an entry.
+
+        :param key: name of the entry subdirectory
+        :returns: :class:`jicbioimage.core.io.EntryLock`
+        """
+        return EntryLock(os.path.join(self.directory, key + ".lock"))
+
+    def entries(self):
+        """Return the keys of the entries, least recently used first.
+
+        :returns: list of str
+        """
+        access_times = []
+        for key in _sorted_listdir(self.directory):
+            if "." in key:
+                # Lock and pin files, and entries being removed.
+                continue
+            entry_dir = os.path.join(self.directory, key)
+            if os.path.isfile(os.path.join(entry_dir, "manifest.json")):
+                access_times.append((_file_signature(entry_dir)[1], key))
+        return [key for _, key in sorted(access_times)]
+
+    def touch(self, key):
+        """Record that an entry has been used.
+
+        The time an entry was last used is the modification time of its
+        directory.
+
+        :param key: name of the entry subdirectory
+        """
+        try:
+            os.utime(os.path.join(self.directory, key), None)
+        except OSError:
+            pass
+
+    def _pin_fpath(self, key):
+        return os.path.join(self.directory, key + ".pin")
+
+    def pin(self, key):
+        """Protect an entry from garbage collection.
+
+        :param key: name of the entry subdirectory
+        """
+        open(self._pin_fpath(key), "a").close()
+
+    def unpin(self, key):
+        """Allow an entry to be garbage collected.
+
+        :param key: name of the entry subdirectory
+        """
+        if self.is_pinned(key):
+            os.unlink(self._pin_fpath(key))
+
+    def is_pinned(self, key):
+        """Return True if an entry is protected from garbage collection.
+
+        :param key: name of the entry subdirectory
+        :returns: bool
+        """
+        return os.path.isfile(self._pin_fpath(key))
+
+    def entry_size(self, key):
+        """Return the number of bytes taken up by the files of an entry.
+
+        Entries do not change once created, so sizes are computed once.
+        Symbolic links, such as those to natively imported files, count as
+        the size of the link rather than of the file they point at.
+
+        :param key: name of the entry subdirectory
+        :returns: int
+        """
+        size = self._entry_sizes.get(key)
+        if size is None:
+            size = 0
+            entry_dir = os.path.join(self.directory, key)
+            for dirpath, _, fnames in os.walk(entry_dir):
+                for fname in fnames:
+                    size += os.lstat(os.path.join(dirpath, fname)).st_size
+            self._entry_sizes[key] = size
+        return size
+
+    def remove_entry(self, key):
+        """Remove an entry unless its lock is held.
+
+        The entry directory is renamed before it is removed, so that it
+        disappears at once for other processes.
+
+        :param key: name of the entry subdirectory
+        :returns: True if the entry was removed
+        """
+        lock = self.entry_lock(key)
+        if not lock.acquire(blocking=False):
+            return False
+        try:
+            entry_dir = os.path.join(self.directory, key)
+            if not os.path.isdir(entry_dir):
+                return False
+            # Unmap its container files first, as mapped files cannot be
+            # moved or removed on Windows.
+            self.manifest_cache.forget(
+                os.path.join(entry_dir, "manifest.json"))
+            aside = "{}.{}.deleted".format(entry_dir, uuid.uuid4().hex)
+            os.rename(entry_dir, aside)
+            if self.index is not None:
+                self.index.remove_entry(key)
+            self._entry_sizes.pop(key, None)
+        finally:
+            lock.release()
+        shutil.rmtree(aside, ignore_errors=True)
+        return True
+
+    def gc(self, capacity=None, keep=()):
+        """Remove least recently used entries until the backend fits.
+
+        Pinned entries, entries whose lock is held and entries in keep are
+        never removed.
+
+        :param capacity: number of bytes the entries may take up; defaults
+                         to :attr:`capacity`
+        :param keep: keys of entries not to remove
+        :raises: ValueError if there is no capacity to collect down to
+        :returns: list of the keys of the removed entries
+        """
+        if capacity is None:
+            capacity = self.capacity
+        if capacity is None:
+            raise(ValueError("The backend has no capacity"))
+        for fname in _sorted_listdir(self.directory):
+            if fname.endswith(".deleted"):
+                # Left behind by an interrupted removal.
+                shutil.rmtree(os.path.join(self.directory, fname),
+                              ignore_errors=True)
+        keys = self.entries()
+        total = sum(self.entry_size(key) for key in keys)
+        removed = []
+        for key in keys:
+            if total <= capacity:
+                break
+            if key in keep or self.is_pinned(key):
+                continue
+            size = self.entry_size(key)
+            if self.remove_entry(key):
+                total -= size
+                removed.append(key)
+        return removed
+
+    def entry_key(self, fpath, strict=False):
+        """Return the key of the entry for a file.
+
+        :param fpath: path to microscopy image
+        :param strict: hash the file even if the fingerprint cache has a key
+                       for it
+        :returns: name of the entry subdirectory
+        """
+        if self.fingerprint_cache is None:
+            return self._hash_key(fpath)
+        return self.fingerprint_cache.key(fpath, self.hashing,
+                                          self._hash_key, strict)
+
+    def _hash_key(self, fpath):
+        if self.hashing == "md5":
+            return _md5_hexdigest_from_file(fpath)
+        hexdigest = HASHING_STRATEGIES[self.hashing](fpath)
+        return "{}-{}".format(self.hashing, hexdigest)
+
+
+def _read_plane(fpath):
+    """Return the pixels of a converted image.
+
+    :param fpath: path to image file
+    :returns: :class:`numpy.ndarray`
+    """
+    try:
+        return tiff.read(fpath)
+    except ValueError:
+        return Image.from_file(fpath, log_in_history=False).view(np.ndarray)
+
+
+class ChunkedBackend(FileBackend):
+    """Class for storing each series as a chunked (t, c, z, y, x) array.
+
+    The images converted by bfconvert are assembled into one
+    :class:`jicbioimage.core.util.chunked.ChunkedArray` per series, stored
+    in the "S<series>.zarr" directory of the entry, after which they are
+    removed. The manifest keeps an entry per plane, recording the position
+    of the plane in the array, so that entries are read through the
+    :class:`jicbioimage.core.image.MicroscopyCollection` API as before.
+
+    Slicing the :func:`jicbioimage.core.image.MicroscopyCollection.lazy_array`
+    of a series reads only the chunks that the slice overlaps.
+    """
+
+    #: Default shape of the chunks; 256 x 256 tiles of single planes.
+    DEFAULT_CHUNKS = (1, 1, 1, 256, 256)
+
+    def __init__(self, directory, chunks=DEFAULT_CHUNKS,
+                 chunk_compression=None, **kwargs):
+        """Initialise a backend.
+
+        :param directory: location of the backend
+        :param chunks: (t, c, z, y, x) shape of the chunks
+        :param chunk_compression: None or "zlib"
+        :param kwargs: see :class:`jicbioimage.core.io.FileBackend`
+        :raises: ValueError if the chunk shape or compression is not valid
+        """
+        if len(chunks) != 5 or any(c < 1 for c in chunks):
+            msg = "Chunks must be a (t, c, z, y, x) shape: {}".format(chunks)
+            raise(ValueError(msg))
+        if chunk_compression not in chunked.COMPRESSIONS:
+            msg = "Unknown chunk compression: {}; expected None or zlib"
+            raise(ValueError(msg.format(chunk_compression)))
+        super(ChunkedBackend, self).__init__(directory, **kwargs)
+        self.chunks = tuple(chunks)
+        self.chunk_compression = chunk_compression
+
+    def finalise_entry(self, entry, workers=None):
+        """Store the converted images of an entry as chunked arrays.
+
+        Called by :class:`jicbioimage.core.io.BFConvertWrapper` once the
+        manifest of the entry has been written.
+
+        :param entry: :class:`jicbioimage.core.io.FileBackend.Entry`
+        :param workers: number of decoding threads; defaults to the number
+                        of CPUs
+        :raises: ValueError if the images of a series are not two
+                 dimensional images of the same shape and dtype
+        """
+        manifest_fpath = os.path.join(entry.directory, "manifest.json")
+        entries, _ = _read_manifest(manifest_fpath)
+        series = {}
+        for e in entries:
+            series.setdefault(e["series"], []).append(e)
+        positions = {}
+        for s, planes in series.items():
+            positions.update(self._store_series(entry.directory, s, planes,
+                                                workers))
+
+        manifest = Manifest()
+        for e in entries:
+            os.remove(os.path.join(entry.directory, e["filename"]))
+            array_t, array_c, array_z = positions[id(e)]
+            metadata = dict(e)
+            metadata.update(filename="S{}.zarr".format(e["series"]),
+                            array_t=array_t,
+                            array_c=array_c,
+                            array_z=array_z)
+            manifest.add(**metadata)
+        manifest.write(manifest_fpath)
+
+    def _store_series(self, directory, s, planes, workers=None):
+        """Write the planes of a series to a chunked array.
+
+        Planes are written a block of chunks along z at a time, so that
+        chunks spanning a single time point and channel are written once and
+        never read back.
+
+        :param directory: entry directory
+        :param s: series
+        :param planes: manifest entries of the series
+        :param workers: number of decoding threads
+        :raises: ValueError
+        :returns: dictionary mapping the id of each manifest entry to its
+                  (t, c, z) position in the array
+        """
+        timepoints = sorted(set(e["timepoint"] for e in planes))
+        channels = sorted(set(e["channel"] for e in planes))
+        zslices = sorted(set(e["zslice"] for e in planes))
+        located = [(timepoints.index(e["timepoint"]),
+                    channels.index(e["channel"]),
+                    zslices.index(e["zslice"]),
+                    e) for e in planes]
+        located.sort(key=lambda item: item[:3])
+        # Planes are keyed on the identity of their manifest entry.
+        positions = dict((id(e), (t, c, z)) for t, c, z, e in located)
+
+        def read(item):
+            fpath = os.path.join(directory, item[3]["filename"])
+            return item[:3], _read_plane(fpath)
+
+        array_fpath = os.path.join(directory, "S{}.zarr".format(s))
+        array = None
+        block = None
+        block_start = None
+        if workers is None:
+            workers = _default_workers()
+        for (t, c, z), plane in _imap(read, located, workers,
+                                      max_in_flight=2 * workers):
+            if array is None:
+                if plane.ndim != 2:
+                    msg = "Series {} has {} dimensional images".format(
+                        s, plane.ndim)
+                    raise(ValueError(msg))
+                shape = (len(timepoints), len(channels), len(zslices))
+                array = chunked.ChunkedArray.create(
+                    array_fpath, shape + plane.shape, self.chunks,
+                    plane.dtype, compression=self.chunk_compression)
+            if plane.shape != array.shape[3:] or plane.dtype != array.dtype:
+                msg = "Series {} has images of different shapes or dtypes"
+                raise(ValueError(msg.format(s)))
+
+            start = (t, c, z - z % array.chunks[2])
+            if start != block_start:
+                if block is not None:
+                    self._write_block(array, block_start, block)
+                size = min(array.chunks[2], array.shape[2] - start[2])
+                block = np.full((size,) + plane.shape, array.fill_value,
+                                dtype=array.dtype)
+                block_start = start
+            block[z - start[2]] = plane
+        if block is not None:
+            self._write_block(array, block_start, block)
+        return positions
+
+    @staticmethod
+    def _write_block(array, start, block):
+        t, c, z = start
+        array[t, c, z:z + len(block)] = block
+
+
+class PackedBackend(FileBackend):
+    """Class for storing the images of each entry in a single container file.
+
+    The images converted by bfconvert are decoded and their pixels written
+    back to back to the :attr:`CONTAINER` file of the entry, after which
+    they are removed. The manifest acts as the offset index of the
+    container: each entry records the "offset", "shape" and "dtype" of its
+    image. This keeps the number of files per entry constant, which makes
+    listing, hashing and opening entries on network file systems cheap.
+
+    The proxy images of a collection share a memory map of the container,
+    see :class:`jicbioimage.core.image.PackedProxyImage`, so reading an
+    image does not open a file.
+
+    Images are stored uncompressed, so that they can be read in place; the
+    compression option of :class:`jicbioimage.core.io.FileBackend` is not
+    supported.
+    """
+
+    #: Name of the container file of an entry.
+    CONTAINER = "planes.bin"
+
+    def __init__(self, directory, **kwargs):
+        """Initialise a backend.
+
+        :param directory: location of the backend
+        :param kwargs: see :class:`jicbioimage.core.io.FileBackend`
+        :raises: ValueError if a compression is given
+        """
+        if kwargs.get("compression") is not None:
+            raise(ValueError("Packed backends store images uncompressed"))
+        super(PackedBackend, self).__init__(directory, **kwargs)
+
+    def finalise_entry(self, entry, workers=None):
+        """Pack the converted images of an entry into its container file.
+
+        Called by :class:`jicbioimage.core.io.BFConvertWrapper` once the
+        manifest of the entry has been written.
+
+        :param entry: :class:`jicbioimage.core.io.FileBackend.Entry`
+        :param workers: number of decoding threads; defaults to the number
+                        of CPUs
+        """
+        manifest_fpath = os.path.join(entry.directory, "manifest.json")
+        entries, _ = _read_manifest(manifest_fpath)
+
+        def read(e):
+            return _read_plane(os.path.join(entry.directory, e["filename"]))
+
+        if workers is None:
+            workers = _default_workers()
+        container_fpath = os.path.join(entry.directory, self.CONTAINER)
+        manifest = Manifest()
+        with packed.PackedWriter(container_fpath) as writer:
+            planes = _imap(read, entries, min(workers, len(entries)),
+                           max_in_flight=2 * workers)
+            for e, plane in zip(entries, planes):
+                metadata = dict(e)
+                metadata.update(filename=self.CONTAINER,
+                                offset=writer.add(plane),
+                                shape=list(plane.shape),
+                                dtype=plane.dtype.str)
+                manifest.add(**metadata)
+        for e in entries:
+            os.remove(os.path.join(entry.directory, e["filename"]))
+        manifest.write(manifest_fpath)
+
+
+class ConverterWorker(object):
+    """Long running converter processes taking bfconvert jobs over pipes.
+
+    Experimental: this class may change or be removed without notice. No
+    worker program ships with this package or with the bftools, and it is
+    not yet shown that a worker saves the start up time of the JVM.
+
+    Every bfconvert command starts a Java virtual machine, which can take
+    longer than converting a small file. A converter worker process keeps
+    running and converts one file after another. It reads one JSON request
+    per line from its stdin, where "args" are the arguments of the
+    bfconvert command::
+
+        {"id": 1, "args": ["-nolookup", "in.lif", "S%s_C%c_Z%z_T%t.tif"]}
+
+    and writes one JSON response per line to its stdout::
+
+        {"id": 1, "returncode": 0, "stdout": "", "stderr": ""}
+
+    The command can start any program implementing the protocol, e.g. one
+    calling the bfconvert image converter repeatedly in a single JVM. The
+    only implementation exercised so far is the stand-in used by the
+    tests, which runs the stand-in bfconvert script for every job.
+
+    A process that exits, that does not answer a job with its response or
+    that does not answer within the timeout, is killed and the job is
+    tried again on a new process. Jobs that still fail raise RuntimeError,
+    on which :class:`jicbioimage.core.io.BFConvertWrapper` runs bfconvert
+    in a new process instead. The output of the failed attempts is
+    removed before a job is run again.
+    """
+
+    def __init__(self, command, processes=1, retries=1, timeout=None):
+        """Initialise the worker; processes are started when needed.
+
+        :param command: command starting a worker process, as a list
+        :param processes: maximum number of worker processes, each running
+                          one job at a time
+        :param retries: number of new processes a job is tried on after the
+                        process running it failed
+        :param timeout: number of seconds to wait for the response to a
+                        job; None waits for as long as the process runs
+        """
+        self.command = list(command)
+        self.processes = processes
+        self.retries = retries
+        self.timeout = timeout
+        self.started = 0
+        self._slots = threading.BoundedSemaphore(processes)
+        self._lock = threading.Lock()
+        self._idle = []
+        self._next_id = 0
+        self._closed = False
+
+    def _start(self):
+        """Return a new worker process.
+
+        :raises: RuntimeError
+        """
+        try:
+            proc = subprocess.Popen(self.command, stdin=subprocess.PIPE,
+                                    stdout=subprocess.PIPE)
+        except OSError as e:
+            msg = 'Could not start the converter worker {}\n{}'.format(
+                self.command, e)
+            raise(RuntimeError(msg))
+        with self._lock:
+            self.started += 1
+        return proc
+
+    def _checkout(self):
+        """Return an idle worker process, starting one if there is none."""
+        with self._lock:
+            if self._closed:
+                raise(RuntimeError("The converter worker is closed"))
+            while self._idle:
+                proc = self._idle.pop()
+                if proc.poll() is None:
+                    return proc
+                self._discard(proc)
+        return self._start()
+
+    def _checkin(self, proc):
+        """Return a worker process to the idle processes."""
+        with self._lock:
+            if not self._closed:
+                self._idle.append(proc)
+                return
+        self._stop(proc)
+
+    @staticmethod
+    def _discard(proc):
+        """Kill a worker process."""
+        if proc.poll() is None:
+            proc.kill()
+        proc.wait()
+        proc.stdin.close()
+        proc.stdout.close()
+
+    @staticmethod
+    def _stop(proc):
+        """Ask a worker process to exit by closing its stdin."""
+        try:
+            proc.stdin.close()
+        except (IOError, OSError):
+            pass
+        proc.wait()
+        proc.stdout.close()
+
+    def _request(self, proc, args):
+        """Run a job in a worker process.
+
+        :raises: RuntimeError if the process failed
+        :returns: tuple of return code, stdout and stderr
+        """
+        with self._lock:
+            self._next_id += 1
+            job_id = self._next_id
+        request = json.dumps(dict(id=job_id, args=list(args))) + "\n"
+        try:
+            proc.stdin.write(request.encode("utf-8"))
+            proc.stdin.flush()
+            line = self._readline(proc)
+        except (IOError, OSError) as e:
+            raise(RuntimeError("Lost the converter worker\n{}".format(e)))
+        if not line:
+            raise(RuntimeError("The converter worker exited"))
+        try:
+            response = json.loads(line.decode("utf-8"))
+            if response["id"] != job_id:
+                raise(ValueError("answer to job {}".format(response["id"])))
+            returncode = int(response.get("returncode", 0))
+            stdout = response.get("stdout", "").encode("utf-8")
+            stderr = response.get("stderr", "").encode("utf-8")
+        except (ValueError, KeyError, TypeError, AttributeError) as e:
+            msg = "Bad response from the converter worker\n{}".format(e)
+            raise(RuntimeError(msg))
+        return returncode, stdout, stderr
+
+    def _readline(self, proc):
+        """Read a line from a worker process within the timeout.
+
+        The line is read in a thread, so that a process that does not
+        answer can be killed.
+
+        :raises: RuntimeError if the process did not answer in time
+        :returns: line as bytes; empty if the process exited
+        """
+        if self.timeout is None:
+            return proc.stdout.readline()
+        result = []
+
+        def read():
+            try:
+                result.append(proc.stdout.readline())
+            except (IOError, OSError, ValueError) as e:
+                result.append(e)
+
+        thread = threading.Thread(target=read)
+        thread.daemon = True
+        thread.start()
+        thread.join(self.timeout)
+        if thread.is_alive():
+            # Killing the process ends the read.
+            proc.kill()
+            thread.join()
+            msg = "The converter worker did not answer within {} seconds"
+            raise(RuntimeError(msg.format(self.timeout)))
+        if isinstance(result[0], Exception):
+            raise(IOError(str(result[0])))
+        return result[0]
+
+    def run(self, args, on_retry=None):
+        """Run a bfconvert job once a worker process is free.
+
+        :param args: arguments of the bfconvert command
+        :param on_retry: function called before the job is tried again on
+                         a new process, e.g. to remove the output of the
+                         failed attempt
+        :raises: RuntimeError if the job could not be run
+        :returns: tuple of return code, stdout and stderr of the job
+        """
+        with self._slots:
+            error = None
+            for attempt in range(self.retries + 1):
+                if attempt > 0 and on_retry is not None:
+                    on_retry()
+                proc = self._checkout()
+                try:
+                    result = self._request(proc, args)
+                except RuntimeError as e:
+                    self._discard(proc)
+                    error = e
+                    continue
+                self._checkin(proc)
+                return result
+        raise(error)
+
+    def close(self):
+        """Stop the idle worker processes; busy ones stop after their job."""
+        with self._lock:
+            self._closed = True
+            idle = self._idle
+            self._idle = []
+        for proc in idle:
+            self._stop(proc)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, type, value, tb):
+        self.close()
 
 
 class BFConvertWrapper(object):
     """Class for unpacking microscopy files using bfconvert."""
 
-    def __init__(self, backend):
+    def __init__(self, backend, workers=1, max_processes=None,
+                 converter_worker=None):
+        """Initialise the wrapper.
+
+        :param backend: backend to convert files into
+        :param workers: maximum number of bfconvert processes converting the
+                        series of a file concurrently
+        :param max_processes: maximum number of bftools processes run by the
+                              wrapper at any one time, over all the files
+                              being converted; unlimited by default
+        :param converter_worker: :class:`jicbioimage.core.io.ConverterWorker`
+                                 running the bfconvert commands; commands
+                                 are run in a new bfconvert process if it
+                                 fails
+        """
         self.backend = backend
+        self.converter_worker = converter_worker
+        self.workers = workers
+        self.max_processes = max_processes
+        self._process_slots = None
+        if max_processes is not None:
+            self._process_slots = threading.BoundedSemaphore(max_processes)
         self._split_order = ['s', 'c', 'z', 't']
 
     def split_pattern(self, win32=False):
@@ -148,27 +1631,47 @@ class BFConvertWrapper(object):
                 patterns.append('{}%{}'.format(p.capitalize(), p))
         return '_'.join(patterns)
 
-    def manifest(self, entry):
+    def manifest(self, entry, workers=None):
         """Returns manifest as a list.
 
+        The images are hashed, and their meta data parsed from their file
+        names, in a thread pool; the manifest lists them in file name order.
+        For backends storing compressed images every entry records whether
+        its image is "compressed", so that only those images are decoded
+        with :func:`jicbioimage.core.util.tiff.read`.
+
         :param entry: :class:`jicbioimage.core.io.FileBackend.Entry`
+        :param workers: number of threads; defaults to the number of CPUs
         :returns: :class:`jicbioimage.core.io.Manifest`
         """
-        m = Manifest()
-        for fname in _sorted_listdir(entry.directory):
-            if fname == 'manifest.json':
-                continue
+        compressed_backend = getattr(self.backend, "compression",
+                                     None) is not None
+
+        def metadata(fname):
             fpath = os.path.join(entry.directory, fname)
             md5_hexdigest = _md5_hexdigest_from_file(fpath)
-            metadata = self.metadata_from_fname(fname, md5_hexdigest)
-            m.add(**metadata)
+            item = self.metadata_from_fname(fname, md5_hexdigest)
+            if compressed_backend:
+                item["compressed"] = _is_compressed_tiff(fpath)
+            return item
+
+        fnames = [fname for fname in _sorted_listdir(entry.directory)
+                  if fname not in ('manifest.json', 'manifest.npz')]
+        if workers is None:
+            workers = _default_workers()
+        workers = min(workers, len(fnames))
+        m = Manifest()
+        for item in _imap(metadata, fnames, workers,
+                          max_in_flight=2 * workers):
+            m.add(**item)
         return m
 
-    def run_command(self, input_file, output_dir=None):
+    def run_command(self, input_file, output_dir=None, series=None):
         """Return the command for running bfconvert as a list.
 
         :param input_file: path to microscopy image to be converted
         :param ouput_dir: directory to write output tiff files to
+        :param series: only convert this series
         :returns: list
         """
         base_name = os.path.basename(input_file)
@@ -180,7 +1683,189 @@ class BFConvertWrapper(object):
             output_file = '{}.tif'.format(self.split_pattern(win32=True))
         if output_dir:
             output_file = os.path.join(output_dir, output_file)
-        return [bfconvert, "-nolookup", input_file, output_file]
+        cmd = [bfconvert, "-nolookup"]
+        if series is not None:
+            cmd.extend(["-series", str(series)])
+        return cmd + [input_file, output_file]
+
+    def series_count_command(self, input_file):
+        """Return the command for running showinf as a list.
+
+        :param input_file: path to microscopy image
+        :returns: list
+        """
+        showinf = 'showinf'
+        if sys.platform == 'win32':
+            showinf = 'showinf.bat'
+        return [showinf, "-nopix", "-no-upgrade", input_file]
+
+    def series_count(self, input_file):
+        """Return the number of series in a microscopy file.
+
+        :param input_file: path to microscopy image
+        :raises: RuntimeError
+        :returns: int
+        """
+        cmd = self.series_count_command(input_file)
+        try:
+            returncode, stdout, stderr = self._popen(cmd)
+        except OSError as e:
+            msg = 'showinf tool not found in PATH\n{}'.format(e)
+            raise(RuntimeError(msg))
+        return self._parse_series_count(input_file, returncode, stdout,
+                                        stderr)
+
+    @staticmethod
+    def _parse_series_count(input_file, returncode, stdout, stderr):
+        """Return the number of series from the output of showinf.
+
+        :raises: RuntimeError
+        :returns: int
+        """
+        match = re.search(br"Series count = (\d+)", stdout)
+        if returncode != 0 or match is None:
+            msg = "Could not find the series count of {}\n{}".format(
+                input_file, stderr)
+            raise(RuntimeError(msg))
+        return int(match.group(1))
+
+    def _popen(self, cmd):
+        """Run a command once a process slot is free.
+
+        :param cmd: command as a list
+        :returns: tuple of return code, stdout and stderr
+        """
+        if self._process_slots is not None:
+            self._process_slots.acquire()
+        try:
+            p = subprocess.Popen(cmd, stdout=subprocess.PIPE,
+                                 stderr=subprocess.PIPE)
+            stdout, stderr = p.communicate()
+        finally:
+            if self._process_slots is not None:
+                self._process_slots.release()
+        return p.returncode, stdout, stderr
+
+    def _run_in_worker(self, cmd):
+        """Run a bfconvert command in the converter worker, if there is one.
+
+        The job takes a process slot, as the worker process running it is a
+        JVM like a bfconvert process.
+
+        :param cmd: command as a list
+        :returns: tuple of return code, stdout and stderr, or None if the
+                  command has to be run in a new process
+        """
+        if self.converter_worker is None:
+            return None
+        if self._process_slots is not None:
+            self._process_slots.acquire()
+        try:
+            return self._worker_job(cmd)
+        finally:
+            if self._process_slots is not None:
+                self._process_slots.release()
+
+    def _worker_job(self, cmd):
+        """Run a bfconvert command in the converter worker.
+
+        The output of attempts that failed is removed, as bfconvert does
+        not overwrite existing files.
+
+        :param cmd: command as a list
+        :returns: tuple of return code, stdout and stderr, or None if the
+                  worker failed
+        """
+        def clear_output():
+            self._clear_output(cmd)
+
+        try:
+            return self.converter_worker.run(cmd[1:], on_retry=clear_output)
+        except RuntimeError:
+            clear_output()
+            return None
+
+    @staticmethod
+    def _clear_output(cmd):
+        """Remove the files written by a bfconvert command.
+
+        :param cmd: command as a list, see :meth:`run_command`
+        """
+        series = None
+        if "-series" in cmd:
+            series = cmd[cmd.index("-series") + 1]
+        directory, name = os.path.split(cmd[-1])
+        parts = re.split(r"%%?([sczt])", name)
+        pattern = re.escape(parts[0])
+        for i in range(1, len(parts), 2):
+            if parts[i] == "s" and series is not None:
+                pattern += re.escape(series)
+            else:
+                pattern += r"\d+"
+            pattern += re.escape(parts[i + 1])
+        pattern = re.compile(pattern + "$")
+        for fname in os.listdir(directory or os.curdir):
+            if pattern.match(fname):
+                os.remove(os.path.join(directory, fname))
+
+    def _run(self, cmd):
+        """Run a bfconvert command.
+
+        :param cmd: command as a list
+        :raises: RuntimeError
+        """
+        result = self._run_in_worker(cmd)
+        if result is None:
+            try:
+                result = self._popen(cmd)
+            except OSError as e:
+                msg = 'bfconvert tool not found in PATH\n{}'.format(e)
+                raise(RuntimeError(msg))
+        returncode, stdout, stderr = result
+        self._check_output(stdout, stderr)
+
+    @staticmethod
+    def _check_output(stdout, stderr):
+        """Raise if the output of bfconvert reports a problem.
+
+        :raises: RuntimeError
+        """
+        if len(stderr) > 0:
+            raise(RuntimeError(stderr))
+        if stdout.startswith(b"Found unknown command flag"):
+            msg = "Problem running bfconvert\n"
+            msg = msg + stdout
+            msg = msg + "\nPlease upgrade bftools to version 5.2.1"
+            msg = msg + " or greater"
+            msg = msg + "\nhttp://downloads.openmicroscopy.org"
+            msg = msg + "/bio-formats/5.2.1/artifacts/bftools.zip"
+            raise(RuntimeError(msg))
+
+    def _convert(self, input_file, output_dir):
+        """Convert a file, splitting the work over its series.
+
+        When more than one worker is allowed, and the file has more than
+        one series, one bfconvert process is run per series with at most
+        :attr:`workers` processes running at a time. The processes write
+        disjoint sets of files into the same output directory.
+
+        :param input_file: path to the microscopy file
+        :param output_dir: directory to write output tiff files to
+        :raises: RuntimeError
+        """
+        num_series = 1
+        if self.workers > 1:
+            num_series = self.series_count(input_file)
+        if num_series == 1:
+            self._run(self.run_command(input_file, output_dir))
+            return
+        cmds = [self.run_command(input_file, output_dir, series=s)
+                for s in range(num_series)]
+        workers = min(self.workers, num_series)
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            # Consume the results to raise the first error.
+            for _ in executor.map(self._run, cmds):
+                pass
 
     def metadata_from_fname(self, fname, md5_hexdigest):
         """Return meta data extracted from file name.
@@ -207,21 +1892,45 @@ class BFConvertWrapper(object):
                     zslice=args[2],
                     timepoint=args[3])
 
-    def already_converted(self, fpath):
+    def already_converted(self, fpath, key=None):
         """Return true if the file already has a manifest file in the backend.
 
         :param fpath: potential path to the manifest file
+        :param key: key of the backend entry for the file, if already known
         :returns: bool
         """
+        if key is None:
+            key = self.entry_key(fpath)
         manifest_fpath = os.path.join(self.backend.directory,
-                                      _md5_hexdigest_from_file(fpath),
+                                      key,
                                       'manifest.json')
         return os.path.isfile(manifest_fpath)
 
-    def __call__(self, input_file):
+    def entry_key(self, fpath, strict=False):
+        """Return the key of the backend entry for a file.
+
+        Backends that do not provide an ``entry_key`` method are keyed on
+        the md5 hex digest of the file. The strict argument is only passed
+        on when it is set, so that the method of a backend may take the
+        file path alone.
+
+        :param fpath: path to the microscopy file
+        :param strict: hash the file even if the backend has cached its key
+        :returns: name of the entry subdirectory
+        """
+        entry_key = getattr(self.backend, "entry_key", None)
+        if entry_key is None:
+            return _md5_hexdigest_from_file(fpath)
+        if strict:
+            return entry_key(fpath, strict=True)
+        return entry_key(fpath)
+
+    def __call__(self, input_file, key=None, keep=()):
         """Run the conversion.
 
-        Unpacks the microscopy file and creates the manifest file.
+        Unpacks the microscopy file and creates the manifest file. If
+        :attr:`workers` is greater than one the series of the file are
+        converted by concurrent bfconvert processes.
 
         This function creates an entry in a temporary directory.
         It then moves the entry directory from the temporary to the
@@ -237,40 +1946,76 @@ class BFConvertWrapper(object):
         a directory inside the docker container and then copying the
         result over to the mounted volume.
 
+        Only one thread or process converts a file into a backend at a time;
+        see :meth:`jicbioimage.core.io.FileBackend.entry_lock`. The others
+        wait for the conversion to finish and reuse its result.
+
+        Backends with a capacity are garbage collected after the
+        conversion, keeping the new entry and the entries in keep.
+
         :param input_file: path to the microscopy file
+        :param key: key of the backend entry for the file, if already known
+        :param keep: keys of other entries not to remove, e.g. entries
+                     whose images are still being read
         :raises: RuntimeError
         :returns: path to manifest file
         """
+        if key is None:
+            key = self.entry_key(input_file)
 
+        lock = self.entry_lock(key)
+        if lock is not None:
+            lock.acquire()
+        try:
+            if not self.already_converted(input_file, key=key):
+                self._convert_entry(input_file, key)
+            manifest_fpath = self._register(key, input_file)
+        finally:
+            if lock is not None:
+                lock.release()
+        self._collect_garbage(key, keep)
+        return manifest_fpath
+
+    def _collect_garbage(self, key, keep=()):
+        """Garbage collect a backend with a capacity, keeping entries.
+
+        :param key: key of the backend entry to keep
+        :param keep: keys of other entries to keep, read when collecting
+        """
+        if getattr(self.backend, "capacity", None) is not None:
+            self.backend.gc(keep=set(keep) | set([key]))
+
+    def entry_lock(self, key):
+        """Return the lock serialising the creation of a backend entry.
+
+        :param key: key of the backend entry
+        :returns: :class:`jicbioimage.core.io.EntryLock` or None if the
+                  backend does not provide locks
+        """
+        entry_lock = getattr(self.backend, "entry_lock", None)
+        if entry_lock is None:
+            return None
+        return entry_lock(key)
+
+    def _convert_entry(self, input_file, key):
+        """Convert a file into a backend entry; the entry lock must be held.
+
+        :param input_file: path to the microscopy file
+        :param key: key of the backend entry for the file
+        :raises: RuntimeError
+        """
         # Create an entry in a temporary directory.
         tempdir = tempfile.mkdtemp()
-        entry = FileBackend.Entry(tempdir, input_file)
+        entry = FileBackend.Entry(tempdir, input_file, key=key)
         try:
-            cmd = self.run_command(input_file, entry.directory)
-            try:
-                p = subprocess.Popen(cmd, stdout=subprocess.PIPE,
-                                     stderr=subprocess.PIPE)
-                stdout, stderr = p.communicate()
-            except OSError as e:
-                msg = 'bfconvert tool not found in PATH\n{}'.format(e)
-                raise(RuntimeError(msg))
-            if len(stderr) > 0:
-                raise(RuntimeError(stderr))
-            if stdout.startswith(b"Found unknown command flag"):
-                msg = "Problem running bfconvert\n"
-                msg = msg + stdout
-                msg = msg + "\nPlease upgrade bftools to version 5.2.1"
-                msg = msg + " or greater"
-                msg = msg + "\nhttp://downloads.openmicroscopy.org"
-                msg = msg + "/bio-formats/5.2.1/artifacts/bftools.zip"
-                raise(RuntimeError(msg))
-            manifest_fpath = os.path.join(entry.directory, "manifest.json")
-            manifest = self.manifest(entry)
-            with open(manifest_fpath, 'w') as fh:
-                fh.write(manifest.json)
+            self._convert(input_file, entry.directory)
+            self._compress_images(entry)
+            self._write_manifest(entry)
+            self._finalise_entry(entry)
 
             # Move the entry created in the temporary directory to the backend
-            # directory.
+            # directory, replacing the remains of an interrupted move.
+            self._remove_incomplete_entry(key)
             shutil.move(entry.directory, self.backend.directory)
         finally:
             # Remove the temporary directory
@@ -279,26 +2024,514 @@ class BFConvertWrapper(object):
         # Ensure that we have cleaned up after ourselves.
         assert not os.path.isdir(tempdir)
 
-        # Return path to manifest file in backend directory.
-        return os.path.join(self.backend.directory,
-                            entry.md5_hexdigest,
-                            "manifest.json")
+    def _remove_incomplete_entry(self, key):
+        """Remove an entry directory without a manifest file.
 
+        :param key: key of the backend entry
+        """
+        directory = os.path.join(self.backend.directory, key)
+        if os.path.isdir(directory):
+            shutil.rmtree(directory)
 
-class DataManager(list):
-    """Manage :class:`jicbioimage.core.image.ImageCollection` instances."""
+    def _compress_images(self, entry, workers=None):
+        """Recompress the converted images with the codec of the backend.
+
+        Images that cannot be decoded by
+        :func:`jicbioimage.core.util.tiff.read` are left as converted.
+        Images that are not integers are compressed without a predictor.
+
+        :param entry: :class:`jicbioimage.core.io.FileBackend.Entry`
+        :param workers: number of threads; defaults to the number of CPUs
+        """
+        compression = getattr(self.backend, "compression", None)
+        if compression is None:
+            return
+        options = PLANE_COMPRESSIONS[compression]
 
-    def __init__(self, backend=None):
+        def compress(fname):
+            fpath = os.path.join(entry.directory, fname)
+            try:
+                ifds = tiff.read_ifds(fpath, limit=2)
+                if len(ifds) != 1:
+                    return
+                ar = tiff.read(fpath)
+            except ValueError:
+                return
+            description = ifds[0].get(tiff.IMAGE_DESCRIPTION)
+            kwargs = dict(options)
+            if ar.dtype.kind not in "ui":
+                # Horizontal differencing is only defined for integers.
+                kwargs["predictor"] = False
+            tmp_fpath = fpath + ".tmp"
+            tiff.write(tmp_fpath, ar, description=description, **kwargs)
+            os.remove(fpath)
+            os.rename(tmp_fpath, fpath)
+
+        fnames = [fname for fname in _sorted_listdir(entry.directory)
+                  if os.path.splitext(fname)[1].lower() in (".tif", ".tiff")]
+        if workers is None:
+            workers = _default_workers()
+        for _ in _imap(compress, fnames, min(workers, len(fnames))):
+            pass
+
+    def _write_manifest(self, entry):
+        """Write the manifest file of a converted entry.
+
+        :param entry: :class:`jicbioimage.core.io.FileBackend.Entry`
+        """
+        manifest_fpath = os.path.join(entry.directory, "manifest.json")
+        manifest = self.manifest(entry)
+        manifest.write(manifest_fpath)
+
+    def _finalise_entry(self, entry):
+        """Let the backend change the layout of a converted entry.
+
+        Backends providing a ``finalise_entry`` method, such as the
+        :class:`jicbioimage.core.io.ChunkedBackend`, are passed the entry
+        once its manifest has been written.
+
+        :param entry: :class:`jicbioimage.core.io.FileBackend.Entry`
+        """
+        finalise_entry = getattr(self.backend, "finalise_entry", None)
+        if finalise_entry is not None:
+            finalise_entry(entry)
+
+    def _register(self, key, input_file):
+        """Record a converted entry in the backend index.
+
+        :param key: key of the backend entry
+        :param input_file: path to the microscopy file
+        :returns: path to manifest file in the backend
+        """
+        manifest_fpath = os.path.join(self.backend.directory,
+                                      key,
+                                      "manifest.json")
+        touch = getattr(self.backend, "touch", None)
+        if touch is not None:
+            touch(key)
+        index = getattr(self.backend, "index", None)
+        if index is not None:
+            if index.has_entry(key):
+                index.set_source(key, os.path.abspath(input_file))
+            else:
+                index.add_entry(key, manifest_fpath,
+                                os.path.abspath(input_file))
+        return manifest_fpath
+
+
+class TiffImporter(BFConvertWrapper):
+    """Class for loading TIFF files into a backend without converting them.
+
+    OME-TIFF, ImageJ and plain multi-page TIFF files whose pages are stored
+    uncompressed, in contiguous strips, are imported natively. The pages are
+    located from the TIFF IFDs, and their position in each series from the
+    OME-XML or ImageJ metadata; the pages of plain multi-page TIFF files are
+    taken to be time points, as Bio-Formats does.
+
+    The backend entry of an imported file holds a manifest and a symbolic
+    link, :attr:`SOURCE`, to the file. The manifest entries record the
+    offset of each page in the file, so that images are read in place by
+    :class:`jicbioimage.core.image.PackedProxyImage` instances and no image
+    data is copied. The link is updated by :meth:`relink` whenever the
+    entry is loaded from a file with the same content at another path.
+
+    Files that cannot be imported natively, e.g. because their pages are
+    compressed, raise ValueError, so that they can be converted with
+    bfconvert instead. So do all files if the backend compresses or
+    otherwise changes the images it stores, as imported images are left
+    as they are in the file.
+
+    Imported entries depend on the file remaining where it was imported
+    from, and unchanged: moving or deleting the file breaks the entry
+    until it is loaded again from its new path, and editing the file in
+    place changes the images read from it. The manifest entries have no
+    ``md5_hexdigest``, and the ``fpath`` of their proxy images is the
+    whole multi-page file rather than a file holding the image.
+    """
+
+    #: Name of the link to the imported file in a backend entry.
+    SOURCE = "source.tif"
+
+    #: Extensions of the files that may be imported.
+    EXTENSIONS = (".tif", ".tiff")
+
+    def can_import(self, fpath):
+        """Return True if the file may be imported natively.
+
+        Only the backend and the file extension are checked; see
+        :meth:`planes`.
+
+        :param fpath: path to the input file
+        :returns: bool
+        """
+        if not self.stores_images_as_is():
+            return False
+        return os.path.splitext(fpath)[1].lower() in self.EXTENSIONS
+
+    def stores_images_as_is(self):
+        """Return True if the backend stores converted images unchanged.
+
+        Backends with a compression, or with a ``finalise_entry`` method
+        changing the layout of converted entries, do not.
+
+        :returns: bool
+        """
+        if getattr(self.backend, "compression", None) is not None:
+            return False
+        return getattr(self.backend, "finalise_entry", None) is None
+
+    def planes(self, fpath):
+        """Return the manifest entries of the images of a TIFF file.
+
+        :param fpath: path to the TIFF file
+        :raises: ValueError if the file cannot be imported natively
+        :returns: list of dictionaries with the keys "offset", "shape",
+                  "dtype", "series", "channel", "zslice" and "timepoint"
+        """
+        ifds = tiff.read_ifds(fpath)
+        byteorder = tiff.read_byteorder(fpath)
+        if len(ifds) == 0:
+            raise(ValueError("TIFF file contains no images"))
+        description = ifds[0].get(tiff.IMAGE_DESCRIPTION)
+        imagej = tiff.imagej_metadata(description)
+        if ome.is_ome_xml(description):
+            pages = [(ifds[i], s, c, z, t)
+                     for i, s, c, z, t in ome.plane_ifds(description,
+                                                         len(ifds))]
+        elif imagej is not None:
+            pages = self._imagej_pages(ifds, imagej)
+        else:
+            # Leave out reduced resolution versions of the images.
+            pages = [ifd for ifd in ifds
+                     if not ifd.get(tiff.NEW_SUBFILE_TYPE, (0,))[0] & 1]
+            pages = [(ifd, 0, 0, 0, t) for t, ifd in enumerate(pages)]
+
+        file_size = os.path.getsize(fpath)
+        planes = []
+        for page, s, c, z, t in pages:
+            ifd, offset = page, None
+            if isinstance(page, tuple):
+                ifd, offset = page
+            data_range = tiff.ifd_data_range(ifd)
+            if data_range is None:
+                msg = "Images in {} are compressed or not contiguous"
+                raise(ValueError(msg.format(fpath)))
+            if offset is None:
+                offset = data_range[0]
+            if offset + data_range[1] > file_size:
+                raise(ValueError("Image data in {} is truncated".format(
+                    fpath)))
+            shape = tiff.ifd_shape(ifd)
+            if len(shape) != 2:
+                msg = "Images in {} have several samples per pixel"
+                raise(ValueError(msg.format(fpath)))
+            planes.append(dict(offset=int(offset),
+                               shape=list(shape),
+                               dtype=tiff.ifd_dtype(ifd, byteorder).str,
+                               series=s,
+                               channel=c,
+                               zslice=z,
+                               timepoint=t))
+        return planes
+
+    @staticmethod
+    def _imagej_pages(ifds, metadata):
+        """Return the pages of an ImageJ file and their positions.
+
+        ImageJ stores the planes of a hyperstack with the channels varying
+        fastest, then the z-slices and then the time points. Files larger
+        than 4 GB only have an IFD for the first plane, the other planes
+        following it in the file.
+
+        :returns: list of (IFD or (IFD, offset), series, channel, zslice,
+                  timepoint) tuples
+        """
+        try:
+            images = int(metadata.get("images", len(ifds)))
+            channels = int(metadata.get("channels", 1))
+            slices = int(metadata.get("slices", 1))
+            frames = int(metadata.get("frames", 1))
+        except ValueError as e:
+            raise(ValueError("Malformed ImageJ metadata: {}".format(e)))
+        if channels * slices * frames != images:
+            channels, slices, frames = 1, images, 1
+        pages = []
+        for i in range(images):
+            c = i % channels
+            z = (i // channels) % slices
+            t = i // (channels * slices)
+            if i < len(ifds):
+                page = ifds[i]
+            else:
+                data_range = tiff.ifd_data_range(ifds[0])
+                if data_range is None:
+                    raise(ValueError("ImageJ file has missing images"))
+                page = (ifds[0], data_range[0] + i * data_range[1])
+            pages.append((page, 0, c, z, t))
+        return pages
+
+    def __call__(self, input_file, key=None, keep=()):
+        """Import a TIFF file into the backend.
+
+        See :meth:`jicbioimage.core.io.BFConvertWrapper.__call__`.
+
+        :param input_file: path to the TIFF file
+        :param key: key of the backend entry for the file, if already known
+        :param keep: keys of other entries not to remove
+        :raises: ValueError if the file cannot be imported natively
+        :returns: path to manifest file
+        """
+        return super(TiffImporter, self).__call__(input_file, key=key,
+                                                  keep=keep)
+
+    def _convert_entry(self, input_file, key):
+        """Import a file into a backend entry; the entry lock must be held.
+
+        :param input_file: path to the TIFF file
+        :param key: key of the backend entry for the file
+        :raises: ValueError
+        """
+        if not self.stores_images_as_is():
+            msg = "Cannot import {} natively into a {}".format(
+                input_file, type(self.backend).__name__)
+            raise(ValueError(msg))
+        planes = self.planes(input_file)
+        tempdir = tempfile.mkdtemp()
+        try:
+            entry = FileBackend.Entry(tempdir, input_file, key=key)
+            self._link(entry.directory, input_file)
+            manifest = Manifest()
+            for plane in planes:
+                manifest.add(self.SOURCE, **plane)
+            manifest.write(os.path.join(entry.directory, "manifest.json"))
+            self._remove_incomplete_entry(key)
+            shutil.move(entry.directory, self.backend.directory)
+        finally:
+            shutil.rmtree(tempdir)
+
+    def _link(self, directory, input_file):
+        """Create the link to an imported file in an entry directory.
+
+        :raises: ValueError if symbolic links cannot be created
+        """
+        link = os.path.join(directory, self.SOURCE)
+        tmp_link = "{}.{}".format(link, uuid.uuid4().hex)
+        try:
+            os.symlink(os.path.abspath(input_file), tmp_link)
+            os.rename(tmp_link, link)
+        except (AttributeError, NotImplementedError, OSError) as e:
+            msg = "Cannot link to {}: {}".format(input_file, e)
+            raise(ValueError(msg))
+
+    def relink(self, key, input_file):
+        """Point the entry of an imported file at another copy of the file.
+
+        Entries that were not imported natively are left untouched.
+
+        :param key: key of the backend entry
+        :param input_file: path to a file with the content of the entry
+        """
+        directory = os.path.join(self.backend.directory, key)
+        link = os.path.join(directory, self.SOURCE)
+        if not os.path.islink(link):
+            return
+        if os.readlink(link) == os.path.abspath(input_file):
+            return
+        try:
+            self._link(directory, input_file)
+        except ValueError:
+            # The backend may be read only.
+            pass
+
+
+class DataManager(list):
+    """Manage :class:`jicbioimage.core.image.ImageCollection` instances.
+
+    The backend entries of the files loaded by a data manager are in use
+    for as long as the data manager exists: garbage collection after its
+    conversions does not remove them from under their collections.
+    """
+
+    def __init__(self, backend=None, max_processes=None, native_tiff=False,
+                 converter_worker=None):
+        """Initialise the data manager.
+
+        :param backend: backend to convert files into; defaults to a
+                        :class:`jicbioimage.core.io.FileBackend` in the
+                        directory jicbioimage.core_backend
+        :param max_processes: maximum number of bftools processes, each
+                              running a JVM, at any one time; applies
+                              separately to :meth:`load` and :meth:`aload`
+        :param native_tiff: whether to load TIFF files that the
+                            :class:`jicbioimage.core.io.TiffImporter` can
+                            import without converting them with bfconvert;
+                            the imported entries link to the files, which
+                            must then be left in place
+        :param converter_worker: :class:`jicbioimage.core.io.ConverterWorker`
+                                 running the bfconvert commands
+        """
         if backend is None:
             dirpath = os.path.join(os.getcwd(), 'jicbioimage.core_backend')
             backend = FileBackend(directory=dirpath)
         self.backend = backend
-        self.convert = BFConvertWrapper(self.backend)
+        self.convert = BFConvertWrapper(self.backend,
+                                        max_processes=max_processes,
+                                        converter_worker=converter_worker)
+        self.import_tiff = None
+        if native_tiff:
+            self.import_tiff = TiffImporter(self.backend)
+        self.aconvert = None
+        if sys.version_info >= (3, 5):
+            from jicbioimage.core.aio import AsyncBFConvertWrapper
+            self.aconvert = AsyncBFConvertWrapper(
+                self.convert, max_concurrent=max_processes)
+        self._key_locks = {}
+        self._key_locks_lock = threading.Lock()
+        self._keys_in_use = set()
+
+    def _key_lock(self, key):
+        """Return the lock serialising the conversion of a backend entry."""
+        with self._key_locks_lock:
+            return self._key_locks.setdefault(key, threading.Lock())
+
+    def _use(self, key):
+        """Record that a backend entry is in use and return the entries in
+        use.
+
+        The set returned is live: conversions running concurrently see the
+        entries recorded after they started when they collect garbage.
+
+        :param key: key of the backend entry
+        :returns: set of keys
+        """
+        with self._key_locks_lock:
+            self._keys_in_use.add(key)
+        return self._keys_in_use
 
-    def load(self, fpath):
+    def load(self, fpath, strict=False):
         """Load a microscopy file.
 
         :param fpath: path to microscopy file
+        :param strict: hash the file even if the backend has cached its key
+        :returns: :class:`jicbioimage.core.image.ImageCollection`
+        """
+        collection = self._load(fpath, strict)
+        self.append(collection)
+        return collection
+
+    def aload(self, fpath, strict=False):
+        """Return a coroutine loading a microscopy file; requires Python 3.5.
+
+        The file is converted by :attr:`aconvert`, a
+        :class:`jicbioimage.core.aio.AsyncBFConvertWrapper`, and hashing and
+        manifest parsing are run in the default executor of the event loop.
+
+        :param fpath: path to microscopy file
+        :param strict: hash the file even if the backend has cached its key
+        :returns: coroutine returning a
+                  :class:`jicbioimage.core.image.ImageCollection`
+        """
+        from jicbioimage.core.aio import aload
+        return aload(self, fpath, strict)
+
+    def iter_load(self, fpaths, lookahead=2, workers=None, strict=False):
+        """Yield the collections of microscopy files, converting ahead.
+
+        While the caller works on the collection of one file the next
+        lookahead files are hashed, converted and parsed in a thread pool.
+        The collections are yielded, and appended to the data manager, in
+        the order of the files.
+
+        :param fpaths: iterable of paths to microscopy files
+        :param lookahead: number of files to load ahead of the one yielded
+        :param workers: number of files loaded concurrently; defaults to
+                        lookahead + 1
+        :param strict: hash the files even if the backend has cached their
+                       keys
+        """
+        if workers is None:
+            workers = lookahead + 1
+
+        def load(fpath):
+            return self._load(fpath, strict)
+
+        # A pool is used even with one worker, to load ahead of the caller.
+        for collection in _pool_imap(load, fpaths, max(workers, 1),
+                                     max_in_flight=lookahead + 1):
+            self.append(collection)
+            yield collection
+
+    def load_many(self, fpaths, workers=None, strict=False):
+        """Load microscopy files concurrently.
+
+        :param fpaths: iterable of paths to microscopy files
+        :param workers: number of files loaded concurrently; defaults to the
+                        number of CPUs
+        :param strict: hash the files even if the backend has cached their
+                       keys
+        :returns: list of :class:`jicbioimage.core.image.ImageCollection`
+                  instances in the order of the files
+        """
+        if workers is None:
+            workers = _default_workers()
+        workers = max(workers, 1)
+        return list(self.iter_load(fpaths, lookahead=workers - 1,
+                                   workers=workers, strict=strict))
+
+    def _load(self, fpath, strict=False):
+        """Return the collection of a microscopy file.
+
+        :param fpath: path to microscopy file
+        :param strict: hash the file even if the backend has cached its key
+        :returns: :class:`jicbioimage.core.image.ImageCollection`
+        """
+        key = self.convert.entry_key(fpath, strict=strict)
+        keep = self._use(key)
+        with self._key_lock(key):
+            path_to_manifest = self._converted_manifest(fpath, key)
+            if path_to_manifest is None:
+                path_to_manifest = self._import(fpath, key, keep)
+            if path_to_manifest is None:
+                path_to_manifest = self.convert(fpath, key=key, keep=keep)
+        return self._collection(fpath, path_to_manifest)
+
+    def _import(self, fpath, key, keep=()):
+        """Import a TIFF file without converting it, if possible.
+
+        :param fpath: path to microscopy file
+        :param key: key of the backend entry for the file
+        :param keep: keys of other entries not to remove
+        :returns: path to manifest file or None if the file has to be
+                  converted
+        """
+        if self.import_tiff is None or not self.import_tiff.can_import(fpath):
+            return None
+        try:
+            return self.import_tiff(fpath, key=key, keep=keep)
+        except ValueError:
+            return None
+
+    def _converted_manifest(self, fpath, key):
+        """Return the manifest of an already converted file, or None.
+
+        Records the file as the source of the entry in the backend index.
+
+        :param fpath: path to microscopy file
+        :param key: key of the backend entry for the file
+        :returns: path to manifest file or None
+        """
+        if not self.convert.already_converted(fpath, key=key):
+            return None
+        if self.import_tiff is not None:
+            self.import_tiff.relink(key, fpath)
+        return self.convert._register(key, fpath)
+
+    def _collection(self, fpath, path_to_manifest):
+        """Return the collection of a converted microscopy file.
+
+        :param fpath: path to microscopy file
+        :param path_to_manifest: path to the manifest of its backend entry
+        :returns: :class:`jicbioimage.core.image.ImageCollection`
         """
         def is_microscopy_item(fpath):
             """Return True if the fpath is likely to be microscopy data.
@@ -314,18 +2547,26 @@ class DataManager(list):
                 return False
             return True
 
-        if not self.convert.already_converted(fpath):
-            path_to_manifest = self.convert(fpath)
-        else:
-            path_to_manifest = os.path.join(self.backend.directory,
-                                            _md5_hexdigest_from_file(fpath),
-                                            'manifest.json')
-
-        collection = None
+        collection_class = ImageCollection
         if is_microscopy_item(fpath):
-            collection = MicroscopyCollection(path_to_manifest)
-        else:
-            collection = ImageCollection(path_to_manifest)
-        self.append(collection)
+            collection_class = MicroscopyCollection
+        manifest_cache = getattr(self.backend, "manifest_cache", None)
+        if manifest_cache is None:
+            return collection_class(path_to_manifest)
+        return manifest_cache.load(path_to_manifest, collection_class)
 
-        return collection
+    def query(self, sql, params=()):
+        """Return the rows resulting from a SQL query of the backend index.
+
+        See :class:`jicbioimage.core.io.BackendIndex` for the tables that
+        can be queried.
+
+        :param sql: SQL statement
+        :param params: parameters to substitute into the statement
+        :raises: RuntimeError
+        :returns: list of tuples
+        """
+        index = getattr(self.backend, "index", None)
+        if index is None:
+            raise(RuntimeError("The backend has no index"))
+        return index.query(sql, params)
@@ -32,6 +32,38 @@ def normalise(array):
     return (array.astype(np.float) - min_val) / array_range
 
 
+def _normalise_key(key, shape):
+    """Return basic index expanded to one int or slice per dimension.
+
+    :param key: index passed to __getitem__
+    :param shape: shape of the indexed array
+    :raises: IndexError
+    :returns: tuple
+    """
+    if not isinstance(key, tuple):
+        key = (key,)
+    if any(k is Ellipsis for k in key):
+        i = [k is Ellipsis for k in key].index(True)
+        fill = (slice(None),) * (len(shape) - len(key) + 1)
+        key = key[:i] + fill + key[i + 1:]
+    if len(key) > len(shape):
+        raise(IndexError("Too many indices for array"))
+    key = key + (slice(None),) * (len(shape) - len(key))
+    normalised = []
+    for k, n in zip(key, shape):
+        if isinstance(k, slice):
+            normalised.append(k)
+        elif isinstance(k, (int, np.integer)):
+            k = int(k)
+            if not -n <= k < n:
+                raise(IndexError("Index {} out of bounds".format(k)))
+            normalised.append(k % n)
+        else:
+            raise(IndexError("Only integers, slices and Ellipsis are valid "
+                             "indices"))
+    return tuple(normalised)
+
+
 def reduce_stack(array3D, z_function):
     """Return 2D array projection of the input 3D array.
 
@@ -0,0 +1,281 @@
+"""Module for storing N-dimensional arrays as directories of chunk files.
+
+The layout follows version 2 of the zarr storage specification. A directory
+holds a json header, ``.zarray``, describing the shape, chunk shape and dtype
+of the array, and one file per chunk named after the index of the chunk along
+each dimension, e.g. ``0.1.0.2.3``. Chunks are stored in C order, optionally
+zlib compressed, and chunks that were never written read as the fill value.
+
+Reading a box out of the array only reads the chunks that it overlaps.
+
+>>> from jicbioimage.core.util.chunked import ChunkedArray
+>>> ar = ChunkedArray.create("S0.zarr", shape=(1, 2, 30, 512, 512),
+...                          chunks=(1, 1, 1, 256, 256),
+...                          dtype="uint16")  # doctest: +SKIP
+>>> ar[0, 1, 10:20] = stack  # doctest: +SKIP
+>>> box = ar[0, 1, 10:20, 100:150, 300:400]  # doctest: +SKIP
+
+"""
+
+import os
+import json
+import zlib
+import itertools
+
+import numpy as np
+
+from jicbioimage.core.util.array import _normalise_key
+
+#: Name of the header file of a chunked array.
+HEADER = ".zarray"
+
+#: Names of the supported chunk compressors.
+COMPRESSIONS = (None, "zlib")
+
+
+class ChunkedArray(object):
+    """N-dimensional array stored as one file per chunk."""
+
+    def __init__(self, directory):
+        """Open a chunked array.
+
+        :param directory: path to the directory of the array
+        :raises: ValueError if the array uses features that are not
+                 supported
+        """
+        self.directory = directory
+        with open(os.path.join(directory, HEADER)) as fh:
+            header = json.load(fh)
+        if header.get("zarr_format") != 2:
+            raise(ValueError("Unsupported chunked array format"))
+        if header.get("order", "C") != "C" or header.get("filters"):
+            raise(ValueError("Only C ordered arrays without filters are "
+                             "supported"))
+        compressor = header.get("compressor")
+        self.compression = None
+        self.level = None
+        if compressor is not None:
+            if compressor.get("id") != "zlib":
+                msg = "Unsupported compressor: {}".format(compressor)
+                raise(ValueError(msg))
+            self.compression = "zlib"
+            self.level = compressor.get("level", 1)
+        self.shape = tuple(header["shape"])
+        self.chunks = tuple(header["chunks"])
+        self.dtype = np.dtype(header["dtype"])
+        self.fill_value = header.get("fill_value")
+        if self.fill_value is None:
+            self.fill_value = 0
+        self._separator = header.get("dimension_separator", ".")
+
+    @classmethod
+    def create(cls, directory, shape, chunks, dtype, compression=None,
+               level=1, fill_value=0):
+        """Create an empty chunked array.
+
+        Chunk dimensions larger than the array are clipped to the array.
+
+        :param directory: path to the directory of the array; created if it
+                          does not exist
+        :param shape: shape of the array
+        :param chunks: shape of the chunks
+        :param dtype: data type of the array
+        :param compression: None or "zlib"
+        :param level: zlib compression level
+        :param fill_value: value of the elements of chunks not written
+        :raises: ValueError
+        :returns: :class:`jicbioimage.core.util.chunked.ChunkedArray`
+        """
+        if compression not in COMPRESSIONS:
+            msg = "Unknown compression: {}; expected None or zlib".format(
+                compression)
+            raise(ValueError(msg))
+        if len(chunks) != len(shape):
+            msg = "Chunks {} do not match the shape {}".format(chunks, shape)
+            raise(ValueError(msg))
+        if any(c < 1 for c in chunks):
+            raise(ValueError("Chunk dimensions must be positive"))
+        chunks = [max(1, min(int(c), int(n))) for c, n in zip(chunks, shape)]
+        compressor = None
+        if compression is not None:
+            compressor = dict(id=compression, level=level)
+        dtype = np.dtype(dtype)
+        header = dict(zarr_format=2,
+                      shape=[int(n) for n in shape],
+                      chunks=chunks,
+                      dtype=dtype.str,
+                      compressor=compressor,
+                      fill_value=np.array(fill_value, dtype=dtype).item(),
+                      order="C",
+                      filters=None,
+                      dimension_separator=".")
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        with open(os.path.join(directory, HEADER), "w") as fh:
+            json.dump(header, fh, sort_keys=True)
+        return cls(directory)
+
+    def __repr__(self):
+        return "<ChunkedArray shape={} chunks={} dtype={} object at {}>".format(
+            self.shape, self.chunks, self.dtype, hex(id(self)))
+
+    def __len__(self):
+        return self.shape[0]
+
+    @property
+    def ndim(self):
+        """Number of dimensions."""
+        return len(self.shape)
+
+    @property
+    def size(self):
+        """Number of elements."""
+        return int(np.prod(self.shape))
+
+    @property
+    def nbytes(self):
+        """Number of bytes of the materialised array."""
+        return self.size * self.dtype.itemsize
+
+    def chunk_fpath(self, index):
+        """Return the path to the file of a chunk.
+
+        :param index: tuple with the index of the chunk along each dimension
+        :returns: path
+        """
+        name = self._separator.join(str(i) for i in index)
+        return os.path.join(self.directory, name)
+
+    def read_chunk(self, index):
+        """Return a chunk as an array of the chunk shape.
+
+        :param index: tuple with the index of the chunk along each dimension
+        :returns: :class:`numpy.ndarray`, or None if the chunk has not been
+                  written
+        """
+        try:
+            with open(self.chunk_fpath(index), "rb") as fh:
+                data = fh.read()
+        except (IOError, OSError):
+            return None
+        if self.compression == "zlib":
+            data = zlib.decompress(data)
+        return np.frombuffer(data, dtype=self.dtype).reshape(self.chunks)
+
+    def write_chunk(self, index, chunk):
+        """Write a chunk.
+
+        :param index: tuple with the index of the chunk along each dimension
+        :param chunk: array of the chunk shape
+        """
+        data = np.ascontiguousarray(chunk, dtype=self.dtype).tobytes()
+        if self.compression == "zlib":
+            data = zlib.compress(data, self.level)
+        with open(self.chunk_fpath(index), "wb") as fh:
+            fh.write(data)
+
+    def _ranges(self, key):
+        """Return the elements selected by a basic index along each axis.
+
+        :returns: tuple (list of :class:`range`, tuple of the axes indexed
+                  by integers)
+        """
+        key = _normalise_key(key, self.shape)
+        ranges = []
+        for k, n in zip(key, self.shape):
+            if isinstance(k, slice):
+                ranges.append(range(*k.indices(n)))
+            else:
+                ranges.append(range(k, k + 1))
+        dropped = tuple(i for i, k in enumerate(key)
+                        if not isinstance(k, slice))
+        return ranges, dropped
+
+    def chunk_indices(self, key):
+        """Return the indices of the chunks read by indexing the array.
+
+        :param key: basic index, as passed to :func:`__getitem__`
+        :returns: list of tuples
+        """
+        ranges, _ = self._ranges(key)
+        per_axis = [sorted(set(i // c for i in r))
+                    for r, c in zip(ranges, self.chunks)]
+        return list(itertools.product(*per_axis))
+
+    def __getitem__(self, key):
+        ranges, dropped = self._ranges(key)
+        if any(len(r) == 0 for r in ranges):
+            result = np.empty(tuple(len(r) for r in ranges), dtype=self.dtype)
+            return result.squeeze(axis=dropped) if dropped else result
+
+        # Read the bounding box of the selection from the chunks it
+        # overlaps, then pick out the selected elements.
+        lo = [min(r) for r in ranges]
+        hi = [max(r) + 1 for r in ranges]
+        box = np.empty([h - l for l, h in zip(lo, hi)], dtype=self.dtype)
+        for index in self.chunk_indices(key):
+            target = []
+            source = []
+            for i, c, l, h in zip(index, self.chunks, lo, hi):
+                start = max(i * c, l)
+                stop = min((i + 1) * c, h)
+                target.append(slice(start - l, stop - l))
+                source.append(slice(start - i * c, stop - i * c))
+            chunk = self.read_chunk(index)
+            if chunk is None:
+                box[tuple(target)] = self.fill_value
+            else:
+                box[tuple(target)] = chunk[tuple(source)]
+
+        local = []
+        for r, l, h in zip(ranges, lo, hi):
+            if r.step > 0:
+                local.append(slice(0, h - l, r.step))
+            else:
+                local.append(slice(r.start - l, None, r.step))
+        result = box[tuple(local)]
+        if dropped:
+            result = result.squeeze(axis=dropped)
+        return result
+
+    def __setitem__(self, key, value):
+        ranges, dropped = self._ranges(key)
+        if any(r.step != 1 for r in ranges):
+            raise(IndexError("Only slices with a step of 1 can be assigned"))
+        if any(len(r) == 0 for r in ranges):
+            return
+        lo = [r.start for r in ranges]
+        hi = [r.stop for r in ranges]
+        shape = tuple(h - l for l, h in zip(lo, hi))
+        selected = tuple(n for i, n in enumerate(shape) if i not in dropped)
+        value = np.broadcast_to(np.asarray(value, dtype=self.dtype),
+                                selected).reshape(shape)
+
+        for index in self.chunk_indices(key):
+            target = []
+            source = []
+            covered = True
+            for i, c, n, l, h in zip(index, self.chunks, self.shape, lo, hi):
+                start = max(i * c, l)
+                stop = min((i + 1) * c, h)
+                target.append(slice(start - i * c, stop - i * c))
+                source.append(slice(start - l, stop - l))
+                if start > i * c or stop < min((i + 1) * c, n):
+                    covered = False
+
+            # Chunks only partly assigned keep their other elements.
+            chunk = None
+            if not covered:
+                chunk = self.read_chunk(index)
+            if chunk is None:
+                chunk = np.full(self.chunks, self.fill_value, dtype=self.dtype)
+            else:
+                chunk = chunk.copy()
+            chunk[tuple(target)] = value[tuple(source)]
+            self.write_chunk(index, chunk)
+
+    def __array__(self, dtype=None, copy=None):
+        array = self[...]
+        if dtype is not None:
+            array = array.astype(dtype, copy=False)
+        return array
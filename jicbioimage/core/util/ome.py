@@ -0,0 +1,127 @@
+"""Module for reading the layout of OME-TIFF files from their OME-XML.
+
+The OME-XML metadata block, stored in the ImageDescription tag of the first
+page of an OME-TIFF file, describes the size and dimension order of each
+image (series) in the file, and in its TiffData elements which page holds
+which plane.
+
+>>> from jicbioimage.core.util.tiff import read_ifds, IMAGE_DESCRIPTION
+>>> from jicbioimage.core.util.ome import plane_ifds
+>>> ifds = read_ifds("z-series.ome.tif")  # doctest: +SKIP
+>>> plane_ifds(ifds[0][IMAGE_DESCRIPTION], len(ifds))  # doctest: +SKIP
+[(0, 0, 0, 0, 0), (1, 0, 0, 1, 0), ...]
+
+"""
+
+import xml.etree.ElementTree as ElementTree
+
+
+def _local_name(tag):
+    """Return tag without its namespace."""
+    return tag.rsplit("}", 1)[-1]
+
+
+def _children(element, name):
+    return [child for child in element if _local_name(child.tag) == name]
+
+
+def is_ome_xml(description):
+    """Return True if an image description is an OME-XML metadata block.
+
+    :param description: text of the ImageDescription tag, or None
+    :returns: bool
+    """
+    return description is not None and "<OME" in description[:4096]
+
+
+def _plane_index(coordinates, dims, sizes):
+    """Return the index of a plane in the rasterisation of an image."""
+    index = 0
+    for d in reversed(dims):
+        index = index * sizes[d] + coordinates[d]
+    return index
+
+
+def _plane_coordinates(index, dims, sizes):
+    """Return the (c, z, t) of a plane from its index in the rasterisation."""
+    coordinates = {}
+    for d in dims:
+        coordinates[d] = index % sizes[d]
+        index //= sizes[d]
+    return coordinates["C"], coordinates["Z"], coordinates["T"]
+
+
+def plane_ifds(xml, num_ifds):
+    """Return the page holding each plane of the images of an OME-TIFF file.
+
+    Images without TiffData elements are taken to occupy consecutive pages,
+    following on from the previous image. Planes without a page are left
+    out.
+
+    :param xml: OME-XML metadata block
+    :param num_ifds: number of pages in the file
+    :raises: ValueError if the metadata cannot be parsed, or if planes are
+             stored in other files
+    :returns: list of (page, series, channel, zslice, timepoint) tuples
+    """
+    try:
+        root = ElementTree.fromstring(xml.encode("utf-8"))
+    except ElementTree.ParseError as e:
+        raise(ValueError("Malformed OME-XML: {}".format(e)))
+    if _children(root, "BinaryOnly"):
+        raise(ValueError("OME-XML is stored in a companion file"))
+    root_uuid = root.get("UUID")
+
+    planes = []
+    next_ifd = 0
+    for s, image in enumerate(_children(root, "Image")):
+        pixels = _children(image, "Pixels")
+        if len(pixels) != 1:
+            raise(ValueError("Image {} has no Pixels element".format(s)))
+        pixels = pixels[0]
+        order = pixels.get("DimensionOrder", "XYZCT")
+        dims = order[2:]
+        if sorted(dims) != ["C", "T", "Z"]:
+            raise(ValueError("Unknown dimension order: {}".format(order)))
+        try:
+            sizes = dict((d, int(pixels.get("Size" + d, 1))) for d in dims)
+        except ValueError as e:
+            raise(ValueError("Malformed OME-XML: {}".format(e)))
+        num_planes = sizes["C"] * sizes["Z"] * sizes["T"]
+
+        pages = {}
+        tiff_data = _children(pixels, "TiffData")
+        if len(tiff_data) == 0:
+            for index in range(num_planes):
+                pages[index] = next_ifd + index
+            next_ifd += num_planes
+        for element in tiff_data:
+            for uuid in _children(element, "UUID"):
+                if root_uuid is None or (uuid.text or "").strip() != root_uuid:
+                    raise(ValueError("Planes are stored in other files"))
+            try:
+                ifd = int(element.get("IFD", 0))
+                first = _plane_index(
+                    dict((d, int(element.get("First" + d, 0))) for d in dims),
+                    dims, sizes)
+                count = element.get("PlaneCount")
+                if count is not None:
+                    count = int(count)
+                elif "IFD" in element.attrib:
+                    count = 1
+                else:
+                    count = num_planes - first
+            except ValueError as e:
+                raise(ValueError("Malformed OME-XML: {}".format(e)))
+            for k in range(min(count, num_planes - first)):
+                pages[first + k] = ifd + k
+            next_ifd = max(next_ifd, ifd + count)
+
+        for index in sorted(pages):
+            if pages[index] >= num_ifds:
+                msg = "Plane {} of image {} is on missing page {}".format(
+                    index, s, pages[index])
+                raise(ValueError(msg))
+            c, z, t = _plane_coordinates(index, dims, sizes)
+            planes.append((pages[index], s, c, z, t))
+    return planes
@@ -0,0 +1,136 @@
+"""Module for storing many images back to back in a single container file.
+
+A container file holds the raw, C ordered, pixels of each image, starting at
+offsets aligned to :data:`ALIGNMENT` bytes. It has no header: the offset,
+shape and dtype of each image are recorded elsewhere, e.g. in the manifest of
+a backend entry. Any file holding raw pixels, such as a TIFF file storing its
+images uncompressed, can be read as a container.
+
+>>> from jicbioimage.core.util.packed import PackedFile, PackedWriter
+>>> with PackedWriter("planes.bin") as writer:  # doctest: +SKIP
+...     offset = writer.add(ar)
+>>> packed_file = PackedFile("planes.bin")
+>>> ar = packed_file.read(offset, ar.shape, ar.dtype)  # doctest: +SKIP
+
+Reads are served from a memory map of the container, so that a container is
+opened once however many images are read from it.
+"""
+
+import mmap
+import threading
+
+import numpy as np
+
+#: Alignment of the images in a container, in bytes.
+ALIGNMENT = 64
+
+
+class PackedWriter(object):
+    """Class for writing images to a container file."""
+
+    def __init__(self, fpath):
+        """Initialise a writer, truncating the container file.
+
+        :param fpath: path to the container file
+        """
+        self.fpath = fpath
+        self._fh = open(fpath, "wb")
+        self._offset = 0
+
+    def add(self, ar):
+        """Append an image to the container.
+
+        :param ar: :class:`numpy.ndarray`
+        :returns: offset of the image in the container
+        """
+        padding = -self._offset % ALIGNMENT
+        if padding:
+            self._fh.write(b"\0" * padding)
+            self._offset += padding
+        offset = self._offset
+        data = np.ascontiguousarray(ar)
+        self._fh.write(data.data)
+        self._offset += data.nbytes
+        return offset
+
+    def close(self):
+        """Finish writing the container."""
+        self._fh.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, type, value, tb):
+        self.close()
+
+
+class PackedFile(object):
+    """Read only access to the images in a container file.
+
+    The container is memory mapped on the first read; pickled instances map
+    it again when they are first read from.
+    """
+
+    def __init__(self, fpath):
+        """Initialise access to a container.
+
+        :param fpath: path to the container file
+        """
+        self.fpath = fpath
+        self._mmap = None
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        return dict(fpath=self.fpath)
+
+    def __setstate__(self, state):
+        self.__init__(state["fpath"])
+
+    def _map(self):
+        with self._lock:
+            if self._mmap is None:
+                with open(self.fpath, "rb") as fh:
+                    self._mmap = mmap.mmap(fh.fileno(), 0,
+                                           access=mmap.ACCESS_READ)
+            return self._mmap
+
+    def view(self, offset, shape, dtype):
+        """Return a read only view of an image in the memory map.
+
+        :param offset: offset of the image in the container
+        :param shape: shape of the image
+        :param dtype: dtype of the image
+        :raises: ValueError if the image extends beyond the container
+        :returns: :class:`numpy.ndarray`
+        """
+        dtype = np.dtype(dtype)
+        count = int(np.prod(shape))
+        mm = self._map()
+        if offset + count * dtype.itemsize > len(mm):
+            msg = "Image at offset {} extends beyond {}".format(offset,
+                                                                self.fpath)
+            raise(ValueError(msg))
+        ar = np.frombuffer(mm, dtype=dtype, count=count, offset=offset)
+        return ar.reshape(shape)
+
+    def read(self, offset, shape, dtype):
+        """Return a copy of an image in native byte order.
+
+        :param offset: offset of the image in the container
+        :param shape: shape of the image
+        :param dtype: dtype of the image
+        :raises: ValueError if the image extends beyond the container
+        :returns: :class:`numpy.ndarray`
+        """
+        ar = self.view(offset, shape, dtype)
+        return ar.astype(ar.dtype.newbyteorder("="))
+
+    def close(self):
+        """Unmap the container; it is mapped again by the next read.
+
+        :raises: BufferError if views of the container are still in use
+        """
+        with self._lock:
+            if self._mmap is not None:
+                self._mmap.close()
+                self._mmap = None
@@ -0,0 +1,488 @@
+"""Module for reading and writing TIFF files.
+
+Both classic TIFF and BigTIFF files can be read. :func:`read_header` only
+parses the image file directories (IFDs) and never reads the pixel data.
+
+>>> from jicbioimage.core.util.tiff import read_header
+>>> shape, dtype = read_header("S0_C0_Z0_T0.tif")  # doctest: +SKIP
+
+:func:`ifd_data_range` locates the pixels of images stored uncompressed and
+contiguously, so that they can be read in place.
+
+:func:`read` decodes stripped images that are uncompressed or deflate
+compressed, with or without horizontal differencing, and :func:`write`
+writes such images.
+
+>>> from jicbioimage.core.util.tiff import read, write
+>>> write("compressed.tif", read("S0_C0_Z0_T0.tif"),
+...       compression="deflate", predictor=True)  # doctest: +SKIP
+
+"""
+
+import struct
+import zlib
+
+import numpy as np
+
+NEW_SUBFILE_TYPE = 254
+IMAGE_WIDTH = 256
+IMAGE_LENGTH = 257
+BITS_PER_SAMPLE = 258
+COMPRESSION = 259
+PHOTOMETRIC_INTERPRETATION = 262
+IMAGE_DESCRIPTION = 270
+STRIP_OFFSETS = 273
+SAMPLES_PER_PIXEL = 277
+ROWS_PER_STRIP = 278
+STRIP_BYTE_COUNTS = 279
+PLANAR_CONFIGURATION = 284
+PREDICTOR = 317
+SAMPLE_FORMAT = 339
+
+#: Mapping from compression names to TIFF Compression values.
+COMPRESSIONS = {None: 1, "deflate": 8}
+
+#: TIFF Compression values of deflate; 32946 is the obsolete value.
+_DEFLATE = (8, 32946)
+
+#: Mapping from TIFF field types to (struct format, size in bytes).
+_FIELD_TYPES = {
+    1: ("B", 1),   # BYTE
+    2: ("s", 1),   # ASCII
+    3: ("H", 2),   # SHORT
+    4: ("I", 4),   # LONG
+    5: ("I", 8),   # RATIONAL (pair of LONG)
+    6: ("b", 1),   # SBYTE
+    7: ("B", 1),   # UNDEFINED
+    8: ("h", 2),   # SSHORT
+    9: ("i", 4),   # SLONG
+    10: ("i", 8),  # SRATIONAL (pair of SLONG)
+    11: ("f", 4),  # FLOAT
+    12: ("d", 8),  # DOUBLE
+    13: ("I", 4),  # IFD
+    16: ("Q", 8),  # LONG8
+    17: ("q", 8),  # SLONG8
+    18: ("Q", 8),  # IFD8
+}
+
+#: Mapping from TIFF SampleFormat values to numpy dtype kinds.
+_SAMPLE_KINDS = {1: "u", 2: "i", 3: "f"}
+
+
+class _Layout(object):
+    """Sizes and struct formats of a classic TIFF or a BigTIFF file."""
+
+    def __init__(self, byteorder, bigtiff):
+        self.byteorder = byteorder
+        self.bigtiff = bigtiff
+        if bigtiff:
+            self.count_format = byteorder + "Q"
+            self.entry_format = byteorder + "HHQ"
+            self.offset_format = byteorder + "Q"
+            self.value_size = 8
+        else:
+            self.count_format = byteorder + "H"
+            self.entry_format = byteorder + "HHI"
+            self.offset_format = byteorder + "I"
+            self.value_size = 4
+        self.count_size = struct.calcsize(self.count_format)
+        self.entry_size = struct.calcsize(self.entry_format) + self.value_size
+        self.offset_size = struct.calcsize(self.offset_format)
+
+
+def _read_layout(fh):
+    """Return the layout of the file and the offset of the first IFD.
+
+    :param fh: file handle opened in binary mode
+    :raises: ValueError
+    :returns: tuple (:class:`_Layout`, offset)
+    """
+    fh.seek(0)
+    head = fh.read(16)
+    if head[:2] == b"II":
+        byteorder = "<"
+    elif head[:2] == b"MM":
+        byteorder = ">"
+    else:
+        raise(ValueError("Not a TIFF file"))
+    magic, = struct.unpack(byteorder + "H", head[2:4])
+    if magic == 42:
+        layout = _Layout(byteorder, bigtiff=False)
+        offset, = struct.unpack(byteorder + "I", head[4:8])
+    elif magic == 43:
+        layout = _Layout(byteorder, bigtiff=True)
+        offset, = struct.unpack(byteorder + "Q", head[8:16])
+    else:
+        raise(ValueError("Not a TIFF file"))
+    return layout, offset
+
+
+def _read_value(fh, layout, field_type, count, raw):
+    """Return the value of an IFD entry.
+
+    :param fh: file handle opened in binary mode
+    :param layout: :class:`_Layout`
+    :param field_type: TIFF field type
+    :param count: number of values
+    :param raw: bytes of the value/offset field of the entry
+    :returns: tuple of values, or string for ASCII fields
+    """
+    if field_type not in _FIELD_TYPES:
+        return None
+    fmt, size = _FIELD_TYPES[field_type]
+    nbytes = size * count
+    if nbytes <= layout.value_size:
+        data = raw[:nbytes]
+    else:
+        offset, = struct.unpack(layout.offset_format, raw)
+        position = fh.tell()
+        fh.seek(offset)
+        data = fh.read(nbytes)
+        fh.seek(position)
+    if field_type == 2:
+        return data.rstrip(b"\0").decode("utf-8", "replace")
+    if field_type in (5, 10):
+        count = count * 2
+    return struct.unpack("{}{}{}".format(layout.byteorder, count, fmt), data)
+
+
+def _iter_ifds(fh, layout, offset):
+    """Yield the IFDs of a TIFF file as dictionaries keyed on tag code.
+
+    :param fh: file handle opened in binary mode
+    :param layout: :class:`_Layout`
+    :param offset: offset of the first IFD
+    """
+    seen = set()
+    while offset and offset not in seen:
+        seen.add(offset)
+        fh.seek(offset)
+        num_entries, = struct.unpack(layout.count_format,
+                                     fh.read(layout.count_size))
+        entries = fh.read(num_entries * layout.entry_size)
+        ifd = {}
+        for i in range(num_entries):
+            entry = entries[i * layout.entry_size:(i + 1) * layout.entry_size]
+            tag, field_type, count = struct.unpack(
+                layout.entry_format, entry[:-layout.value_size])
+            ifd[tag] = _read_value(fh, layout, field_type, count,
+                                   entry[-layout.value_size:])
+        yield ifd
+        offset, = struct.unpack(layout.offset_format,
+                                fh.read(layout.offset_size))
+
+
+def read_ifds(fpath, limit=None):
+    """Return the image file directories of a TIFF file.
+
+    Each IFD is a dictionary mapping tag codes to tuples of values (or strings
+    for ASCII tags).
+
+    :param fpath: path to TIFF file
+    :param limit: maximum number of IFDs to read
+    :raises: ValueError
+    :returns: list of dictionaries
+    """
+    ifds = []
+    with open(fpath, "rb") as fh:
+        layout, offset = _read_layout(fh)
+        try:
+            for ifd in _iter_ifds(fh, layout, offset):
+                ifds.append(ifd)
+                if limit is not None and len(ifds) >= limit:
+                    break
+        except struct.error as e:
+            raise(ValueError("Malformed TIFF file: {}".format(e)))
+    return ifds
+
+
+def read_byteorder(fpath):
+    """Return the byte order of a TIFF file.
+
+    :param fpath: path to TIFF file
+    :raises: ValueError
+    :returns: "<" or ">"
+    """
+    with open(fpath, "rb") as fh:
+        layout, _ = _read_layout(fh)
+    return layout.byteorder
+
+
+def ifd_shape(ifd):
+    """Return the shape of the image described by an IFD.
+
+    :param ifd: dictionary returned by :func:`read_ifds`
+    :returns: tuple
+    """
+    width = ifd[IMAGE_WIDTH][0]
+    length = ifd[IMAGE_LENGTH][0]
+    samples = ifd.get(SAMPLES_PER_PIXEL, (1,))[0]
+    if samples == 1:
+        return (length, width)
+    return (length, width, samples)
+
+
+def ifd_dtype(ifd, byteorder="="):
+    """Return the numpy dtype of the samples described by an IFD.
+
+    :param ifd: dictionary returned by :func:`read_ifds`
+    :param byteorder: byte order of the dtype, defaults to native
+    :raises: ValueError
+    :returns: :class:`numpy.dtype`
+    """
+    bits = set(ifd.get(BITS_PER_SAMPLE, (1,)))
+    formats = set(ifd.get(SAMPLE_FORMAT, (1,)))
+    if len(bits) != 1 or len(formats) != 1:
+        raise(ValueError("Mixed sample types are not supported"))
+    bits = bits.pop()
+    kind = _SAMPLE_KINDS.get(formats.pop())
+    if kind is None or bits not in (8, 16, 32, 64):
+        raise(ValueError("Unsupported sample type"))
+    dtype = np.dtype("{}{}".format(kind, bits // 8))
+    return dtype.newbyteorder(byteorder)
+
+
+def read_header(fpath):
+    """Return the shape and dtype of the first image in a TIFF file.
+
+    Only the header of the file is read. The dtype is given in native byte
+    order, i.e. as it will be once decoded.
+
+    :param fpath: path to TIFF file
+    :raises: ValueError
+    :returns: tuple (shape, :class:`numpy.dtype`)
+    """
+    try:
+        ifds = read_ifds(fpath, limit=1)
+        if len(ifds) == 0:
+            raise(ValueError("TIFF file contains no images"))
+        return ifd_shape(ifds[0]), ifd_dtype(ifds[0])
+    except (struct.error, KeyError, IndexError, TypeError) as e:
+        raise(ValueError("Malformed TIFF file: {}".format(e)))
+
+
+def ifd_compression(ifd):
+    """Return the TIFF Compression value of the image described by an IFD.
+
+    :param ifd: dictionary returned by :func:`read_ifds`
+    :returns: int
+    """
+    return ifd.get(COMPRESSION, (1,))[0]
+
+
+def imagej_metadata(description):
+    """Return the metadata of an image description written by ImageJ.
+
+    :param description: text of the ImageDescription tag, or None
+    :returns: dictionary of strings, e.g. {"channels": "2", "slices": "5"},
+              or None if the description was not written by ImageJ
+    """
+    if description is None or not description.startswith("ImageJ="):
+        return None
+    metadata = {}
+    for line in description.splitlines():
+        key, sep, value = line.partition("=")
+        if sep:
+            metadata[key.strip()] = value.strip()
+    return metadata
+
+
+def ifd_data_range(ifd):
+    """Return where the pixels of an image are stored in the file, if in place.
+
+    Only images stored uncompressed, in strips that follow each other in the
+    file, can be read in place.
+
+    :param ifd: dictionary returned by :func:`read_ifds`
+    :returns: tuple (offset, number of bytes) or None if the pixels cannot be
+              read in place
+    """
+    if ifd_compression(ifd) != 1 or STRIP_OFFSETS not in ifd:
+        return None
+    if ifd.get(SAMPLES_PER_PIXEL, (1,))[0] != 1:
+        if ifd.get(PLANAR_CONFIGURATION, (1,))[0] != 1:
+            return None
+    if ifd.get(PREDICTOR, (1,))[0] != 1:
+        return None
+    try:
+        shape = ifd_shape(ifd)
+        dtype = ifd_dtype(ifd)
+        offsets = ifd[STRIP_OFFSETS]
+        counts = ifd[STRIP_BYTE_COUNTS]
+    except (ValueError, KeyError, IndexError, TypeError):
+        return None
+    nbytes = int(np.prod(shape)) * dtype.itemsize
+    for i in range(1, len(offsets)):
+        if offsets[i] != offsets[i - 1] + counts[i - 1]:
+            return None
+    if len(offsets) == 0 or sum(counts) < nbytes:
+        return None
+    return offsets[0], nbytes
+
+
+def _decode_ifd(fh, layout, ifd):
+    """Return the pixels of the image described by an IFD.
+
+    :param fh: file handle opened in binary mode
+    :param layout: :class:`_Layout`
+    :param ifd: dictionary returned by :func:`_iter_ifds`
+    :raises: ValueError
+    :returns: :class:`numpy.ndarray`
+    """
+    compression = ifd_compression(ifd)
+    if compression != 1 and compression not in _DEFLATE:
+        raise(ValueError("Unsupported compression: {}".format(compression)))
+    if STRIP_OFFSETS not in ifd:
+        raise(ValueError("Only stripped images are supported"))
+    if ifd.get(PLANAR_CONFIGURATION, (1,))[0] != 1:
+        raise(ValueError("Only chunky planar configuration is supported"))
+    predictor = ifd.get(PREDICTOR, (1,))[0]
+    if predictor not in (1, 2):
+        raise(ValueError("Unsupported predictor: {}".format(predictor)))
+
+    shape = ifd_shape(ifd)
+    dtype = ifd_dtype(ifd, layout.byteorder)
+    nbytes = int(np.prod(shape)) * dtype.itemsize
+    buf = bytearray(nbytes)
+    position = 0
+    for offset, count in zip(ifd[STRIP_OFFSETS], ifd[STRIP_BYTE_COUNTS]):
+        if position >= nbytes:
+            break
+        fh.seek(offset)
+        data = fh.read(count)
+        if compression in _DEFLATE:
+            data = zlib.decompress(data)
+        size = min(len(data), nbytes - position)
+        buf[position:position + size] = memoryview(data)[:size]
+        position += size
+    if position < nbytes:
+        raise(ValueError("Image data is truncated"))
+    ar = np.frombuffer(buf, dtype=dtype).reshape(shape)
+    ar = ar.astype(dtype.newbyteorder("="), copy=False)
+    if predictor == 2:
+        if ar.dtype.kind not in "ui":
+            raise(ValueError("Horizontal differencing of non integers"))
+        np.cumsum(ar, axis=1, dtype=ar.dtype, out=ar)
+    return ar
+
+
+def read(fpath):
+    """Return the pixels of the first image in a TIFF file.
+
+    :param fpath: path to TIFF file
+    :raises: ValueError
+    :returns: :class:`numpy.ndarray` of shape (rows, columns) or
+              (rows, columns, samples)
+    """
+    try:
+        with open(fpath, "rb") as fh:
+            layout, offset = _read_layout(fh)
+            for ifd in _iter_ifds(fh, layout, offset):
+                return _decode_ifd(fh, layout, ifd)
+    except (struct.error, KeyError, IndexError, TypeError, zlib.error) as e:
+        raise(ValueError("Malformed TIFF file: {}".format(e)))
+    raise(ValueError("TIFF file contains no images"))
+
+
+def write(fpath, ar, compression=None, predictor=False, level=6,
+          description=None):
+    """Write an image to a little endian TIFF file.
+
+    The image is written in strips of about 256 KiB.
+
+    :param fpath: path to TIFF file
+    :param ar: :class:`numpy.ndarray` of shape (rows, columns) or
+               (rows, columns, samples)
+    :param compression: None or "deflate"
+    :param predictor: whether to apply horizontal differencing before
+                      compressing, which makes smooth integer images
+                      compress better
+    :param level: zlib compression level
+    :param description: text stored in the ImageDescription tag
+    :raises: ValueError
+    """
+    if compression not in COMPRESSIONS:
+        raise(ValueError("Unsupported compression: {}".format(compression)))
+    if ar.ndim not in (2, 3):
+        raise(ValueError("Only 2D images with samples are supported"))
+    kinds = dict((kind, code) for code, kind in _SAMPLE_KINDS.items())
+    if ar.dtype.kind not in kinds or ar.dtype.itemsize not in (1, 2, 4, 8):
+        raise(ValueError("Unsupported dtype: {}".format(ar.dtype)))
+    if predictor and ar.dtype.kind not in "ui":
+        raise(ValueError("Horizontal differencing of non integers"))
+
+    ar = np.ascontiguousarray(ar, dtype=ar.dtype.newbyteorder("<"))
+    rows, columns = ar.shape[:2]
+    samples = 1 if ar.ndim == 2 else ar.shape[2]
+    if predictor:
+        diff = ar.copy()
+        diff[:, 1:] -= ar[:, :-1]
+        ar = diff
+    row_bytes = max(ar[:1].nbytes, 1)
+    rows_per_strip = max(1, min(rows, (256 * 1024) // row_bytes))
+    strips = []
+    for start in range(0, rows, rows_per_strip):
+        data = ar[start:start + rows_per_strip].tobytes()
+        if compression == "deflate":
+            data = zlib.compress(data, level)
+        strips.append(data)
+
+    photometric = 2 if samples in (3, 4) else 1
+    tags = [
+        (IMAGE_WIDTH, 4, (columns,)),
+        (IMAGE_LENGTH, 4, (rows,)),
+        (BITS_PER_SAMPLE, 3, (ar.dtype.itemsize * 8,) * samples),
+        (COMPRESSION, 3, (COMPRESSIONS[compression],)),
+        (PHOTOMETRIC_INTERPRETATION, 3, (photometric,)),
+        (STRIP_OFFSETS, 4, None),
+        (SAMPLES_PER_PIXEL, 3, (samples,)),
+        (ROWS_PER_STRIP, 4, (rows_per_strip,)),
+        (STRIP_BYTE_COUNTS, 4, tuple(len(data) for data in strips)),
+        (PLANAR_CONFIGURATION, 3, (1,)),
+        (PREDICTOR, 3, (2 if predictor else 1,)),
+        (SAMPLE_FORMAT, 3, (kinds[ar.dtype.kind],) * samples),
+    ]
+    if description is not None:
+        tags.insert(5, (IMAGE_DESCRIPTION, 2,
+                        description.encode("utf-8") + b"\0"))
+
+    # Layout: header, strips, out of line tag values, IFD.
+    offset = 8
+    strip_offsets = []
+    for data in strips:
+        strip_offsets.append(offset)
+        offset += len(data)
+    extra = bytearray()
+    entries = []
+    for tag, field_type, values in tags:
+        if tag == STRIP_OFFSETS:
+            values = tuple(strip_offsets)
+        if field_type == 2:
+            raw = values
+            count = len(raw)
+        else:
+            fmt = _FIELD_TYPES[field_type][0]
+            raw = struct.pack("<{}{}".format(len(values), fmt), *values)
+            count = len(values)
+        if len(raw) <= 4:
+            value = raw.ljust(4, b"\0")
+        else:
+            if (offset + len(extra)) % 2:
+                extra.append(0)
+            value = struct.pack("<I", offset + len(extra))
+            extra.extend(raw)
+        entries.append(struct.pack("<HHI", tag, field_type, count) + value)
+    ifd_offset = offset + len(extra)
+    if ifd_offset % 2:
+        extra.append(0)
+        ifd_offset += 1
+
+    with open(fpath, "wb") as fh:
+        fh.write(b"II" + struct.pack("<HI", 42, ifd_offset))
+        for data in strips:
+            fh.write(data)
+        fh.write(bytes(extra))
+        fh.write(struct.pack("<H", len(entries)))
+        for entry in entries:
+            fh.write(entry)
+        fh.write(struct.pack("<I", 0))
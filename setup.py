@@ -53,5 +53,6 @@ setup(name='jicbioimage.core',
         'numpy',
         'scipy',
         'scikit-image',
+        'futures; python_version < "3.0"',
       ]
 )
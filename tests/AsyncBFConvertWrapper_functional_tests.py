@@ -0,0 +1,145 @@
+"""AsyncBFConvertWrapper functional tests using stand-ins for the bftools."""
+
+import unittest
+import os
+import os.path
+import sys
+import shutil
+import time
+
+try:
+    from mock import patch
+except ImportError:
+    from unittest.mock import patch
+
+from .fake_bftools import (
+    FakeBFToolsTestCase,
+    TMP_DIR,
+    max_concurrent_calls,
+    write_input,
+)
+
+
+@unittest.skipIf(sys.version_info < (3, 5), 'requires asyncio')
+class AsyncBFConvertWrapperFunctionalTests(FakeBFToolsTestCase):
+
+    def test_aload(self):
+        from .coroutines import run
+        from jicbioimage.core.image import MicroscopyCollection
+        from jicbioimage.core.io import DataManager, FileBackend
+        backend = FileBackend(os.path.join(TMP_DIR, 'backend'), index=True)
+        data_manager = DataManager(backend)
+        timings = []
+        data_manager.aconvert.on_timing = \
+            lambda fpath, phase, seconds: timings.append(phase)
+        fpath = write_input('plate.lif', series=2, channels=2, zslices=1,
+                            timepoints=1)
+
+        collection = run(data_manager.aload(fpath))
+        self.assertTrue(isinstance(collection, MicroscopyCollection))
+        self.assertEqual(len(collection), 4)
+        self.assertEqual(list(data_manager), [collection])
+        self.assertEqual(timings, ['hash', 'wait', 'convert', 'compress',
+                                   'manifest', 'move', 'parse'])
+        self.assertEqual(len(data_manager.query('SELECT * FROM planes')), 4)
+
+        # The manifest is the same as the one of a synchronous conversion.
+        key = backend.entry_key(fpath)
+        with open(os.path.join(backend.directory, key, 'manifest.json')) as fh:
+            async_manifest = fh.read()
+        shutil.rmtree(os.path.join(backend.directory, key))
+        with open(data_manager.convert(fpath)) as fh:
+            self.assertEqual(fh.read(), async_manifest)
+
+        # Loading an already converted file does not convert it again.
+        del timings[:]
+        collection = run(data_manager.aload(fpath))
+        self.assertEqual(len(collection), 4)
+        self.assertEqual(timings, ['hash', 'parse'])
+
+    def test_per_series_conversion(self):
+        from .coroutines import run
+        from jicbioimage.core.io import DataManager, FileBackend
+        backend = FileBackend(os.path.join(TMP_DIR, 'backend'))
+        data_manager = DataManager(backend)
+        data_manager.convert.workers = 3
+        fpath = write_input('plate.lif', series=3, channels=1, zslices=2,
+                            timepoints=1)
+        collection = run(data_manager.aload(fpath))
+        self.assertEqual(len(collection), 6)
+        with open(os.path.join(TMP_DIR, 'calls')) as fh:
+            self.assertEqual(len(fh.read().splitlines()), 3)
+
+    def test_max_concurrent(self):
+        from .coroutines import run, aload_all
+        from jicbioimage.core.io import DataManager, FileBackend
+        fpaths = [write_input('plate{}.lif'.format(i), series=1, channels=1,
+                              zslices=1, timepoints=1, delay=0.4, id=i)
+                  for i in range(3)]
+
+        def load_all(max_processes):
+            backend = FileBackend(os.path.join(
+                TMP_DIR, 'backend{}'.format(max_processes)))
+            data_manager = DataManager(backend, max_processes=max_processes)
+            run(aload_all(data_manager, fpaths))
+            most = max_concurrent_calls()
+            os.unlink(os.path.join(TMP_DIR, 'times'))
+            return most
+
+        self.assertEqual(load_all(1), 1)
+        self.assertGreater(load_all(3), 1)
+
+    def test_reuse_in_another_event_loop(self):
+        from .coroutines import run, aload_all
+        from jicbioimage.core.io import DataManager, FileBackend
+        backend = FileBackend(os.path.join(TMP_DIR, 'backend'))
+        data_manager = DataManager(backend, max_processes=1)
+
+        # Contend for the converter slot and the lock of one entry.
+        for repeat in range(2):
+            fpaths = [write_input('plate{}.lif'.format(i), series=1,
+                                  channels=1, zslices=1, timepoints=1,
+                                  delay=0.1, run=repeat, id=i // 2)
+                      for i in range(4)]
+            collections = run(aload_all(data_manager, fpaths))
+            self.assertEqual([len(c) for c in collections], [1, 1, 1, 1])
+
+    def test_cancellation_removes_temporary_entry(self):
+        import tempfile
+        from .coroutines import run, aload_and_cancel
+        from jicbioimage.core.io import DataManager, FileBackend
+        backend = FileBackend(os.path.join(TMP_DIR, 'backend'))
+        data_manager = DataManager(backend)
+        fpath = write_input('plate.lif', series=1, channels=1, zslices=1,
+                            timepoints=1, delay=5)
+        tempdirs = []
+        mkdtemp = tempfile.mkdtemp
+
+        def recording_mkdtemp(*args, **kwargs):
+            tempdirs.append(mkdtemp(*args, **kwargs))
+            return tempdirs[-1]
+
+        start = time.time()
+        with patch('tempfile.mkdtemp', recording_mkdtemp):
+            self.assertTrue(run(aload_and_cancel(data_manager, fpath, 0.5)))
+        self.assertLess(time.time() - start, 4)
+        self.assertEqual(len(tempdirs), 1)
+        self.assertFalse(os.path.isdir(tempdirs[0]))
+        self.assertEqual(os.listdir(backend.directory),
+                         ['fingerprints.sqlite'])
+        self.assertEqual(len(data_manager), 0)
+
+    def test_conversion_error(self):
+        from .coroutines import run
+        from jicbioimage.core.io import DataManager, FileBackend
+        backend = FileBackend(os.path.join(TMP_DIR, 'backend'))
+        data_manager = DataManager(backend)
+        fpath = write_input('plate.lif', series=1)
+        with self.assertRaises(RuntimeError):
+            run(data_manager.aload(fpath))
+        self.assertEqual(os.listdir(backend.directory),
+                         ['fingerprints.sqlite'])
+
+
+if __name__ == '__main__':
+    unittest.main()
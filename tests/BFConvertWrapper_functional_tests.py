@@ -0,0 +1,199 @@
+"""BFConvertWrapper functional tests using stand-ins for the bftools."""
+
+import unittest
+import os
+import os.path
+import sys
+import json
+
+from .fake_bftools import (
+    FakeBFToolsTestCase,
+    HERE,
+    TMP_DIR,
+    write_input,
+    calls,
+    max_concurrent_calls,
+)
+
+
+class BFConvertWrapperFunctionalTests(FakeBFToolsTestCase):
+
+    def test_series_count(self):
+        from jicbioimage.core.io import BFConvertWrapper
+        fpath = write_input('plate.lif', series=7, channels=1, zslices=1,
+                            timepoints=1)
+        self.assertEqual(BFConvertWrapper('backend').series_count(fpath), 7)
+
+    def test_single_process_conversion(self):
+        from jicbioimage.core.io import FileBackend, BFConvertWrapper
+        backend = FileBackend(os.path.join(TMP_DIR, 'backend'))
+        fpath = write_input('plate.lif', series=3, channels=2, zslices=2,
+                            timepoints=1)
+        manifest_fpath = BFConvertWrapper(backend)(fpath)
+        with open(manifest_fpath) as fh:
+            self.assertEqual(len(json.load(fh)), 12)
+        self.assertEqual(len(calls()), 1)
+
+    def test_per_series_conversion(self):
+        from jicbioimage.core.io import FileBackend, BFConvertWrapper
+        fpath = write_input('plate.lif', series=4, channels=2, zslices=3,
+                            timepoints=1, delay=0.5)
+
+        backend = FileBackend(os.path.join(TMP_DIR, 'serial'))
+        with open(BFConvertWrapper(backend)(fpath)) as fh:
+            expected = fh.read()
+        os.unlink(os.path.join(TMP_DIR, 'calls'))
+        os.unlink(os.path.join(TMP_DIR, 'times'))
+
+        backend = FileBackend(os.path.join(TMP_DIR, 'parallel'))
+        manifest_fpath = BFConvertWrapper(backend, workers=4)(fpath)
+        with open(manifest_fpath) as fh:
+            self.assertEqual(fh.read(), expected)
+
+        series_calls = calls()
+        self.assertEqual(len(series_calls), 4)
+        self.assertEqual(sorted(c.split()[2] for c in series_calls),
+                         ['0', '1', '2', '3'])
+        # The conversions of the series ran concurrently.
+        self.assertGreater(max_concurrent_calls(), 1)
+
+    def test_per_series_conversion_error(self):
+        from jicbioimage.core.io import FileBackend, BFConvertWrapper
+        backend = FileBackend(os.path.join(TMP_DIR, 'backend'))
+        fpath = write_input('plate.lif', series=2)
+        with self.assertRaises(RuntimeError):
+            BFConvertWrapper(backend, workers=2)(fpath)
+        self.assertEqual(os.listdir(backend.directory),
+                         ['fingerprints.sqlite'])
+
+    def test_single_flight_across_processes(self):
+        import subprocess
+        from jicbioimage.core.io import FileBackend
+        backend_dir = os.path.join(TMP_DIR, 'backend')
+        FileBackend(backend_dir)
+        fpath = write_input('plate.lif', series=2, channels=1, zslices=1,
+                            timepoints=1, delay=1)
+        script = ("import sys\n"
+                  "from jicbioimage.core.io import FileBackend, DataManager\n"
+                  "data_manager = DataManager(FileBackend(sys.argv[1]))\n"
+                  "print(len(data_manager.load(sys.argv[2])))\n")
+        env = dict(os.environ)
+        env['PYTHONPATH'] = os.path.abspath(os.path.join(HERE, '..'))
+        processes = [subprocess.Popen([sys.executable, '-c', script,
+                                       backend_dir, fpath],
+                                      stdout=subprocess.PIPE, env=env)
+                     for _ in range(3)]
+        outputs = [p.communicate()[0] for p in processes]
+        self.assertEqual([p.returncode for p in processes], [0, 0, 0])
+        self.assertEqual([o.strip() for o in outputs], [b'2'] * 3)
+        self.assertEqual(len(calls()), 1)
+        self.assertEqual(sorted(os.listdir(backend_dir)),
+                         sorted(['fingerprints.sqlite',
+                                 FileBackend(backend_dir).entry_key(fpath)]))
+
+    def test_single_flight_across_threads(self):
+        import threading
+        from jicbioimage.core.io import FileBackend, BFConvertWrapper
+        backend = FileBackend(os.path.join(TMP_DIR, 'backend'))
+        fpath = write_input('plate.lif', series=1, channels=1, zslices=1,
+                            timepoints=1, delay=0.5)
+        results = []
+
+        def convert():
+            results.append(BFConvertWrapper(backend)(fpath))
+
+        threads = [threading.Thread(target=convert) for _ in range(3)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(set(results)), 1)
+        self.assertEqual(len(results), 3)
+        self.assertEqual(len(calls()), 1)
+
+    def test_capacity(self):
+        from jicbioimage.core.io import FileBackend, BFConvertWrapper
+        backend = FileBackend(os.path.join(TMP_DIR, 'backend'))
+        wrapper = BFConvertWrapper(backend)
+        fpaths = [write_input('plate{}.lif'.format(i), series=1, channels=1,
+                              zslices=1, timepoints=1, id=i)
+                  for i in range(3)]
+        keys = [backend.entry_key(fpath) for fpath in fpaths]
+        wrapper(fpaths[0])
+        backend.capacity = 2 * backend.entry_size(keys[0])
+        wrapper(fpaths[1])
+        wrapper(fpaths[0])  # Reusing an entry marks it as recently used.
+        wrapper(fpaths[2])
+        self.assertEqual(sorted(backend.entries()), sorted(keys[::2]))
+        self.assertEqual(len(calls()), 3)
+
+    def test_compressed_images(self):
+        import numpy as np
+        from jicbioimage.core.io import FileBackend, BFConvertWrapper
+        from jicbioimage.core.image import ImageCollection
+        from jicbioimage.core.util.tiff import read, read_ifds, COMPRESSION
+        fpath = write_input('plate.lif', series=2, channels=1, zslices=2,
+                            timepoints=1, tiff=[64, 100])
+
+        sizes = {}
+        for compression in [None, 'deflate', 'deflate-predictor']:
+            backend = FileBackend(os.path.join(TMP_DIR, str(compression)),
+                                  compression=compression)
+            manifest_fpath = BFConvertWrapper(backend)(fpath)
+            collection = ImageCollection()
+            collection.parse_manifest(manifest_fpath)
+            self.assertEqual(len(collection), 4)
+            for proxy_image in collection:
+                ar = read(proxy_image.fpath)
+                self.assertEqual(ar.shape, (64, 100))
+                expected = np.zeros((64, 100), dtype=np.uint8)
+                expected[-1, -1] = proxy_image.series + proxy_image.zslice
+                self.assertTrue(np.array_equal(ar, expected))
+                self.assertEqual(read_ifds(proxy_image.fpath)[0][COMPRESSION],
+                                 (8 if compression else 1,))
+                if compression is None:
+                    self.assertFalse(hasattr(proxy_image, 'compressed'))
+                else:
+                    self.assertTrue(proxy_image.compressed)
+                    self.assertTrue(np.array_equal(proxy_image.image,
+                                                   expected))
+            key = backend.entries()[0]
+            sizes[compression] = backend.entry_size(key)
+        self.assertLess(sizes['deflate'], sizes[None])
+
+        with self.assertRaises(ValueError):
+            FileBackend(os.path.join(TMP_DIR, 'lzw'), compression='lzw')
+
+    def test_compressed_float_images(self):
+        import numpy as np
+        from jicbioimage.core.io import FileBackend, BFConvertWrapper
+        from jicbioimage.core.util.tiff import (
+            read,
+            read_ifds,
+            write,
+            COMPRESSION,
+            PREDICTOR,
+        )
+        backend = FileBackend(os.path.join(TMP_DIR, 'backend'),
+                              compression='deflate-predictor')
+        entry = FileBackend.Entry(TMP_DIR, 'plate.lif', key='entry')
+        ar = np.linspace(0, 1, 64 * 100, dtype=np.float32).reshape((64, 100))
+        fpath = os.path.join(entry.directory, 'S0_C0_Z0_T0.tif')
+        write(fpath, ar)
+        write(os.path.join(entry.directory, 'S0_C1_Z0_T0.tif'),
+              (ar * 100).astype(np.uint16))
+
+        wrapper = BFConvertWrapper(backend)
+        wrapper._compress_images(entry)
+        ifd = read_ifds(fpath)[0]
+        self.assertEqual(ifd[COMPRESSION], (8,))
+        self.assertEqual(ifd[PREDICTOR], (1,))
+        self.assertTrue(np.array_equal(read(fpath), ar))
+        ifd = read_ifds(os.path.join(entry.directory, 'S0_C1_Z0_T0.tif'))[0]
+        self.assertEqual(ifd[PREDICTOR], (2,))
+        self.assertEqual([item['compressed'] for item in
+                          wrapper.manifest(entry)], [True, True])
+
+
+if __name__ == '__main__':
+    unittest.main()
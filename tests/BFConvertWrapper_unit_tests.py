@@ -24,6 +24,21 @@ class BFConvertWrapperTests(unittest.TestCase):
         wrapper = BFConvertWrapper('backend')
         self.assertEqual(wrapper.backend, 'backend')
 
+    def test_entry_key_of_foreign_backend(self):
+        from jicbioimage.core.io import BFConvertWrapper
+
+        class Backend(object):
+            def entry_key(self, fpath):
+                return 'key-of-' + fpath
+
+        wrapper = BFConvertWrapper(Backend())
+        self.assertEqual(wrapper.entry_key('plate.lif'), 'key-of-plate.lif')
+
+        backend = Mock()
+        backend.entry_key.return_value = 'key'
+        BFConvertWrapper(backend).entry_key('plate.lif', strict=True)
+        backend.entry_key.assert_called_with('plate.lif', strict=True)
+
     def test_split_order(self):
         """Test the split_order attribute."""
         from jicbioimage.core.io import BFConvertWrapper
@@ -56,6 +71,21 @@ class BFConvertWrapperTests(unittest.TestCase):
                                'test.lif',
                                os.path.join('/', 'tmp', 'S%s_C%c_Z%z_T%t.tif')])
 
+    def test_run_command_series(self):
+        from jicbioimage.core.io import BFConvertWrapper
+        wrapper = BFConvertWrapper('backend')
+
+        sys.platform = 'linux2'
+
+        cmd = wrapper.run_command('test.lif', series=3)
+        self.assertEqual(cmd, ['bfconvert',
+                               '-nolookup',
+                               '-series', '3',
+                               'test.lif',
+                               'S%s_C%c_Z%z_T%t.tif'])
+        self.assertEqual(wrapper.series_count_command('test.lif'),
+                         ['showinf', '-nopix', '-no-upgrade', 'test.lif'])
+
     def test_run_command_windows(self):
         """Test the run_command function."""
         from jicbioimage.core.io import BFConvertWrapper
@@ -111,6 +141,57 @@ class BFConvertWrapperTests(unittest.TestCase):
                                "zslice": 3,
                                "timepoint": 4}])
 
+    def test_manifest_in_parallel(self):
+        import hashlib
+        import shutil
+        import tempfile
+        from jicbioimage.core.io import BFConvertWrapper
+        wrapper = BFConvertWrapper('backend')
+        entry = Mock()
+        entry.directory = tempfile.mkdtemp()
+        try:
+            for s in range(2):
+                for z in range(12):
+                    fname = 'S{}_C0_Z{}_T0.tif'.format(s, z)
+                    fpath = os.path.join(entry.directory, fname)
+                    with open(fpath, 'wb') as fh:
+                        fh.write(fname.encode('ascii'))
+            wrapper.manifest(entry, workers=1).write(
+                os.path.join(entry.directory, 'manifest.json'))
+            expected = wrapper.manifest(entry, workers=1).json
+            self.assertEqual(wrapper.manifest(entry, workers=4).json,
+                             expected)
+            self.assertEqual(wrapper.manifest(entry).json, expected)
+            m = wrapper.manifest(entry, workers=4)
+            self.assertEqual(len(m), 24)
+            self.assertEqual(m[0]['filename'], 'S0_C0_Z0_T0.tif')
+            self.assertEqual(m[0]['md5_hexdigest'],
+                             hashlib.md5(b'S0_C0_Z0_T0.tif').hexdigest())
+        finally:
+            shutil.rmtree(entry.directory)
+
+    def test_clear_output(self):
+        import shutil
+        import tempfile
+        from jicbioimage.core.io import BFConvertWrapper
+        wrapper = BFConvertWrapper('backend')
+        directory = tempfile.mkdtemp()
+        fnames = ['S0_C0_Z0_T0.tif', 'S1_C0_Z0_T0.tif', 'S1_C1_Z0_T0.tif',
+                  'S11_C0_Z0_T0.tif', 'manifest.json']
+        try:
+            for platform in ['linux2', 'win32']:
+                sys.platform = platform
+                for fname in fnames:
+                    open(os.path.join(directory, fname), 'w').close()
+                wrapper._clear_output(
+                    wrapper.run_command('test.lif', directory, series=1))
+                self.assertEqual(sorted(os.listdir(directory)),
+                                 [fnames[0], fnames[3], fnames[4]])
+            wrapper._clear_output(wrapper.run_command('test.lif', directory))
+            self.assertEqual(os.listdir(directory), ['manifest.json'])
+        finally:
+            shutil.rmtree(directory)
+
 if __name__ == '__main__':
     unittest.main()
 
@@ -0,0 +1,108 @@
+"""Tests for the :class:`jicbioimage.core.io.BackendIndex` class."""
+
+import unittest
+import os
+import os.path
+import shutil
+
+HERE = os.path.dirname(__file__)
+TMP_DIR = os.path.join(HERE, 'tmp')
+
+
+def _write_entry(directory, key, num_channels, num_zslices):
+    from jicbioimage.core.io import Manifest
+    entry_dir = os.path.join(directory, key)
+    os.mkdir(entry_dir)
+    manifest = Manifest()
+    for c in range(num_channels):
+        for z in range(num_zslices):
+            manifest.add('S0_C{}_Z{}_T0.tif'.format(c, z),
+                         md5_hexdigest='{}-{}-{}'.format(key, c, z),
+                         series=0, channel=c, zslice=z, timepoint=0)
+    manifest_fpath = os.path.join(entry_dir, 'manifest.json')
+    manifest.write(manifest_fpath)
+    return manifest_fpath
+
+
+class BackendIndexTests(unittest.TestCase):
+
+    def setUp(self):
+        if not os.path.isdir(TMP_DIR):
+            os.mkdir(TMP_DIR)
+        self.db_fpath = os.path.join(TMP_DIR, 'index.sqlite')
+
+    def tearDown(self):
+        shutil.rmtree(TMP_DIR)
+
+    def test_add_entry(self):
+        from jicbioimage.core.io import BackendIndex
+        index = BackendIndex(self.db_fpath)
+        manifest_fpath = _write_entry(TMP_DIR, 'abc', 4, 2)
+        index.add_entry('abc', manifest_fpath, source='/data/file.lif')
+        self.assertTrue(index.has_entry('abc'))
+        self.assertFalse(index.has_entry('def'))
+        self.assertEqual(index.query('SELECT key, source, num_planes '
+                                     'FROM entries'),
+                         [('abc', '/data/file.lif', 8)])
+        self.assertEqual(index.query('SELECT * FROM dimensions'),
+                         [('abc', 0, 4, 2, 1)])
+
+        # Adding an entry again replaces it.
+        index.add_entry('abc', manifest_fpath)
+        self.assertEqual(index.query('SELECT COUNT(*) FROM planes'), [(8,)])
+
+    def test_query_dimensions(self):
+        from jicbioimage.core.io import BackendIndex
+        index = BackendIndex(self.db_fpath)
+        index.add_entry('abc', _write_entry(TMP_DIR, 'abc', 4, 2))
+        index.add_entry('def', _write_entry(TMP_DIR, 'def', 2, 2))
+        rows = index.query('SELECT DISTINCT entry FROM dimensions '
+                           'WHERE num_channels > ?', (3,))
+        self.assertEqual(rows, [('abc',)])
+
+    def test_find_planes(self):
+        from jicbioimage.core.io import BackendIndex
+        index = BackendIndex(self.db_fpath)
+        index.add_entry('abc', _write_entry(TMP_DIR, 'abc', 4, 2))
+        planes = index.find_planes('abc-3-1')
+        self.assertEqual(len(planes), 1)
+        self.assertEqual(planes[0]['entry'], 'abc')
+        self.assertEqual(planes[0]['channel'], 3)
+        self.assertEqual(planes[0]['zslice'], 1)
+        self.assertEqual(planes[0]['fpath'],
+                         os.path.join(os.path.abspath(TMP_DIR), 'abc',
+                                      'S0_C3_Z1_T0.tif'))
+        self.assertEqual(index.find_planes('nonsense'), [])
+
+    def test_remove_entry(self):
+        from jicbioimage.core.io import BackendIndex
+        index = BackendIndex(self.db_fpath)
+        index.add_entry('abc', _write_entry(TMP_DIR, 'abc', 4, 2))
+        index.remove_entry('abc')
+        self.assertFalse(index.has_entry('abc'))
+        self.assertEqual(index.query('SELECT COUNT(*) FROM planes'), [(0,)])
+
+    def test_rebuild(self):
+        from jicbioimage.core.io import BackendIndex
+        index = BackendIndex(self.db_fpath)
+        index.add_entry('abc', _write_entry(TMP_DIR, 'abc', 4, 2), 'a.lif')
+        _write_entry(TMP_DIR, 'def', 2, 2)
+        index.rebuild(TMP_DIR)
+        self.assertEqual(index.query('SELECT key, source FROM entries '
+                                     'ORDER BY key'),
+                         [('abc', 'a.lif'), ('def', None)])
+
+    def test_file_backend_index(self):
+        from jicbioimage.core.io import FileBackend, BackendIndex
+        backend_dir = os.path.join(TMP_DIR, 'backend')
+        self.assertEqual(FileBackend(backend_dir).index, None)
+
+        # The index of an existing backend is built from its manifests.
+        _write_entry(backend_dir, 'abc', 1, 1)
+        backend = FileBackend(backend_dir, index=True)
+        self.assertTrue(isinstance(backend.index, BackendIndex))
+        self.assertTrue(backend.index.has_entry('abc'))
+
+
+if __name__ == '__main__':
+    unittest.main()
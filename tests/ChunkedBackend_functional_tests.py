@@ -0,0 +1,100 @@
+"""ChunkedBackend functional tests using stand-ins for the bftools."""
+
+import unittest
+import os
+import os.path
+
+import numpy as np
+
+try:
+    from mock import patch
+except ImportError:
+    from unittest.mock import patch
+
+from .fake_bftools import (
+    FakeBFToolsTestCase,
+    TMP_DIR,
+    write_input,
+)
+
+
+class ChunkedBackendFunctionalTests(FakeBFToolsTestCase):
+
+    def _expected(self, s, timepoints, channels, zslices, shape):
+        expected = np.zeros((timepoints, channels, zslices) + shape,
+                            dtype=np.uint8)
+        for t in range(timepoints):
+            for c in range(channels):
+                for z in range(zslices):
+                    expected[t, c, z, -1, -1] = s + c + z + t
+        return expected
+
+    def test_load(self):
+        from jicbioimage.core.io import DataManager, ChunkedBackend
+        from jicbioimage.core.image import (
+            MicroscopyCollection,
+            ChunkedMicroscopyImage,
+        )
+        backend = ChunkedBackend(os.path.join(TMP_DIR, 'backend'),
+                                 chunks=(1, 1, 2, 32, 32),
+                                 chunk_compression='zlib')
+        fpath = write_input('plate.lif', series=2, channels=2, zslices=3,
+                            timepoints=2, tiff=[50, 70])
+        collection = DataManager(backend).load(fpath)
+        self.assertTrue(isinstance(collection, MicroscopyCollection))
+        self.assertEqual(len(collection), 24)
+
+        # The converted images are replaced by one array per series.
+        key = backend.entries()[0]
+        self.assertEqual(sorted(os.listdir(os.path.join(backend.directory,
+                                                        key))),
+                         ['S0.zarr', 'S1.zarr', 'manifest.json',
+                          'manifest.npz'])
+
+        proxy_image = collection.proxy_image(s=1, c=1, z=2, t=1)
+        self.assertTrue(isinstance(proxy_image, ChunkedMicroscopyImage))
+        self.assertEqual(proxy_image.probe(), ((50, 70), np.uint8))
+        image = collection.image(s=1, c=1, z=2, t=1)
+        self.assertEqual(image.shape, (50, 70))
+        self.assertEqual(image[-1, -1], 5)
+        self.assertEqual(collection.zslices(s=1), [0, 1, 2])
+
+        expected = self._expected(1, 2, 2, 3, (50, 70))
+        self.assertTrue(np.array_equal(collection.hyperstack(s=1), expected))
+        self.assertTrue(np.array_equal(collection.zstack_array(s=1, c=1, t=0),
+                                       np.dstack(expected[0, 1])))
+
+    def test_lazy_array_box_reads(self):
+        from jicbioimage.core.io import DataManager, ChunkedBackend
+        from jicbioimage.core.util.chunked import ChunkedArray
+        backend = ChunkedBackend(os.path.join(TMP_DIR, 'backend'),
+                                 chunks=(1, 1, 1, 16, 16))
+        fpath = write_input('plate.lif', series=1, channels=2, zslices=4,
+                            timepoints=1, tiff=[40, 40])
+        collection = DataManager(backend).load(fpath)
+        expected = self._expected(0, 1, 2, 4, (40, 40))
+
+        with patch.object(ChunkedArray, 'read_chunk', autospec=True,
+                          side_effect=ChunkedArray.read_chunk) as read_chunk:
+            lazy_array = collection.lazy_array()
+            self.assertEqual(lazy_array.shape, (1, 2, 4, 40, 40))
+            self.assertEqual(read_chunk.call_count, 0)
+            box = lazy_array[0, 1, 1:3, 30:, 35:]
+        self.assertTrue(np.array_equal(box, expected[0, 1, 1:3, 30:, 35:]))
+        self.assertEqual(sorted(call[0][1] for call in
+                                read_chunk.call_args_list),
+                         [(0, 1, 1, 1, 2), (0, 1, 1, 2, 2),
+                          (0, 1, 2, 1, 2), (0, 1, 2, 2, 2)])
+        self.assertEqual(lazy_array.max(), 4)
+
+    def test_invalid_chunks(self):
+        from jicbioimage.core.io import ChunkedBackend
+        with self.assertRaises(ValueError):
+            ChunkedBackend(os.path.join(TMP_DIR, 'backend'), chunks=(1, 1))
+        with self.assertRaises(ValueError):
+            ChunkedBackend(os.path.join(TMP_DIR, 'backend'),
+                           chunk_compression='lzw')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,171 @@
+"""ConverterWorker functional tests using a stand-in converter worker."""
+
+import unittest
+import os
+import os.path
+import sys
+
+from .fake_bftools import (
+    FakeBFToolsTestCase,
+    TMP_DIR,
+    write_input,
+    lines,
+    WORKER,
+)
+
+
+class ConverterWorkerFunctionalTests(FakeBFToolsTestCase):
+
+    def test_one_process_converts_many_files(self):
+        from jicbioimage.core.io import (
+            DataManager,
+            FileBackend,
+            ConverterWorker,
+        )
+        backend = FileBackend(os.path.join(TMP_DIR, 'backend'))
+        with ConverterWorker([WORKER]) as worker:
+            data_manager = DataManager(backend, converter_worker=worker)
+            for i in range(5):
+                fpath = write_input('plate{}.lif'.format(i), series=1,
+                                    channels=i + 1, zslices=1,
+                                    timepoints=1)
+                collection = data_manager.load(fpath)
+                self.assertEqual(len(collection), i + 1)
+            self.assertEqual(worker.started, 1)
+        self.assertEqual(len(lines('calls')), 5)
+        self.assertEqual(len(set(lines('worker_calls'))), 1)
+
+    def test_restart_after_failure(self):
+        from jicbioimage.core.io import (
+            DataManager,
+            FileBackend,
+            ConverterWorker,
+        )
+        backend = FileBackend(os.path.join(TMP_DIR, 'backend'))
+        fpath = write_input('plate.lif', series=2, channels=1, zslices=1,
+                            timepoints=1, crash_worker='once')
+        with ConverterWorker([WORKER]) as worker:
+            data_manager = DataManager(backend, converter_worker=worker)
+            self.assertEqual(len(data_manager.load(fpath)), 2)
+            self.assertEqual(worker.started, 2)
+        self.assertEqual(len(set(lines('worker_calls'))), 2)
+        self.assertEqual(len(lines('calls')), 1)
+
+    def test_fall_back_on_bfconvert(self):
+        from jicbioimage.core.io import (
+            DataManager,
+            FileBackend,
+            ConverterWorker,
+        )
+        backend = FileBackend(os.path.join(TMP_DIR, 'backend'))
+        fpath = write_input('plate.lif', series=2, channels=1, zslices=1,
+                            timepoints=1, crash_worker=True)
+        with ConverterWorker([WORKER], retries=2) as worker:
+            data_manager = DataManager(backend, converter_worker=worker)
+            self.assertEqual(len(data_manager.load(fpath)), 2)
+            self.assertEqual(worker.started, 3)
+        # The file was converted by a bfconvert process.
+        self.assertEqual(len(lines('calls')), 1)
+
+        missing = ConverterWorker([os.path.join(TMP_DIR, 'no-worker')])
+        with self.assertRaises(RuntimeError):
+            missing.run(['-nolookup', fpath, 'out.tif'])
+        backend = FileBackend(os.path.join(TMP_DIR, 'other'))
+        data_manager = DataManager(backend, converter_worker=missing)
+        self.assertEqual(len(data_manager.load(fpath)), 2)
+        self.assertEqual(len(lines('calls')), 2)
+
+    def test_job_errors_are_reported(self):
+        from jicbioimage.core.io import (
+            BFConvertWrapper,
+            FileBackend,
+            ConverterWorker,
+        )
+        backend = FileBackend(os.path.join(TMP_DIR, 'backend'))
+        fpath = os.path.join(TMP_DIR, 'broken.lif')
+        with open(fpath, 'w') as fh:
+            fh.write('not json')
+        with ConverterWorker([WORKER]) as worker:
+            wrapper = BFConvertWrapper(backend, converter_worker=worker)
+            with self.assertRaises(RuntimeError):
+                wrapper(fpath)
+            # The job failed, not the worker, so it is not run again.
+            self.assertEqual(worker.started, 1)
+            self.assertEqual(len(lines('worker_calls')), 0)
+
+    def test_bad_response(self):
+        from jicbioimage.core.io import ConverterWorker
+        script = ('import sys\n'
+                  'for line in sys.stdin:\n'
+                  '    sys.stdout.write("nonsense\\n")\n'
+                  '    sys.stdout.flush()\n')
+        worker = ConverterWorker([sys.executable, '-c', script])
+        with self.assertRaises(RuntimeError):
+            worker.run(['-nolookup', 'in.lif', 'out.tif'])
+        self.assertEqual(worker.started, 2)
+        worker.close()
+        with self.assertRaises(RuntimeError):
+            worker.run(['-nolookup', 'in.lif', 'out.tif'])
+
+    def test_timeout(self):
+        import time
+        from jicbioimage.core.io import (
+            DataManager,
+            FileBackend,
+            ConverterWorker,
+        )
+        backend = FileBackend(os.path.join(TMP_DIR, 'backend'))
+        fpath = write_input('plate.lif', series=1, channels=1, zslices=1,
+                            timepoints=1, crash_worker='hang')
+        with ConverterWorker([WORKER], timeout=0.5) as worker:
+            data_manager = DataManager(backend, converter_worker=worker)
+            start = time.time()
+            self.assertEqual(len(data_manager.load(fpath)), 1)
+            self.assertLess(time.time() - start, 10)
+            # The job was tried on a new process before falling back on a
+            # bfconvert process.
+            self.assertEqual(worker.started, 2)
+            self.assertEqual(worker._idle, [])
+        self.assertEqual(len(lines('worker_calls')), 2)
+        self.assertEqual(len(lines('calls')), 1)
+
+    def test_jobs_count_against_max_processes(self):
+        from jicbioimage.core.io import (
+            DataManager,
+            FileBackend,
+            ConverterWorker,
+        )
+        backend = FileBackend(os.path.join(TMP_DIR, 'backend'))
+        fpaths = [write_input('plate{}.lif'.format(i), series=1,
+                              channels=i + 1, zslices=1, timepoints=1,
+                              delay=0.3)
+                  for i in range(3)]
+        with ConverterWorker([WORKER], processes=3) as worker:
+            data_manager = DataManager(backend, max_processes=1,
+                                       converter_worker=worker)
+            collections = data_manager.load_many(fpaths, workers=3)
+            self.assertEqual([len(c) for c in collections], [1, 2, 3])
+            self.assertEqual(worker.started, 1)
+
+    @unittest.skipIf(sys.version_info < (3, 5), 'requires asyncio')
+    def test_aload(self):
+        from .coroutines import run, aload_all
+        from jicbioimage.core.io import (
+            DataManager,
+            FileBackend,
+            ConverterWorker,
+        )
+        backend = FileBackend(os.path.join(TMP_DIR, 'backend'))
+        with ConverterWorker([WORKER], processes=2) as worker:
+            data_manager = DataManager(backend, converter_worker=worker)
+            fpaths = [write_input('plate{}.lif'.format(i), series=1,
+                                  channels=i + 1, zslices=1, timepoints=1)
+                      for i in range(4)]
+            collections = run(aload_all(data_manager, fpaths))
+            self.assertEqual([len(c) for c in collections], [1, 2, 3, 4])
+            self.assertLessEqual(worker.started, 2)
+        self.assertEqual(len(lines('worker_calls')), 4)
+
+
+if __name__ == '__main__':
+    unittest.main()
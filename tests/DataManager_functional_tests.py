@@ -7,6 +7,14 @@ import shutil
 import numpy as np
 from skimage.io import imread, use_plugin
 
+from .fake_bftools import (
+    FakeBFToolsTestCase,
+    write_input,
+    calls,
+    max_concurrent_calls,
+    wait_for_calls,
+)
+
 HERE = os.path.dirname(__file__)
 DATA_DIR = os.path.join(HERE, 'data')
 TMP_DIR = os.path.join(HERE, 'tmp')
@@ -235,5 +243,60 @@ class DataManagerUserStory(unittest.TestCase):
         finally:
             os.chdir(real_working_dir)
 
+
+class DataManagerConcurrentLoadTests(FakeBFToolsTestCase):
+
+    def setUp(self):
+        super(DataManagerConcurrentLoadTests, self).setUp()
+        self.fpaths = [
+            write_input('plate{}.lif'.format(i), series=i + 1,
+                        channels=1, zslices=1, timepoints=1,
+                        delay=0.5)
+            for i in range(3)]
+
+    def test_load_many(self):
+        from jicbioimage.core.io import DataManager, FileBackend
+        backend = FileBackend(os.path.join(TMP_DIR, 'backend'))
+        data_manager = DataManager(backend)
+        collections = data_manager.load_many(self.fpaths, workers=3)
+        self.assertGreater(max_concurrent_calls(), 1)
+        self.assertEqual([len(c) for c in collections], [1, 2, 3])
+        self.assertEqual(list(data_manager), collections)
+
+        # Loading again, and loading the same file twice, does not convert.
+        collections = data_manager.load_many(self.fpaths[:1] * 2, workers=2)
+        self.assertEqual([len(c) for c in collections], [1, 1])
+        self.assertEqual(len(calls()), 3)
+
+    def test_iter_load_converts_ahead(self):
+        from jicbioimage.core.io import DataManager, FileBackend
+        backend = FileBackend(os.path.join(TMP_DIR, 'backend'))
+        data_manager = DataManager(backend)
+        collections = data_manager.iter_load(self.fpaths, lookahead=1)
+        self.assertEqual(len(next(collections)), 1)
+        # The second file is converted while the first is worked on.
+        wait_for_calls(2)
+        self.assertEqual(len(calls()), 2)
+        self.assertEqual([len(c) for c in collections], [2, 3])
+        self.assertEqual(len(data_manager), 3)
+
+    def test_max_processes(self):
+        from jicbioimage.core.io import DataManager, FileBackend
+        backend = FileBackend(os.path.join(TMP_DIR, 'backend'))
+        data_manager = DataManager(backend, max_processes=1)
+        data_manager.load_many(self.fpaths, workers=3)
+        self.assertEqual(len(calls()), 3)
+        self.assertEqual(max_concurrent_calls(), 1)
+
+    def test_capacity_keeps_loaded_entries(self):
+        from jicbioimage.core.io import DataManager, FileBackend
+        backend = FileBackend(os.path.join(TMP_DIR, 'backend'), capacity=1)
+        data_manager = DataManager(backend)
+        collections = list(data_manager.iter_load(self.fpaths, lookahead=1))
+        self.assertEqual(len(backend.entries()), 3)
+        for collection in collections:
+            for proxy_image in collection:
+                self.assertTrue(os.path.isfile(proxy_image.fpath))
+
 if __name__ == '__main__':
     unittest.main()
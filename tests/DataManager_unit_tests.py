@@ -6,6 +6,7 @@ import os.path
 import shutil
 
 HERE = os.path.dirname(__file__)
+DATA_DIR = os.path.join(HERE, 'data')
 TMP_DIR = os.path.join(HERE, 'tmp')
 
 class DataManagerTests(unittest.TestCase):
@@ -34,5 +35,66 @@ class DataManagerTests(unittest.TestCase):
         self.assertTrue(isinstance(data_manager.convert, BFConvertWrapper))
          
 
+    def test_query(self):
+        from jicbioimage.core.io import (
+            DataManager,
+            FileBackend,
+            Manifest,
+            _md5_hexdigest_from_file,
+        )
+        fpath = os.path.join(DATA_DIR, 'single-channel.ome.tif')
+        backend = FileBackend(os.path.join(TMP_DIR, 'backend'), index=True)
+        data_manager = DataManager(backend)
+
+        # Fake an already converted entry.
+        key = _md5_hexdigest_from_file(fpath)
+        os.mkdir(os.path.join(backend.directory, key))
+        manifest = Manifest()
+        manifest.add('S0_C0_Z0_T0.tif', md5_hexdigest='dummy', series=0,
+                     channel=0, zslice=0, timepoint=0)
+        manifest.write(os.path.join(backend.directory, key, 'manifest.json'))
+
+        data_manager.load(fpath)
+        self.assertEqual(data_manager.query('SELECT key, source FROM entries'),
+                         [(key, os.path.abspath(fpath))])
+        self.assertEqual(
+            data_manager.query('SELECT entry FROM planes '
+                               'WHERE md5_hexdigest = ?', ('dummy',)),
+            [(key,)])
+
+    def test_query_without_index_raises(self):
+        from jicbioimage.core.io import DataManager, FileBackend
+        data_manager = DataManager(FileBackend(os.path.join(TMP_DIR, 'b')))
+        with self.assertRaises(RuntimeError):
+            data_manager.query('SELECT * FROM entries')
+
+    def test_backend_without_index(self):
+        from jicbioimage.core.io import (
+            DataManager,
+            Manifest,
+            _md5_hexdigest_from_file,
+        )
+
+        class MinimalBackend(object):
+            """Backend without an index, manifest cache or touch."""
+            def __init__(self, directory):
+                self.directory = directory
+
+        fpath = os.path.join(DATA_DIR, 'single-channel.ome.tif')
+        backend = MinimalBackend(os.path.join(TMP_DIR, 'backend'))
+        key = _md5_hexdigest_from_file(fpath)
+        os.makedirs(os.path.join(backend.directory, key))
+        manifest = Manifest()
+        manifest.add('S0_C0_Z0_T0.tif', md5_hexdigest='dummy', series=0,
+                     channel=0, zslice=0, timepoint=0)
+        manifest.write(os.path.join(backend.directory, key, 'manifest.json'))
+
+        data_manager = DataManager(backend)
+        collection = data_manager.load(fpath)
+        self.assertEqual(len(collection), 1)
+        with self.assertRaises(RuntimeError):
+            data_manager.query('SELECT * FROM entries')
+
+
 if __name__ == '__main__':
     unittest.main()
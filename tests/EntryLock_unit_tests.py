@@ -0,0 +1,114 @@
+"""Tests for the :class:`jicbioimage.core.io.EntryLock` class."""
+
+import unittest
+import os
+import os.path
+import sys
+import time
+import socket
+import shutil
+import subprocess
+
+HERE = os.path.dirname(__file__)
+TMP_DIR = os.path.join(HERE, 'tmp')
+
+
+class EntryLockTests(unittest.TestCase):
+
+    def setUp(self):
+        if not os.path.isdir(TMP_DIR):
+            os.mkdir(TMP_DIR)
+        self.fpath = os.path.join(TMP_DIR, 'abc.lock')
+
+    def tearDown(self):
+        shutil.rmtree(TMP_DIR)
+
+    def _write_lock(self, owner, age=0):
+        with open(self.fpath, 'w') as fh:
+            fh.write(owner)
+        mtime = time.time() - age
+        os.utime(self.fpath, (mtime, mtime))
+
+    def test_acquire_and_release(self):
+        from jicbioimage.core.io import EntryLock
+        lock = EntryLock(self.fpath)
+        self.assertFalse(lock.locked)
+        with lock:
+            self.assertTrue(lock.locked)
+            with open(self.fpath) as fh:
+                hostname, pid, _ = fh.read().split(':')
+            self.assertEqual(hostname, socket.gethostname())
+            self.assertEqual(int(pid), os.getpid())
+            with self.assertRaises(RuntimeError):
+                lock.acquire()
+        self.assertFalse(lock.locked)
+        self.assertFalse(os.path.exists(self.fpath))
+        with self.assertRaises(RuntimeError):
+            lock.release()
+
+    def test_held_lock(self):
+        from jicbioimage.core.io import EntryLock
+        with EntryLock(self.fpath):
+            other = EntryLock(self.fpath, poll_interval=0.05)
+            self.assertFalse(other.acquire(blocking=False))
+            start = time.time()
+            self.assertFalse(other.acquire(timeout=0.2))
+            self.assertGreaterEqual(time.time() - start, 0.2)
+        self.assertTrue(other.acquire(blocking=False))
+        other.release()
+
+    def test_heartbeat_keeps_lock_fresh(self):
+        from jicbioimage.core.io import EntryLock
+        with EntryLock(self.fpath, stale_after=0.4):
+            time.sleep(1)
+            other = EntryLock(self.fpath, stale_after=0.4)
+            self.assertFalse(other.acquire(blocking=False))
+
+    def test_stale_lock_without_heartbeat(self):
+        from jicbioimage.core.io import EntryLock
+        self._write_lock('otherhost:1234:token\n', age=10)
+        self.assertFalse(
+            EntryLock(self.fpath, stale_after=20).acquire(blocking=False))
+        lock = EntryLock(self.fpath, stale_after=5)
+        self.assertTrue(lock.acquire(blocking=False))
+        lock.release()
+        self.assertEqual(os.listdir(TMP_DIR), [])
+
+    def test_stale_lock_without_owner(self):
+        from jicbioimage.core.io import EntryLock
+        # The owner died before writing the lock file.
+        for owner in ['', 'otherhost:12']:
+            self._write_lock(owner, age=1)
+            self.assertFalse(
+                EntryLock(self.fpath, stale_after=20).acquire(blocking=False))
+            self._write_lock(owner, age=10)
+            lock = EntryLock(self.fpath, stale_after=5)
+            self.assertTrue(lock.acquire(timeout=1))
+            lock.release()
+        self.assertEqual(os.listdir(TMP_DIR), [])
+
+    @unittest.skipIf(sys.platform == 'win32', 'uses os.kill')
+    def test_stale_lock_of_exited_process(self):
+        from jicbioimage.core.io import EntryLock
+        p = subprocess.Popen([sys.executable, '-c', 'pass'])
+        p.wait()
+        self._write_lock('{}:{}:token\n'.format(socket.gethostname(), p.pid))
+        lock = EntryLock(self.fpath)
+        self.assertTrue(lock.acquire(blocking=False))
+        lock.release()
+
+    def test_lock_of_running_process_is_not_broken(self):
+        from jicbioimage.core.io import EntryLock
+        p = subprocess.Popen([sys.executable, '-c',
+                              'import time; time.sleep(5)'])
+        try:
+            self._write_lock('{}:{}:token\n'.format(socket.gethostname(),
+                                                    p.pid))
+            self.assertFalse(EntryLock(self.fpath).acquire(blocking=False))
+        finally:
+            p.kill()
+            p.wait()
+
+
+if __name__ == '__main__':
+    unittest.main()
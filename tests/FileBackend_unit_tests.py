@@ -4,6 +4,7 @@ import unittest
 import os
 import os.path
 import shutil
+import hashlib
 
 try:
     from mock import patch
@@ -41,6 +42,151 @@ class FileBackendTests(unittest.TestCase):
         with self.assertRaises(AttributeError):
             backend.directory = 'dummy'
 
+    def test_manifest_cache(self):
+        from jicbioimage.core.io import FileBackend, ManifestCache
+        directory = os.path.join(TMP_DIR, 'jicbioimage.core')
+        backend = FileBackend(directory)
+        self.assertTrue(isinstance(backend.manifest_cache, ManifestCache))
+        self.assertTrue(backend.manifest_cache.persist)
+        backend = FileBackend(directory, persist_manifest_cache=False)
+        self.assertFalse(backend.manifest_cache.persist)
+
+    def test_hashing_strategies(self):
+        import hashlib
+        from jicbioimage.core.io import FileBackend
+        directory = os.path.join(TMP_DIR, 'jicbioimage.core')
+        fpath = os.path.join(TMP_DIR, 'test.lif')
+        with open(fpath, 'wb') as fh:
+            fh.write(b'jicbioimage' * 1000)
+        with open(fpath, 'rb') as fh:
+            content = fh.read()
+
+        backend = FileBackend(directory)
+        self.assertEqual(backend.hashing, 'md5')
+        self.assertEqual(backend.entry_key(fpath),
+                         hashlib.md5(content).hexdigest())
+
+        with self.assertRaises(ValueError):
+            FileBackend(directory, hashing='sha0')
+
+    @unittest.skipIf(not hasattr(hashlib, 'blake2b'), 'requires blake2b')
+    def test_blake2b_hashing_strategies(self):
+        from jicbioimage.core.io import FileBackend
+        directory = os.path.join(TMP_DIR, 'jicbioimage.core')
+        fpath = os.path.join(TMP_DIR, 'test.lif')
+        with open(fpath, 'wb') as fh:
+            fh.write(b'jicbioimage' * 1000)
+        with open(fpath, 'rb') as fh:
+            content = fh.read()
+
+        backend = FileBackend(directory, hashing='blake2b')
+        self.assertEqual(backend.entry_key(fpath),
+                         'blake2b-' + hashlib.blake2b(content).hexdigest())
+        entry = backend.new_entry(fpath)
+        self.assertEqual(os.path.basename(entry.directory),
+                         backend.entry_key(fpath))
+
+        backend = FileBackend(directory, hashing='blake2b-tree')
+        key = backend.entry_key(fpath)
+        self.assertTrue(key.startswith('blake2b-tree-'))
+        self.assertEqual(key, backend.entry_key(fpath))
+
+    def test_blake2b_missing(self):
+        import jicbioimage.core.io
+        from jicbioimage.core.io import FileBackend
+        directory = os.path.join(TMP_DIR, 'jicbioimage.core')
+        strategies = {'md5': jicbioimage.core.io._md5_hexdigest_from_file}
+        with patch.dict(jicbioimage.core.io.HASHING_STRATEGIES, strategies,
+                        clear=True):
+            with self.assertRaises(ValueError):
+                FileBackend(directory, hashing='blake2b')
+
+    def test_empty_file_hexdigest(self):
+        import hashlib
+        from jicbioimage.core.io import _md5_hexdigest_from_file
+        fpath = os.path.join(TMP_DIR, 'empty.lif')
+        open(fpath, 'wb').close()
+        self.assertEqual(_md5_hexdigest_from_file(fpath),
+                         hashlib.md5(b'').hexdigest())
+
+    @unittest.skipIf(not hasattr(hashlib, 'blake2b'), 'requires blake2b')
+    def test_tree_hexdigest_chunks(self):
+        import hashlib
+        import struct
+        import jicbioimage.core.io
+        from jicbioimage.core.io import _blake2b_tree_hexdigest_from_file
+        fpath = os.path.join(TMP_DIR, 'test.lif')
+        content = bytes(bytearray(range(256))) * 10
+        with open(fpath, 'wb') as fh:
+            fh.write(content)
+        with patch.object(jicbioimage.core.io, '_TREE_CHUNK_SIZE', 1000):
+            hexdigest = _blake2b_tree_hexdigest_from_file(fpath, workers=2,
+                                                          blocksize=64)
+        root = hashlib.blake2b(struct.pack('<Q', len(content)))
+        for offset in range(0, len(content), 1000):
+            chunk = content[offset:offset + 1000]
+            root.update(hashlib.blake2b(chunk).digest())
+        self.assertEqual(hexdigest, root.hexdigest())
+
+    def _add_entry(self, backend, key, size, atime):
+        from jicbioimage.core.io import Manifest
+        entry_dir = os.path.join(backend.directory, key)
+        os.mkdir(entry_dir)
+        with open(os.path.join(entry_dir, 'S0_C0_Z0_T0.tif'), 'wb') as fh:
+            fh.write(b'x' * size)
+        manifest = Manifest()
+        manifest.add('S0_C0_Z0_T0.tif', md5_hexdigest='dummy', series=0,
+                     channel=0, zslice=0, timepoint=0)
+        manifest.write(os.path.join(entry_dir, 'manifest.json'))
+        self.manifest_size = sum(
+            os.path.getsize(os.path.join(entry_dir, fname))
+            for fname in ['manifest.json', 'manifest.npz'])
+        os.utime(entry_dir, (atime, atime))
+
+    def test_entries_and_touch(self):
+        from jicbioimage.core.io import FileBackend
+        directory = os.path.join(TMP_DIR, 'jicbioimage.core')
+        backend = FileBackend(directory)
+        self._add_entry(backend, 'b', 1000, 100)
+        self._add_entry(backend, 'a', 2000, 200)
+        self._add_entry(backend, 'c', 3000, 300)
+        os.mkdir(os.path.join(directory, 'incomplete'))
+        self.assertEqual(backend.entries(), ['b', 'a', 'c'])
+        self.assertEqual(backend.entry_size('a'), 2000 + self.manifest_size)
+        backend.touch('b')
+        self.assertEqual(backend.entries(), ['a', 'c', 'b'])
+
+    def test_gc(self):
+        from jicbioimage.core.io import FileBackend
+        directory = os.path.join(TMP_DIR, 'jicbioimage.core')
+        backend = FileBackend(directory, index=True)
+        with self.assertRaises(ValueError):
+            backend.gc()
+        for i, key in enumerate(['a', 'b', 'c', 'd', 'e']):
+            self._add_entry(backend, key, 1000, 100 * (i + 1))
+        backend.index.rebuild(directory)
+        entry_size = backend.entry_size('a')
+
+        backend.pin('a')
+        self.assertTrue(backend.is_pinned('a'))
+        lock = backend.entry_lock('b')
+        lock.acquire()
+        try:
+            removed = backend.gc(capacity=4 * entry_size, keep=['c'])
+        finally:
+            lock.release()
+        self.assertEqual(removed, ['d'])
+        self.assertEqual(backend.entries(), ['a', 'b', 'c', 'e'])
+        self.assertEqual(backend.index.query('SELECT key FROM entries'),
+                         [('a',), ('b',), ('c',), ('e',)])
+
+        backend.unpin('a')
+        backend.capacity = 2 * entry_size
+        self.assertEqual(backend.gc(), ['a', 'b'])
+        self.assertEqual(sorted(os.listdir(directory)),
+                         ['c', 'e', 'fingerprints.sqlite', 'index.sqlite'])
+        self.assertEqual(backend.gc(), [])
+
     @patch("jicbioimage.core.io._md5_hexdigest_from_file")
     def test_new_entry(self, patch):
         from jicbioimage.core.io import FileBackend
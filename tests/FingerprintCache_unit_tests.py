@@ -0,0 +1,108 @@
+"""Tests for the :class:`jicbioimage.core.io.FingerprintCache` class."""
+
+import unittest
+import os
+import os.path
+import shutil
+
+try:
+    from mock import Mock, patch
+except ImportError:
+    from unittest.mock import Mock, patch
+
+HERE = os.path.dirname(__file__)
+TMP_DIR = os.path.join(HERE, 'tmp')
+
+
+def _write(fpath, content):
+    with open(fpath, 'wb') as fh:
+        fh.write(content)
+
+
+class FingerprintCacheTests(unittest.TestCase):
+
+    def setUp(self):
+        if not os.path.isdir(TMP_DIR):
+            os.mkdir(TMP_DIR)
+        self.db_fpath = os.path.join(TMP_DIR, 'fingerprints.sqlite')
+        self.fpath = os.path.join(TMP_DIR, 'test.lif')
+        _write(self.fpath, b'first')
+
+    def tearDown(self):
+        shutil.rmtree(TMP_DIR)
+
+    def test_unchanged_file_is_not_hashed_again(self):
+        from jicbioimage.core.io import FingerprintCache
+        cache = FingerprintCache(self.db_fpath)
+        hash_func = Mock(return_value='abc')
+        self.assertEqual(cache.key(self.fpath, 'md5', hash_func), 'abc')
+        self.assertEqual(cache.key(self.fpath, 'md5', hash_func), 'abc')
+        self.assertEqual(hash_func.call_count, 1)
+        self.assertEqual(len(cache), 1)
+
+        # The cache persists between instances.
+        cache = FingerprintCache(self.db_fpath)
+        self.assertEqual(cache.key(self.fpath, 'md5', hash_func), 'abc')
+        self.assertEqual(hash_func.call_count, 1)
+
+    def test_changed_file_is_hashed_again(self):
+        from jicbioimage.core.io import FingerprintCache
+        cache = FingerprintCache(self.db_fpath)
+        hash_func = Mock(return_value='abc')
+        cache.key(self.fpath, 'md5', hash_func)
+        _write(self.fpath, b'second')
+        hash_func.return_value = 'def'
+        self.assertEqual(cache.key(self.fpath, 'md5', hash_func), 'def')
+        self.assertEqual(hash_func.call_count, 2)
+
+    def test_strict(self):
+        from jicbioimage.core.io import FingerprintCache
+        cache = FingerprintCache(self.db_fpath)
+        hash_func = Mock(return_value='abc')
+        cache.key(self.fpath, 'md5', hash_func)
+        hash_func.return_value = 'def'
+        self.assertEqual(cache.key(self.fpath, 'md5', hash_func, strict=True),
+                         'def')
+        self.assertEqual(cache.key(self.fpath, 'md5', hash_func), 'def')
+        self.assertEqual(hash_func.call_count, 2)
+
+    def test_keyed_on_hashing_strategy(self):
+        from jicbioimage.core.io import FingerprintCache
+        cache = FingerprintCache(self.db_fpath)
+        cache.key(self.fpath, 'md5', Mock(return_value='abc'))
+        self.assertEqual(
+            cache.key(self.fpath, 'blake2b', Mock(return_value='def')), 'def')
+        self.assertEqual(len(cache), 2)
+        cache.clear()
+        self.assertEqual(len(cache), 0)
+
+    def test_file_modified_while_hashing_is_not_cached(self):
+        from jicbioimage.core.io import FingerprintCache
+        cache = FingerprintCache(self.db_fpath)
+
+        def hash_func(fpath):
+            _write(fpath, b'modified while hashing')
+            return 'abc'
+
+        self.assertEqual(cache.key(self.fpath, 'md5', hash_func), 'abc')
+        self.assertEqual(len(cache), 0)
+
+    def test_backend_load_hashes_once(self):
+        from jicbioimage.core.io import FileBackend
+        backend = FileBackend(os.path.join(TMP_DIR, 'backend'))
+        self.assertTrue(os.path.isfile(backend.fingerprint_cache.fpath))
+        with patch('jicbioimage.core.io._md5_hexdigest_from_file',
+                   return_value='abc') as md5:
+            self.assertEqual(backend.entry_key(self.fpath), 'abc')
+            self.assertEqual(backend.entry_key(self.fpath), 'abc')
+            self.assertEqual(md5.call_count, 1)
+            backend.entry_key(self.fpath, strict=True)
+            self.assertEqual(md5.call_count, 2)
+
+        backend = FileBackend(os.path.join(TMP_DIR, 'backend2'),
+                              fingerprint_cache=False)
+        self.assertTrue(backend.fingerprint_cache is None)
+
+
+if __name__ == '__main__':
+    unittest.main()
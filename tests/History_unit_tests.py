@@ -92,3 +92,12 @@ class EventUnitTests(unittest.TestCase):
         kwargs = {}
         event = History.Event(split, args, kwargs)
         self.assertEqual(repr(event), "<History.Event(split(image))>")
+
+    def test_pickle(self):
+        import pickle
+        from jicbioimage.core.image import History
+        history = History(creation='Created Image from array')
+        history.add_event(str, ['a'], {'b': 1})
+        unpickled = pickle.loads(pickle.dumps(history))
+        self.assertEqual(unpickled.creation, 'Created Image from array')
+        self.assertEqual(repr(unpickled), repr(history))
@@ -49,5 +49,52 @@ class ImageCollectionUserStory(unittest.TestCase):
         import numpy as np
         self.assertTrue(np.array_equal(im, expected_im))
 
+    def _write_manifest(self):
+        from jicbioimage.core.io import ManifestWriter
+        manifest_fp = os.path.join(TMP_DIR, 'manifest.json')
+        with ManifestWriter(manifest_fp) as writer:
+            for z in range(3):
+                writer.add('S0_C0_Z{}_T0.tif'.format(z), md5_hexdigest='abc',
+                           series=0, channel=0, zslice=z, timepoint=0)
+        return manifest_fp
+
+    def test_parse_manifest_prefers_binary_manifest(self):
+        from jicbioimage.core.image import MicroscopyCollection
+
+        manifest_fp = self._write_manifest()
+        expected = MicroscopyCollection(manifest_fp)
+
+        # Break the json manifest, keeping its size and modification time, to
+        # show that it is not used.
+        stat = os.stat(manifest_fp)
+        with open(manifest_fp) as fh:
+            size = len(fh.read())
+        with open(manifest_fp, 'w') as fh:
+            fh.write('x' * size)
+        os.utime(manifest_fp, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+
+        microscopy_collection = MicroscopyCollection(manifest_fp)
+        self.assertEqual(len(microscopy_collection), 3)
+        for proxy_image, expected_proxy_image in zip(microscopy_collection,
+                                                     expected):
+            self.assertEqual(proxy_image.__dict__,
+                             expected_proxy_image.__dict__)
+            self.assertTrue(isinstance(proxy_image.zslice, int))
+        self.assertEqual(microscopy_collection.proxy_image(z=2).fpath,
+                         os.path.join(TMP_DIR, 'S0_C0_Z2_T0.tif'))
+
+    def test_parse_manifest_falls_back_on_json(self):
+        from jicbioimage.core.image import MicroscopyCollection
+
+        manifest_fp = self._write_manifest()
+        with open(manifest_fp, 'w') as fh:
+            json.dump([dict(filename='a.tif', series=0, channel=0, zslice=0,
+                            timepoint=0)], fh)
+        self.assertEqual(len(MicroscopyCollection(manifest_fp)), 1)
+
+        with open(os.path.join(TMP_DIR, 'manifest.npz'), 'w') as fh:
+            fh.write('corrupt')
+        self.assertEqual(len(MicroscopyCollection(manifest_fp)), 1)
+
 if __name__ == '__main__':
     unittest.main()
@@ -1,12 +1,43 @@
 """Tests for the :class:`jicbioimage.core.image.ImageCollection` class."""
 
 import unittest
+import os
+import os.path
+import sys
+import shutil
+import time
+import threading
+
+import numpy as np
 
 try:
     from mock import MagicMock, patch
 except ImportError:
     from unittest.mock import MagicMock, patch
 
+from jicbioimage.core.transform import transformation
+
+HERE = os.path.dirname(__file__)
+DATA_DIR = os.path.join(HERE, 'data')
+TMP_DIR = os.path.join(HERE, 'tmp')
+
+
+def _fake_from_file(fpath, *args, **kwargs):
+    """Return image whose pixel values are the number in the file name."""
+    from jicbioimage.core.image import Image
+    value = int(os.path.basename(fpath).split('.')[0][4:])
+    return Image.from_array(np.ones((2, 2), dtype=np.uint8) * value)
+
+
+def _image_sum(image):
+    return int(image.sum())
+
+
+@transformation
+def _double(image):
+    return image * 2
+
+
 class ImageCollectionTests(unittest.TestCase):
     
     def test_len(self):
@@ -31,6 +62,179 @@ class ImageCollectionTests(unittest.TestCase):
         proxy_image = image_collection.proxy_image(index=1)
         self.assertEqual(proxy_image.fpath, 'test1.tif')
 
+    def _collection(self, num_images=10):
+        from jicbioimage.core.image import ImageCollection, ProxyImage
+        image_collection = ImageCollection()
+        for i in range(num_images):
+            image_collection.append(ProxyImage('test{}.tif'.format(i)))
+        return image_collection
+
+    def test_map(self):
+        image_collection = self._collection()
+        with patch('jicbioimage.core.image.Image.from_file',
+                   side_effect=_fake_from_file):
+            for workers in [0, 1, 3]:
+                results = image_collection.map(_image_sum, workers=workers)
+                self.assertEqual(list(results),
+                                 [4 * i for i in range(10)])
+            results = image_collection.map(_image_sum, workers=3,
+                                           ordered=False)
+            self.assertEqual(sorted(results), [4 * i for i in range(10)])
+
+    def test_map_single_worker_runs_inline(self):
+        image_collection = self._collection(3)
+        threads = []
+
+        def func(image):
+            threads.append(threading.current_thread())
+            return image
+
+        with patch('jicbioimage.core.image.Image.from_file',
+                   side_effect=_fake_from_file):
+            for workers in [0, 1]:
+                del threads[:]
+                list(image_collection.map(func, workers=workers))
+                self.assertEqual(threads, [threading.current_thread()] * 3)
+
+    def test_map_process_executor(self):
+        from jicbioimage.core.image import ImageCollection, ProxyImage
+        from jicbioimage.core.io import AutoWrite
+        from jicbioimage.core.util.tiff import write
+        if not os.path.isdir(TMP_DIR):
+            os.mkdir(TMP_DIR)
+        try:
+            image_collection = ImageCollection()
+            for i in range(4):
+                fpath = os.path.join(TMP_DIR, 'test{}.tif'.format(i))
+                write(fpath, np.ones((2, 2), dtype=np.uint8) * i,
+                      compression='deflate')
+                image_collection.append(ProxyImage(fpath,
+                                                   dict(compressed=True)))
+            # Do not write the transformed images out as png files.
+            with patch.object(AutoWrite, 'on', False):
+                results = list(image_collection.map(_double, workers=2,
+                                                    executor='process'))
+            self.assertEqual([int(image.sum()) for image in results],
+                             [0, 8, 16, 24])
+            for i, image in enumerate(results):
+                fpath = os.path.join(TMP_DIR, 'test{}.tif'.format(i))
+                self.assertEqual(image.history.creation,
+                                 'Created Image from {}'.format(fpath))
+                self.assertEqual(len(image.history), 1)
+                self.assertEqual(image.history[0].function.__name__,
+                                 '_double')
+        finally:
+            shutil.rmtree(TMP_DIR)
+
+    def test_map_backpressure(self):
+        image_collection = self._collection()
+        started = []
+        lock = threading.Lock()
+
+        def func(image):
+            with lock:
+                started.append(image)
+            return image
+
+        with patch('jicbioimage.core.image.Image.from_file',
+                   side_effect=_fake_from_file):
+            results = image_collection.map(func, workers=2, max_in_flight=3)
+            next(results)
+            time.sleep(0.1)
+            self.assertTrue(len(started) <= 3)
+            self.assertEqual(len(list(results)), 9)
+
+    def test_map_unknown_executor(self):
+        image_collection = self._collection()
+        with self.assertRaises(ValueError):
+            image_collection.map(_image_sum, executor='cluster')
+
+    def test_to_batch(self):
+        image_collection = self._collection()
+        with patch('jicbioimage.core.image.Image.from_file',
+                   side_effect=_fake_from_file):
+            for workers in [1, 3]:
+                batch = image_collection.to_batch(workers=workers)
+                self.assertEqual(batch.shape, (10, 2, 2))
+                self.assertEqual(batch.dtype, np.uint8)
+                self.assertEqual(list(batch[:, 0, 0]), list(range(10)))
+                self.assertTrue(batch.flags.c_contiguous)
+
+            batch = image_collection.to_batch(indices=[7, 2])
+            self.assertEqual(list(batch[:, 1, 1]), [7, 2])
+
+            out = np.zeros((2, 2, 2), dtype=np.uint8)
+            batch = image_collection.to_batch(indices=[3, 4], out=out)
+            self.assertTrue(batch is out)
+            self.assertEqual(list(out[:, 0, 1]), [3, 4])
+
+            with self.assertRaises(ValueError):
+                image_collection.to_batch(indices=[])
+
+    @unittest.skipIf(sys.version_info < (3, 8), 'requires shared_memory')
+    def test_to_batch_shared_memory(self):
+        from multiprocessing.shared_memory import SharedMemory
+        image_collection = self._collection(3)
+        with patch('jicbioimage.core.image.Image.from_file',
+                   side_effect=_fake_from_file):
+            batch, shm = image_collection.to_batch(shared_memory=True)
+        try:
+            other = SharedMemory(name=shm.name)
+            view = np.ndarray(batch.shape, dtype=batch.dtype,
+                              buffer=other.buf)
+            self.assertEqual(list(view[:, 0, 0]), [0, 1, 2])
+            del view
+            other.close()
+        finally:
+            del batch
+            shm.close()
+            shm.unlink()
+
+    def test_to_batch_checks_headers_before_decoding(self):
+        from jicbioimage.core.image import ImageCollection, ProxyImage
+        image_collection = ImageCollection()
+        image_collection.append(ProxyImage(os.path.join(DATA_DIR,
+                                                        'multipage.tif')))
+        image_collection.append(ProxyImage(os.path.join(DATA_DIR,
+                                                        'white-16bit.tiff')))
+        image_collection.append(ProxyImage(
+            os.path.join(DATA_DIR, 'single-channel.ome.tif')))
+        with patch('jicbioimage.core.image.Image.from_file') as from_file:
+            with self.assertRaises(ValueError):
+                image_collection.to_batch()
+            self.assertFalse(from_file.called)
+
+    def test_to_batch_checks_dtypes(self):
+        from jicbioimage.core.image import ImageCollection, ProxyImage, Image
+        from jicbioimage.core.util.tiff import write
+        if not os.path.isdir(TMP_DIR):
+            os.mkdir(TMP_DIR)
+        try:
+            image_collection = ImageCollection()
+            for dtype in [np.uint8, np.uint16]:
+                fpath = os.path.join(TMP_DIR, '{}.tif'.format(dtype.__name__))
+                write(fpath, np.zeros((2, 2), dtype=dtype))
+                image_collection.append(ProxyImage(fpath))
+            with patch('jicbioimage.core.image.Image.from_file') as from_file:
+                with self.assertRaises(ValueError):
+                    image_collection.to_batch()
+                self.assertFalse(from_file.called)
+        finally:
+            shutil.rmtree(TMP_DIR)
+
+        # Images whose headers cannot be read are checked once decoded.
+        def from_file(fpath, *args, **kwargs):
+            image = _fake_from_file(fpath)
+            if fpath == 'test2.tif':
+                return Image.from_array(image.astype(np.uint16) * 256)
+            return image
+
+        image_collection = self._collection(3)
+        with patch('jicbioimage.core.image.Image.from_file',
+                   side_effect=from_file):
+            with self.assertRaises(ValueError):
+                image_collection.to_batch()
+
     def test_repr_html(self):
         from jicbioimage.core.image import ImageCollection, ProxyImage, Image
         image_collection = ImageCollection()
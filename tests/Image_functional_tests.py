@@ -74,5 +74,18 @@ class ImageUserStory(unittest.TestCase):
         image = Image.from_file(fpath)
         self.assertEqual(type(image.png()), bytes)
 
+    def test_proxy_image_of_compressed_tiff_file(self):
+        from jicbioimage.core.image import Image, ProxyImage
+        from jicbioimage.core.util.tiff import write
+        ar = np.arange(5000, dtype=np.uint16).reshape((50, 100))
+        fpath = os.path.join(TMP_DIR, 'compressed.tif')
+        write(fpath, ar, compression='deflate', predictor=True)
+        image = ProxyImage(fpath, dict(compressed=True)).image
+        self.assertTrue(isinstance(image, Image))
+        self.assertEqual(image.dtype, np.uint16)
+        self.assertTrue(np.array_equal(image, ar))
+        self.assertEqual(image.history.creation,
+                         'Created Image from {}'.format(fpath))
+
 if __name__ == '__main__':
     unittest.main()
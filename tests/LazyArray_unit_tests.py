@@ -0,0 +1,114 @@
+"""Tests for the :class:`jicbioimage.core.image.LazyArray` class."""
+
+import unittest
+import os.path
+
+import numpy as np
+
+try:
+    from mock import patch
+except ImportError:
+    from unittest.mock import patch
+
+
+def _fake_from_file(fpath, *args, **kwargs):
+    """Return image whose pixel values encode t, c and z as 100t + 10c + z."""
+    from jicbioimage.core.image import Image
+    name = os.path.basename(fpath).split('.')[0]
+    s, c, z, t = [int(x[1:]) for x in name.split('_')]
+    ar = np.arange(12, dtype=np.uint16).reshape((3, 4))
+    return Image.from_array(ar + (100*t + 10*c + z))
+
+
+def _collection():
+    from jicbioimage.core.image import MicroscopyCollection, MicroscopyImage
+    microscopy_collection = MicroscopyCollection()
+    for c in range(2):
+        for z in range(3):
+            for t in range(4):
+                fname = 'S0_C{}_Z{}_T{}.tif'.format(c, z, t)
+                microscopy_collection.append(MicroscopyImage(fname,
+                    dict(series=0, channel=c, zslice=z, timepoint=t)))
+    return microscopy_collection
+
+
+class LazyArrayTests(unittest.TestCase):
+
+    def setUp(self):
+        self.patcher = patch('jicbioimage.core.image.Image.from_file',
+                             side_effect=_fake_from_file)
+        self.from_file = self.patcher.start()
+        self.microscopy_collection = _collection()
+        self.expected = self.microscopy_collection.hyperstack()
+        self.from_file.reset_mock()
+
+    def tearDown(self):
+        self.patcher.stop()
+
+    def test_shape_and_dtype(self):
+        lazy_array = self.microscopy_collection.lazy_array()
+        self.assertEqual(lazy_array.shape, (4, 2, 3, 3, 4))
+        self.assertEqual(lazy_array.dtype, np.uint16)
+        self.assertEqual(lazy_array.ndim, 5)
+        self.assertEqual(len(lazy_array), 4)
+        self.assertEqual(lazy_array.nbytes, self.expected.nbytes)
+
+    def test_slicing_only_decodes_touched_planes(self):
+        lazy_array = self.microscopy_collection.lazy_array(workers=1)
+        self.from_file.reset_mock()
+        self.assertEqual(lazy_array[3, 1, 2, 0, 0], 312)
+        self.assertEqual(self.from_file.call_count, 1)
+        self.assertEqual(lazy_array[3, 1, 2, 2, 3], 323)
+        self.assertEqual(self.from_file.call_count, 1)
+
+    def test_slicing(self):
+        lazy_array = self.microscopy_collection.lazy_array()
+        for key in [1,
+                    (slice(0, 2), 1, Ellipsis, 0),
+                    (Ellipsis, 1),
+                    (-1, slice(None), slice(1, 3), slice(None, None, 2))]:
+            self.assertTrue(np.array_equal(lazy_array[key],
+                                           self.expected[key]))
+        with self.assertRaises(IndexError):
+            lazy_array[4]
+        with self.assertRaises(IndexError):
+            lazy_array[[0, 1]]
+
+    def test_asarray(self):
+        lazy_array = self.microscopy_collection.lazy_array()
+        self.assertTrue(np.array_equal(np.asarray(lazy_array), self.expected))
+        self.assertEqual(np.asarray(lazy_array, dtype=float).dtype, float)
+
+    def test_cache_size(self):
+        lazy_array = self.microscopy_collection.lazy_array(cache_size=2,
+                                                           workers=1)
+        lazy_array[0, 0, 0]
+        lazy_array[0, 0, 1]
+        lazy_array[0, 0, 2]
+        self.from_file.reset_mock()
+        lazy_array[0, 0, 0]
+        self.assertEqual(self.from_file.call_count, 1)
+        lazy_array[0, 0, 2]
+        self.assertEqual(self.from_file.call_count, 1)
+
+    def test_reductions(self):
+        lazy_array = self.microscopy_collection.lazy_array()
+        for axis in [None, 2, (0, 2), (3, 4), (2, 3), -1]:
+            for func in [np.max, np.min, np.sum, np.mean]:
+                result = func(lazy_array, axis=axis)
+                expected = func(self.expected, axis=axis)
+                self.assertEqual(np.shape(result), np.shape(expected))
+                self.assertEqual(np.asarray(result).dtype,
+                                 np.asarray(expected).dtype)
+                self.assertTrue(np.allclose(result, expected))
+        self.assertEqual(lazy_array.max(axis=2, keepdims=True).shape,
+                         (4, 2, 1, 3, 4))
+
+    def test_other_array_functions_materialise(self):
+        lazy_array = self.microscopy_collection.lazy_array()
+        stacked = np.concatenate([lazy_array, lazy_array])
+        self.assertEqual(stacked.shape, (8, 2, 3, 3, 4))
+
+
+if __name__ == '__main__':
+    unittest.main()
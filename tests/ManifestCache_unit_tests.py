@@ -0,0 +1,160 @@
+"""Unit tests for :class:`jicbioimage.core.io.ManifestCache."""
+
+import unittest
+import os
+import os.path
+import shutil
+import json
+
+try:
+    from mock import patch
+except ImportError:
+    from unittest.mock import patch
+
+HERE = os.path.dirname(__file__)
+TMP_DIR = os.path.join(HERE, 'tmp')
+
+
+class ManifestCacheUnitTests(unittest.TestCase):
+
+    def setUp(self):
+        if not os.path.isdir(TMP_DIR):
+            os.mkdir(TMP_DIR)
+        self.fpath = os.path.join(TMP_DIR, 'manifest.json')
+        self.write_json(3)
+
+    def tearDown(self):
+        shutil.rmtree(TMP_DIR)
+
+    def write_json(self, num_zslices):
+        entries = [dict(filename='S0_C0_Z{}_T0.tif'.format(z), series=0,
+                        channel=0, zslice=z, timepoint=0)
+                   for z in range(num_zslices)]
+        with open(self.fpath, 'w') as fh:
+            json.dump(entries, fh)
+
+    def test_load(self):
+        from jicbioimage.core.io import ManifestCache
+        from jicbioimage.core.image import MicroscopyCollection
+        cache = ManifestCache()
+        collection = cache.load(self.fpath, MicroscopyCollection)
+        self.assertTrue(isinstance(collection, MicroscopyCollection))
+        self.assertEqual(len(collection), 3)
+        self.assertEqual(collection.zslices(), [0, 1, 2])
+        self.assertEqual(len(cache), 1)
+
+    def test_reload_does_not_parse(self):
+        from jicbioimage.core.io import ManifestCache
+        from jicbioimage.core.image import MicroscopyCollection
+        cache = ManifestCache()
+        first = cache.load(self.fpath, MicroscopyCollection)
+        with patch('jicbioimage.core.io._read_manifest') as read_manifest:
+            second = cache.load(self.fpath, MicroscopyCollection)
+            self.assertFalse(read_manifest.called)
+        self.assertFalse(first is second)
+        self.assertTrue(first[0] is second[0])
+
+        # Modifying one collection does not affect the other.
+        del first[0]
+        self.assertEqual(len(second), 3)
+        self.assertEqual(second.zslices(), [0, 1, 2])
+        self.assertEqual(len(cache.load(self.fpath, MicroscopyCollection)), 3)
+
+    def test_changed_manifest_is_parsed_again(self):
+        from jicbioimage.core.io import ManifestCache
+        from jicbioimage.core.image import ImageCollection
+        cache = ManifestCache()
+        self.assertEqual(len(cache.load(self.fpath)), 3)
+        self.write_json(5)
+        self.assertEqual(len(cache.load(self.fpath)), 5)
+
+    def test_collection_class_is_part_of_key(self):
+        from jicbioimage.core.io import ManifestCache
+        from jicbioimage.core.image import (
+            ImageCollection,
+            MicroscopyCollection,
+            MicroscopyImage,
+        )
+        cache = ManifestCache()
+        collection = cache.load(self.fpath, ImageCollection)
+        self.assertFalse(isinstance(collection[0], MicroscopyImage))
+        collection = cache.load(self.fpath, MicroscopyCollection)
+        self.assertTrue(isinstance(collection[0], MicroscopyImage))
+
+    def test_persist(self):
+        from jicbioimage.core.io import ManifestCache
+        binary_fpath = os.path.join(TMP_DIR, 'manifest.npz')
+        ManifestCache(persist=False).load(self.fpath)
+        self.assertFalse(os.path.isfile(binary_fpath))
+        ManifestCache().load(self.fpath)
+        self.assertTrue(os.path.isfile(binary_fpath))
+
+        # A new cache, e.g. in another process, reads the binary manifest.
+        with patch('json.load') as json_load:
+            collection = ManifestCache().load(self.fpath)
+            self.assertFalse(json_load.called)
+        self.assertEqual(len(collection), 3)
+
+    def test_clear(self):
+        from jicbioimage.core.io import ManifestCache
+        cache = ManifestCache()
+        cache.load(self.fpath)
+        cache.clear()
+        self.assertEqual(len(cache), 0)
+
+    def test_cache_size(self):
+        from jicbioimage.core.io import ManifestCache
+        cache = ManifestCache(cache_size=2)
+        fpaths = []
+        for i in range(3):
+            fpaths.append(os.path.join(TMP_DIR, 'manifest{}.json'.format(i)))
+            shutil.copy(self.fpath, fpaths[-1])
+        cache.load(fpaths[0])
+        cache.load(fpaths[1])
+        cache.load(fpaths[0])
+        cache.load(fpaths[2])
+        self.assertEqual(len(cache), 2)
+
+        # The least recently loaded manifest was removed.
+        with patch('jicbioimage.core.io._read_manifest') as read_manifest:
+            cache.load(fpaths[0])
+            cache.load(fpaths[2])
+            self.assertFalse(read_manifest.called)
+
+    def test_removed_manifests_close_their_containers(self):
+        import numpy as np
+        from jicbioimage.core.io import ManifestCache
+        from jicbioimage.core.util.packed import PackedWriter
+        ar = np.arange(6, dtype=np.uint16).reshape((2, 3))
+        with PackedWriter(os.path.join(TMP_DIR, 'planes.bin')) as writer:
+            entries = [dict(filename='planes.bin', offset=writer.add(ar + z),
+                            shape=[2, 3], dtype=ar.dtype.str, series=0,
+                            channel=0, zslice=z, timepoint=0)
+                       for z in range(2)]
+        with open(self.fpath, 'w') as fh:
+            json.dump(entries, fh)
+
+        cache = ManifestCache(cache_size=1)
+        collection = cache.load(self.fpath)
+        packed_file = collection[0].packed_file
+        self.assertTrue(collection[1].packed_file is packed_file)
+        self.assertTrue(np.array_equal(collection[1].image, ar + 1))
+        self.assertFalse(packed_file._mmap is None)
+        cache.forget(self.fpath)
+        self.assertTrue(packed_file._mmap is None)
+
+        # Proxy images still in use map the container again.
+        self.assertTrue(np.array_equal(collection[0].image, ar))
+
+        # So do manifests removed to make room for another.
+        collection = cache.load(self.fpath)
+        collection[0].image
+        self.assertFalse(collection[0].packed_file._mmap is None)
+        other = os.path.join(TMP_DIR, 'other.json')
+        shutil.copy(self.fpath, other)
+        cache.load(other)
+        self.assertTrue(collection[0].packed_file._mmap is None)
+
+
+if __name__ == '__main__':
+    unittest.main()
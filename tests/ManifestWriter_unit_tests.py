@@ -0,0 +1,91 @@
+"""Unit tests for :class:`jicbioimage.core.io.ManifestWriter."""
+
+import unittest
+import os
+import os.path
+import shutil
+
+HERE = os.path.dirname(__file__)
+TMP_DIR = os.path.join(HERE, 'tmp')
+
+
+class ManifestWriterUnitTests(unittest.TestCase):
+
+    def setUp(self):
+        if not os.path.isdir(TMP_DIR):
+            os.mkdir(TMP_DIR)
+        self.fpath = os.path.join(TMP_DIR, 'manifest.json')
+        self.binary_fpath = os.path.join(TMP_DIR, 'manifest.npz')
+
+    def tearDown(self):
+        shutil.rmtree(TMP_DIR)
+
+    def test_json_identical_to_manifest_json(self):
+        from jicbioimage.core.io import Manifest, ManifestWriter
+        manifest = Manifest()
+        with ManifestWriter(self.fpath) as writer:
+            for i in range(3):
+                entry = dict(md5_hexdigest='abc', series=i, channel=0,
+                             zslice=1, timepoint=2)
+                manifest.add('S{}_C0_Z1_T2.tif'.format(i), **entry)
+                writer.add('S{}_C0_Z1_T2.tif'.format(i), **entry)
+        with open(self.fpath) as fh:
+            self.assertEqual(fh.read(), manifest.json)
+
+    def test_empty(self):
+        from jicbioimage.core.io import ManifestWriter
+        from jicbioimage.core.image import ImageCollection
+        with ManifestWriter(self.fpath):
+            pass
+        with open(self.fpath) as fh:
+            self.assertEqual(fh.read(), '[]')
+        self.assertEqual(len(ImageCollection(self.fpath)), 0)
+
+    def test_binary_manifest_written(self):
+        from jicbioimage.core.io import ManifestWriter
+        with ManifestWriter(self.fpath) as writer:
+            writer.add('a.tif', series=0, name='a', scale=0.5, flag=True)
+        self.assertTrue(os.path.isfile(self.binary_fpath))
+
+    def test_binary_manifest_with_list_values(self):
+        from jicbioimage.core.io import ManifestWriter
+        from jicbioimage.core.image import _read_binary_manifest
+        with ManifestWriter(self.fpath) as writer:
+            writer.add('a.bin', offset=0, shape=[3, 4])
+            writer.add('a.bin', offset=64, shape=[5, 6])
+        self.assertEqual(_read_binary_manifest(self.fpath),
+                         [dict(filename='a.bin', offset=0, shape=[3, 4]),
+                          dict(filename='a.bin', offset=64, shape=[5, 6])])
+
+        # Lists of different lengths cannot be stored in a column.
+        with ManifestWriter(self.fpath) as writer:
+            writer.add('a.bin', shape=[3, 4])
+            writer.add('a.bin', shape=[5, 6, 3])
+        self.assertFalse(os.path.isfile(self.binary_fpath))
+
+    def test_binary_manifest_not_written_for_irregular_entries(self):
+        from jicbioimage.core.io import ManifestWriter
+        with ManifestWriter(self.fpath) as writer:
+            writer.add('a.tif', series=0)
+            writer.add('b.tif')
+        self.assertFalse(os.path.isfile(self.binary_fpath))
+
+        with ManifestWriter(self.fpath) as writer:
+            writer.add('a.tif', series=0)
+            writer.add('b.tif', series='one')
+        self.assertFalse(os.path.isfile(self.binary_fpath))
+
+    def test_stale_binary_manifest_removed(self):
+        from jicbioimage.core.io import ManifestWriter
+        with ManifestWriter(self.fpath) as writer:
+            writer.add('a.tif', series=0)
+        self.assertTrue(os.path.isfile(self.binary_fpath))
+        with self.assertRaises(KeyError):
+            with ManifestWriter(self.fpath) as writer:
+                writer.add('a.tif', series=0)
+                raise(KeyError())
+        self.assertFalse(os.path.isfile(self.binary_fpath))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,6 +1,12 @@
 """Unit tests for :class:`jicbioimage.core.io.Manifest."""
 
 import unittest
+import os
+import os.path
+import shutil
+
+HERE = os.path.dirname(__file__)
+TMP_DIR = os.path.join(HERE, 'tmp')
 
 
 class ManifestUnitTests(unittest.TestCase):
@@ -35,3 +41,19 @@ class ManifestUnitTests(unittest.TestCase):
         manifest.add(filename="my_image.png", series=0)
         self.assertEqual(manifest.json,
                          '[{"filename": "my_image.png", "series": 0}]')
+
+    def test_write(self):
+        from jicbioimage.core.io import Manifest
+        manifest = Manifest()
+        manifest.add(filename="my_image.png", series=0)
+        if not os.path.isdir(TMP_DIR):
+            os.mkdir(TMP_DIR)
+        try:
+            fpath = os.path.join(TMP_DIR, 'manifest.json')
+            manifest.write(fpath)
+            with open(fpath) as fh:
+                self.assertEqual(fh.read(), manifest.json)
+            self.assertTrue(os.path.isfile(os.path.join(TMP_DIR,
+                                                        'manifest.npz')))
+        finally:
+            shutil.rmtree(TMP_DIR)
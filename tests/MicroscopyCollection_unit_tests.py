@@ -1,12 +1,36 @@
 """Tests for the :class:`jicbioimage.core.image.MicroscopyCollection` class."""
 
 import unittest
+import os
+import os.path
+import shutil
+
+import numpy as np
 
 try:
     from mock import MagicMock, patch
 except ImportError:
     from unittest.mock import MagicMock, patch
 
+HERE = os.path.dirname(__file__)
+TMP_DIR = os.path.join(HERE, 'tmp')
+
+
+def _fake_from_file(fpath, *args, **kwargs):
+    """Return image whose pixel values encode the z-slice in the file name."""
+    from jicbioimage.core.image import Image
+    z = int(fpath.split('_Z')[1].split('_')[0])
+    return Image.from_array(np.ones((3, 4), dtype=np.uint16) * z)
+
+
+def _fake_tcz_from_file(fpath, *args, **kwargs):
+    """Return image whose pixel values encode t, c and z as 100t + 10c + z."""
+    from jicbioimage.core.image import Image
+    name = os.path.basename(fpath).split('.')[0]
+    s, c, z, t = [int(x[1:]) for x in name.split('_')]
+    return Image.from_array(np.ones((3, 4), dtype=np.uint16) * (100*t + 10*c + z))
+
+
 class MicroscopyCollectionTests(unittest.TestCase):
 
     def test_len(self):
@@ -52,6 +76,127 @@ class MicroscopyCollectionTests(unittest.TestCase):
         self.assertEqual(microscopy_collection.timepoints(s=1), [4])
 
 
+    def test_dims(self):
+        from jicbioimage.core.image import MicroscopyCollection, MicroscopyImage
+        microscopy_collection = MicroscopyCollection()
+        microscopy_collection.append(MicroscopyImage('test0.tif',
+            dict(series=0, channel=0, zslice=0, timepoint=0)))
+        microscopy_collection.append(MicroscopyImage('test1.tif',
+            dict(series=0, channel=1, zslice=2, timepoint=3)))
+        self.assertEqual(microscopy_collection.dims(),
+                         dict(series=[0], channels=[0, 1], zslices=[0, 2],
+                              timepoints=[0, 3]))
+        self.assertEqual(microscopy_collection.dims(s=1),
+                         dict(series=[0], channels=[], zslices=[],
+                              timepoints=[]))
+
+    def test_index_is_cached(self):
+        from jicbioimage.core.image import MicroscopyCollection, MicroscopyImage
+        microscopy_collection = MicroscopyCollection()
+        microscopy_collection.append(MicroscopyImage('test0.tif',
+            dict(series=0, channel=0, zslice=0, timepoint=0)))
+        index = microscopy_collection._plane_index
+        self.assertTrue(microscopy_collection._plane_index is index)
+
+        # The list API is not shadowed by the index.
+        proxy_image = microscopy_collection[0]
+        self.assertEqual(microscopy_collection.index(proxy_image), 0)
+
+        # Returned lists are copies and cannot corrupt the cache.
+        microscopy_collection.channels().append(5)
+        self.assertEqual(microscopy_collection.channels(), [0])
+
+    def test_index_invalidated_on_modification(self):
+        from jicbioimage.core.image import MicroscopyCollection, MicroscopyImage
+        microscopy_collection = MicroscopyCollection()
+        microscopy_collection.append(MicroscopyImage('test0.tif',
+            dict(series=0, channel=0, zslice=0, timepoint=0)))
+        self.assertEqual(microscopy_collection.series, [0])
+
+        microscopy_collection.append(MicroscopyImage('test1.tif',
+            dict(series=1, channel=0, zslice=0, timepoint=0)))
+        self.assertEqual(microscopy_collection.series, [0, 1])
+
+        microscopy_collection.extend([MicroscopyImage('test2.tif',
+            dict(series=2, channel=0, zslice=0, timepoint=0))])
+        self.assertEqual(microscopy_collection.series, [0, 1, 2])
+
+        del microscopy_collection[0]
+        self.assertEqual(microscopy_collection.series, [1, 2])
+        self.assertEqual(microscopy_collection.proxy_image(), None)
+
+        microscopy_collection[0] = MicroscopyImage('test3.tif',
+            dict(series=3, channel=0, zslice=0, timepoint=0))
+        self.assertEqual(microscopy_collection.series, [2, 3])
+
+        microscopy_collection.pop()
+        self.assertEqual(microscopy_collection.series, [3])
+
+    def test_proxy_image_returns_first_match(self):
+        from jicbioimage.core.image import MicroscopyCollection, MicroscopyImage
+        microscopy_collection = MicroscopyCollection()
+        microscopy_collection.append(MicroscopyImage('test0.tif',
+            dict(series=0, channel=0, zslice=0, timepoint=0)))
+        microscopy_collection.append(MicroscopyImage('test1.tif',
+            dict(series=0, channel=0, zslice=0, timepoint=0)))
+        self.assertEqual(microscopy_collection.proxy_image().fpath,
+                         'test0.tif')
+
+    def _dense_collection(self):
+        from jicbioimage.core.image import MicroscopyCollection, MicroscopyImage
+        microscopy_collection = MicroscopyCollection()
+        for s in range(2):
+            for c in range(2):
+                for z in range(3):
+                    for t in range(4):
+                        fname = 'S{}_C{}_Z{}_T{}.tif'.format(s, c, z, t)
+                        microscopy_collection.append(MicroscopyImage(fname,
+                            dict(series=s, channel=c, zslice=z, timepoint=t)))
+        return microscopy_collection
+
+    def test_select(self):
+        from jicbioimage.core.image import MicroscopyCollection
+        microscopy_collection = self._dense_collection()
+        selection = microscopy_collection.select(c=1, t=slice(1, 3))
+        self.assertTrue(isinstance(selection, MicroscopyCollection))
+        self.assertEqual(len(selection), 2 * 3 * 2)
+        self.assertEqual(selection.series, [0, 1])
+        self.assertEqual(selection.channels(), [1])
+        self.assertEqual(selection.zslices(), [0, 1, 2])
+        self.assertEqual(selection.timepoints(), [1, 2])
+
+        # The proxy images are shared, not copied.
+        self.assertTrue(selection.proxy_image(s=1, c=1, z=2, t=2)
+                        is microscopy_collection.proxy_image(s=1, c=1, z=2, t=2))
+        self.assertEqual(selection.proxy_image(), None)
+
+        # Modifying the selection does not modify the parent.
+        del selection[0]
+        self.assertEqual(len(microscopy_collection), 48)
+
+    def test_select_selectors(self):
+        microscopy_collection = self._dense_collection()
+        self.assertEqual(len(microscopy_collection.select()), 48)
+        self.assertEqual(
+            microscopy_collection.select(s=0, z=[0, 2]).zslices(), [0, 2])
+        self.assertEqual(
+            microscopy_collection.select(s=0, t=slice(None, None, 2)).timepoints(),
+            [0, 2])
+        self.assertEqual(
+            microscopy_collection.select(s=0, t=slice(1, None, 2)).timepoints(),
+            [1, 3])
+        self.assertEqual(len(microscopy_collection.select(s=5)), 0)
+        with self.assertRaises(ValueError):
+            microscopy_collection.select(t=slice(None, None, -1))
+
+    def test_select_order(self):
+        microscopy_collection = self._dense_collection()
+        selection = microscopy_collection.select(s=0, c=0, t=[0, 1])
+        self.assertEqual([p.fpath for p in selection],
+                         ['S0_C0_Z0_T0.tif', 'S0_C0_Z0_T1.tif',
+                          'S0_C0_Z1_T0.tif', 'S0_C0_Z1_T1.tif',
+                          'S0_C0_Z2_T0.tif', 'S0_C0_Z2_T1.tif'])
+
     def test_zstack_proxy_iterator(self):
         from jicbioimage.core.image import MicroscopyCollection
         microscopy_collection = MicroscopyCollection()
@@ -71,6 +216,231 @@ class MicroscopyCollectionTests(unittest.TestCase):
         microscopy_collection = MicroscopyCollection()
         self.assertTrue(callable(microscopy_collection.zstack_array))
 
+    def _shuffled_zstack_collection(self):
+        from jicbioimage.core.image import MicroscopyCollection, MicroscopyImage
+        microscopy_collection = MicroscopyCollection()
+        for z in [3, 0, 2, 1, 4]:
+            fname = 'S0_C0_Z{}_T0.tif'.format(z)
+            microscopy_collection.append(MicroscopyImage(fname,
+                dict(series=0, channel=0, zslice=z, timepoint=0)))
+        return microscopy_collection
+
+    def test_zstack_array_sorted_by_zslice(self):
+        microscopy_collection = self._shuffled_zstack_collection()
+        self.assertEqual(
+            [p.zslice for p in microscopy_collection.zstack_proxy_iterator()],
+            [0, 1, 2, 3, 4])
+        with patch('jicbioimage.core.image.Image.from_file',
+                   side_effect=_fake_from_file):
+            for workers in [1, 3]:
+                zstack = microscopy_collection.zstack_array(workers=workers)
+                self.assertEqual(zstack.shape, (3, 4, 5))
+                self.assertEqual(zstack.dtype, np.uint16)
+                self.assertEqual(list(zstack[0, 0, :]), [0, 1, 2, 3, 4])
+
+    def test_zstack_array_out(self):
+        microscopy_collection = self._shuffled_zstack_collection()
+        out = np.zeros((3, 4, 5), dtype=np.uint16)
+        with patch('jicbioimage.core.image.Image.from_file',
+                   side_effect=_fake_from_file):
+            zstack = microscopy_collection.zstack_array(out=out)
+            self.assertTrue(zstack is out)
+            self.assertEqual(list(out[2, 3, :]), [0, 1, 2, 3, 4])
+            with self.assertRaises(ValueError):
+                microscopy_collection.zstack_array(
+                    out=np.zeros((3, 4, 4), dtype=np.uint16))
+
+    def test_zstack_mmap_path(self):
+        from jicbioimage.core.image import Image3D
+        if not os.path.isdir(TMP_DIR):
+            os.mkdir(TMP_DIR)
+        try:
+            microscopy_collection = self._shuffled_zstack_collection()
+            mmap_path = os.path.join(TMP_DIR, 'zstack.npy')
+            with patch('jicbioimage.core.image.Image.from_file',
+                       side_effect=_fake_from_file):
+                zstack = microscopy_collection.zstack(mmap_path=mmap_path)
+            self.assertTrue(isinstance(zstack, Image3D))
+            self.assertEqual(list(zstack[1, 1, :]), [0, 1, 2, 3, 4])
+            del zstack
+            self.assertEqual(list(np.load(mmap_path)[0, 0, :]),
+                             [0, 1, 2, 3, 4])
+        finally:
+            shutil.rmtree(TMP_DIR)
+
+    def test_zstack_array_allocates_from_headers(self):
+        import threading
+        from jicbioimage.core.image import (
+            Image,
+            MicroscopyCollection,
+            MicroscopyImage,
+        )
+        from jicbioimage.core.util.tiff import read, write
+        if not os.path.isdir(TMP_DIR):
+            os.mkdir(TMP_DIR)
+        try:
+            microscopy_collection = MicroscopyCollection()
+            for z in range(3):
+                fpath = os.path.join(TMP_DIR, 'S0_C0_Z{}_T0.tif'.format(z))
+                write(fpath, np.ones((3, 4), dtype=np.uint16) * z)
+                microscopy_collection.append(MicroscopyImage(fpath,
+                    dict(series=0, channel=0, zslice=z, timepoint=0)))
+            threads = []
+
+            def from_file(fpath, *args, **kwargs):
+                threads.append(threading.current_thread())
+                return Image.from_array(read(fpath))
+
+            with patch('jicbioimage.core.image.Image.from_file',
+                       side_effect=from_file):
+                zstack = microscopy_collection.zstack_array(workers=3)
+            self.assertEqual(zstack.dtype, np.uint16)
+            self.assertEqual(list(zstack[0, 0, :]), [0, 1, 2])
+            self.assertEqual(len(threads), 3)
+            self.assertFalse(threading.current_thread() in threads)
+
+            fpath = os.path.join(TMP_DIR, 'S0_C0_Z1_T0.tif')
+            write(fpath, np.ones((3, 4), dtype=np.uint8))
+            with patch('jicbioimage.core.image.Image.from_file') as from_file:
+                with self.assertRaises(ValueError):
+                    microscopy_collection.zstack_array()
+                self.assertFalse(from_file.called)
+        finally:
+            shutil.rmtree(TMP_DIR)
+
+    def test_zstack_array_empty_raises(self):
+        from jicbioimage.core.image import MicroscopyCollection
+        microscopy_collection = MicroscopyCollection()
+        with self.assertRaises(ValueError):
+            microscopy_collection.zstack_array()
+
+    def test_hyperstack(self):
+        microscopy_collection = self._dense_collection()
+        with patch('jicbioimage.core.image.Image.from_file',
+                   side_effect=_fake_tcz_from_file):
+            hyperstack = microscopy_collection.hyperstack(s=1, workers=2)
+        self.assertEqual(hyperstack.shape, (4, 2, 3, 3, 4))
+        self.assertEqual(hyperstack.dtype, np.uint16)
+        self.assertEqual(hyperstack[3, 1, 2, 0, 0], 312)
+        self.assertEqual(hyperstack[0, 1, 0, 2, 3], 10)
+
+    def test_hyperstack_subset(self):
+        microscopy_collection = self._dense_collection()
+        with patch('jicbioimage.core.image.Image.from_file',
+                   side_effect=_fake_tcz_from_file):
+            info = microscopy_collection.hyperstack_info(c=1, t=slice(1, 3))
+            hyperstack = microscopy_collection.hyperstack(c=1, t=slice(1, 3))
+        self.assertEqual(info["shape"], (2, 1, 3, 3, 4))
+        self.assertEqual(info["dtype"], np.uint16)
+        self.assertEqual(info["nbytes"], 2 * 3 * 3 * 4 * 2)
+        self.assertEqual(info["timepoints"], [1, 2])
+        self.assertEqual(hyperstack.shape, info["shape"])
+        self.assertEqual(list(hyperstack[:, 0, 1, 0, 0]), [111, 211])
+
+    def test_hyperstack_missing_planes_are_zero(self):
+        microscopy_collection = self._dense_collection()
+        del microscopy_collection[0]
+        out = np.ones((4, 2, 3, 3, 4), dtype=np.uint16)
+        with patch('jicbioimage.core.image.Image.from_file',
+                   side_effect=_fake_tcz_from_file):
+            microscopy_collection.hyperstack(s=0, out=out)
+        self.assertEqual(out[0, 0, 0].max(), 0)
+        self.assertEqual(out[1, 0, 0].max(), 100)
+        with self.assertRaises(ValueError):
+            microscopy_collection.hyperstack(s=7)
+
+    def test_hyperstack_checks_dtypes(self):
+        from jicbioimage.core.image import Image
+        microscopy_collection = self._dense_collection()
+
+        def from_file(fpath, *args, **kwargs):
+            image = _fake_tcz_from_file(fpath)
+            if os.path.basename(fpath) == 'S0_C1_Z2_T3.tif':
+                return Image.from_array(image.astype(np.uint8))
+            return image
+
+        with patch('jicbioimage.core.image.Image.from_file',
+                   side_effect=from_file):
+            microscopy_collection.hyperstack(s=0, c=0)
+            with self.assertRaises(ValueError):
+                microscopy_collection.hyperstack(s=0)
+
+    def test_zprojection(self):
+        from jicbioimage.core.image import Image
+        microscopy_collection = self._dense_collection()
+
+        def from_file(fpath, *args, **kwargs):
+            image = _fake_tcz_from_file(fpath)
+            image[0, 0] = [7, 3, 7][int(fpath.split('_Z')[1][0])]
+            return image
+
+        with patch('jicbioimage.core.image.Image.from_file',
+                   side_effect=from_file):
+            zstack = microscopy_collection.zstack_array(s=1, c=1, t=2)
+            for reducer in ["max", "min", "sum", "mean", "std", "argmax"]:
+                for workers in [1, 2]:
+                    projection = microscopy_collection.zprojection(
+                        s=1, c=1, t=2, reducer=reducer, workers=workers)
+                    expected = getattr(np, reducer)(zstack, axis=2)
+                    self.assertTrue(isinstance(projection, Image))
+                    self.assertEqual(projection.dtype, expected.dtype)
+                    self.assertTrue(np.allclose(projection, expected))
+
+            with self.assertRaises(ValueError):
+                microscopy_collection.zprojection(reducer="median")
+            with self.assertRaises(ValueError):
+                microscopy_collection.zprojection(s=3)
+
+    def test_time_windows(self):
+        microscopy_collection = self._dense_collection()
+        with patch('jicbioimage.core.image.Image.from_file',
+                   side_effect=_fake_tcz_from_file) as from_file:
+            for readahead in [0, 1, 3]:
+                from_file.reset_mock()
+                windows = [w[:, 0, 0].tolist() for w in
+                           microscopy_collection.time_windows(
+                               s=0, c=1, z=2, size=2, readahead=readahead)]
+                self.assertEqual(windows,
+                                 [[12, 112], [112, 212], [212, 312]])
+                self.assertEqual(from_file.call_count, 4)
+
+            windows = [w[:, 0, 0].tolist() for w in
+                       microscopy_collection.time_windows(size=3, step=2)]
+            self.assertEqual(windows, [[0, 100, 200]])
+
+            # Time points not in any window are not decoded.
+            from_file.reset_mock()
+            windows = [w[:, 0, 0].tolist() for w in
+                       microscopy_collection.time_windows(size=1, step=3)]
+            self.assertEqual(windows, [[0], [300]])
+            self.assertEqual(from_file.call_count, 2)
+
+            self.assertEqual(
+                list(microscopy_collection.time_windows(size=5)), [])
+
+    def test_time_windows_are_read_only(self):
+        microscopy_collection = self._dense_collection()
+        with patch('jicbioimage.core.image.Image.from_file',
+                   side_effect=_fake_tcz_from_file):
+            window = next(microscopy_collection.time_windows())
+            self.assertEqual(window.shape, (2, 3, 4))
+            with self.assertRaises(ValueError):
+                window[0, 0, 0] = 1
+            with self.assertRaises(ValueError):
+                next(microscopy_collection.time_windows(step=0))
+
+    def test_time_windows_missing_time_point_raises(self):
+        microscopy_collection = self._dense_collection()
+        microscopy_collection.remove(
+            microscopy_collection.proxy_image(s=0, c=1, z=2, t=1))
+        with patch('jicbioimage.core.image.Image.from_file',
+                   side_effect=_fake_tcz_from_file) as from_file:
+            with self.assertRaises(ValueError):
+                next(microscopy_collection.time_windows(s=0, c=1, z=2))
+            self.assertFalse(from_file.called)
+            window = next(microscopy_collection.time_windows(s=0, c=0, z=2))
+            self.assertEqual(window[:, 0, 0].tolist(), [2, 102])
+
     def test_zstack(self):
         from jicbioimage.core.image import MicroscopyCollection
         microscopy_collection = MicroscopyCollection()
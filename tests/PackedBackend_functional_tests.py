@@ -0,0 +1,72 @@
+"""PackedBackend functional tests using stand-ins for the bftools."""
+
+import unittest
+import os
+import os.path
+
+import numpy as np
+
+try:
+    from mock import patch
+except ImportError:
+    from unittest.mock import patch
+
+from .fake_bftools import (
+    FakeBFToolsTestCase,
+    TMP_DIR,
+    write_input,
+)
+
+
+class PackedBackendFunctionalTests(FakeBFToolsTestCase):
+
+    def test_load(self):
+        from jicbioimage.core.io import DataManager, PackedBackend
+        from jicbioimage.core.image import (
+            MicroscopyCollection,
+            PackedMicroscopyImage,
+        )
+        backend = PackedBackend(os.path.join(TMP_DIR, 'backend'))
+        fpath = write_input('plate.lif', series=2, channels=2, zslices=3,
+                            timepoints=1, tiff=[30, 50])
+        collection = DataManager(backend).load(fpath)
+        self.assertTrue(isinstance(collection, MicroscopyCollection))
+        self.assertEqual(len(collection), 12)
+
+        # The converted images are replaced by a single container file.
+        key = backend.entries()[0]
+        entry_dir = os.path.join(backend.directory, key)
+        self.assertEqual(sorted(os.listdir(entry_dir)),
+                         ['manifest.json', 'manifest.npz', 'planes.bin'])
+
+        proxy_image = collection.proxy_image(s=1, c=1, z=2)
+        self.assertTrue(isinstance(proxy_image, PackedMicroscopyImage))
+        self.assertEqual(proxy_image.fpath,
+                         os.path.join(entry_dir, 'planes.bin'))
+        self.assertEqual(proxy_image.offset % 64, 0)
+        self.assertEqual(proxy_image.probe(), ((30, 50), np.uint8))
+
+        # Reading the images does not open a file per image.
+        with patch('jicbioimage.core.util.packed.open', create=True,
+                   side_effect=open) as mock_open:
+            hyperstack = collection.hyperstack(s=1)
+        self.assertEqual(mock_open.call_count, 1)
+        expected = np.zeros((1, 2, 3, 30, 50), dtype=np.uint8)
+        for c in range(2):
+            for z in range(3):
+                expected[0, c, z, -1, -1] = 1 + c + z
+        self.assertTrue(np.array_equal(hyperstack, expected))
+
+        image = collection.image(s=0, c=1, z=1)
+        self.assertEqual(image[-1, -1], 2)
+        image[0, 0] = 1
+
+    def test_compression_not_supported(self):
+        from jicbioimage.core.io import PackedBackend
+        with self.assertRaises(ValueError):
+            PackedBackend(os.path.join(TMP_DIR, 'backend'),
+                          compression='deflate')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -24,6 +24,17 @@ class ProxyImage(unittest.TestCase):
             '<table><tr><th>Index</th><td>30</td></tr></table>'
         ) 
         
+    def test_probe(self):
+        import os.path
+        import numpy as np
+        from jicbioimage.core.image import ProxyImage
+        data_dir = os.path.join(os.path.dirname(__file__), 'data')
+        proxy_image = ProxyImage(os.path.join(data_dir, 'white-16bit.tiff'))
+        self.assertEqual(proxy_image.probe(), ((50, 50), np.uint16))
+        proxy_image = ProxyImage(os.path.join(data_dir, 'tjelvar.png'))
+        with self.assertRaises(ValueError):
+            proxy_image.probe()
+
 if __name__ == '__main__':
     unittest.main()
 
@@ -0,0 +1,168 @@
+"""TiffImporter functional tests."""
+
+import unittest
+import os
+import os.path
+import sys
+import shutil
+
+import numpy as np
+
+try:
+    from mock import patch
+except ImportError:
+    from unittest.mock import patch
+
+HERE = os.path.dirname(__file__)
+DATA_DIR = os.path.join(HERE, 'data')
+TMP_DIR = os.path.join(HERE, 'tmp')
+
+
+def _page(fpath, i):
+    import skimage.io
+    return skimage.io.imread(fpath, plugin='tifffile', key=i)
+
+
+@unittest.skipIf(sys.platform == 'win32', 'needs symbolic links')
+class TiffImporterFunctionalTests(unittest.TestCase):
+
+    def setUp(self):
+        if not os.path.isdir(TMP_DIR):
+            os.mkdir(TMP_DIR)
+        self.backend_dir = os.path.join(TMP_DIR, 'backend')
+        # The bftools must not be needed.
+        self.path_patch = patch.dict(os.environ, {'PATH': ''})
+        self.path_patch.start()
+
+    def tearDown(self):
+        self.path_patch.stop()
+        shutil.rmtree(TMP_DIR)
+
+    def test_ome_tiff(self):
+        from jicbioimage.core.io import DataManager, FileBackend
+        from jicbioimage.core.image import (
+            MicroscopyCollection,
+            PackedMicroscopyImage,
+        )
+        backend = FileBackend(self.backend_dir, index=True)
+        fpath = os.path.join(DATA_DIR, 'z-series.ome.tif')
+        collection = DataManager(backend, native_tiff=True).load(fpath)
+        self.assertTrue(isinstance(collection, MicroscopyCollection))
+        self.assertEqual(len(collection), 5)
+        self.assertEqual(collection.zslices(), [0, 1, 2, 3, 4])
+
+        # The entry only holds the manifest and a link to the file.
+        key = backend.entries()[0]
+        entry_dir = os.path.join(backend.directory, key)
+        self.assertEqual(sorted(os.listdir(entry_dir)),
+                         ['manifest.json', 'manifest.npz', 'source.tif'])
+        self.assertEqual(os.readlink(os.path.join(entry_dir, 'source.tif')),
+                         os.path.abspath(fpath))
+        self.assertLess(backend.entry_size(key), os.path.getsize(fpath))
+
+        for z in range(5):
+            proxy_image = collection.proxy_image(z=z)
+            self.assertTrue(isinstance(proxy_image, PackedMicroscopyImage))
+            self.assertEqual(proxy_image.probe(), ((167, 439), np.int8))
+            image = proxy_image.image
+            self.assertTrue(image.dtype.isnative)
+            self.assertTrue(np.array_equal(image, _page(fpath, z)))
+        self.assertEqual(len(backend.index.query('SELECT * FROM planes')), 5)
+
+    def test_plain_multipage_tiff(self):
+        from jicbioimage.core.io import DataManager, FileBackend
+        from jicbioimage.core.image import MicroscopyCollection
+        backend = FileBackend(self.backend_dir)
+        fpath = os.path.join(DATA_DIR, 'multipage.tif')
+        collection = DataManager(backend, native_tiff=True).load(fpath)
+        self.assertFalse(isinstance(collection, MicroscopyCollection))
+        self.assertEqual(len(collection), 3)
+        self.assertEqual([p.timepoint for p in collection], [0, 1, 2])
+        for i in range(3):
+            self.assertTrue(np.array_equal(collection.image(i),
+                                           _page(fpath, i)))
+
+    def test_imagej_hyperstack(self):
+        try:
+            import tifffile
+        except ImportError:
+            self.skipTest('tifffile is needed to write ImageJ files')
+        from jicbioimage.core.io import DataManager, FileBackend
+        ar = np.arange(2 * 3 * 2 * 4 * 5, dtype=np.uint16)
+        ar = ar.reshape((2, 3, 2, 4, 5))
+        fpath = os.path.join(TMP_DIR, 'hyperstack.tif')
+        tifffile.imwrite(fpath, ar, imagej=True)
+
+        data_manager = DataManager(FileBackend(self.backend_dir),
+                                   native_tiff=True)
+        collection = data_manager.load(fpath)
+        self.assertEqual(len(collection), 12)
+        for proxy_image in collection:
+            expected = ar[proxy_image.timepoint, proxy_image.zslice,
+                          proxy_image.channel]
+            self.assertTrue(np.array_equal(proxy_image.image, expected))
+
+    def test_moved_file_is_relinked(self):
+        from jicbioimage.core.io import DataManager, FileBackend
+        first = os.path.join(TMP_DIR, 'first.ome.tif')
+        second = os.path.join(TMP_DIR, 'second.ome.tif')
+        shutil.copy(os.path.join(DATA_DIR, 'z-series.ome.tif'), first)
+        DataManager(FileBackend(self.backend_dir),
+                    native_tiff=True).load(first)
+        os.rename(first, second)
+
+        backend = FileBackend(self.backend_dir)
+        collection = DataManager(backend, native_tiff=True).load(second)
+        key = backend.entries()[0]
+        link = os.path.join(backend.directory, key, 'source.tif')
+        self.assertEqual(os.readlink(link), os.path.abspath(second))
+        self.assertTrue(np.array_equal(collection.image(z=4),
+                                       _page(second, 4)))
+
+    def test_compressed_tiff_is_not_imported(self):
+        from jicbioimage.core.io import DataManager, FileBackend, TiffImporter
+        from jicbioimage.core.util.tiff import write
+        fpath = os.path.join(TMP_DIR, 'compressed.tif')
+        write(fpath, np.zeros((10, 10), dtype=np.uint8),
+              compression='deflate')
+        backend = FileBackend(self.backend_dir)
+        with self.assertRaises(ValueError):
+            TiffImporter(backend).planes(fpath)
+
+        # The data manager falls back on bfconvert, which is not available.
+        with self.assertRaises(RuntimeError):
+            DataManager(backend, native_tiff=True).load(fpath)
+        self.assertEqual(backend.entries(), [])
+
+    def test_native_tiff_disabled_by_default(self):
+        from jicbioimage.core.io import DataManager, FileBackend
+        data_manager = DataManager(FileBackend(self.backend_dir))
+        self.assertEqual(data_manager.import_tiff, None)
+        with self.assertRaises(RuntimeError):
+            data_manager.load(os.path.join(DATA_DIR, 'multipage.tif'))
+
+    def test_backends_changing_images_are_not_imported_into(self):
+        from jicbioimage.core.io import (
+            DataManager,
+            FileBackend,
+            ChunkedBackend,
+            TiffImporter,
+        )
+        fpath = os.path.join(DATA_DIR, 'multipage.tif')
+        for backend in [FileBackend(self.backend_dir, compression='deflate'),
+                        ChunkedBackend(self.backend_dir + '_chunked')]:
+            importer = TiffImporter(backend)
+            self.assertFalse(importer.stores_images_as_is())
+            self.assertFalse(importer.can_import(fpath))
+            with self.assertRaises(ValueError):
+                importer(fpath)
+
+            # The data manager falls back on bfconvert.
+            data_manager = DataManager(backend, native_tiff=True)
+            with self.assertRaises(RuntimeError):
+                data_manager.load(fpath)
+            self.assertEqual(backend.entries(), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,37 @@
+"""Coroutines used by the asyncio tests.
+
+They are kept out of the test modules, which are imported by every
+supported Python version, as the syntax needs Python 3.5 or later.
+"""
+
+import asyncio
+
+
+def run(coroutine):
+    """Run a coroutine in a new event loop and return its result."""
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coroutine)
+    finally:
+        loop.close()
+
+
+async def aload_all(data_manager, fpaths):
+    """Load files concurrently and return their collections."""
+    return await asyncio.gather(*[data_manager.aload(fpath)
+                                  for fpath in fpaths])
+
+
+async def aload_and_cancel(data_manager, fpath, delay):
+    """Start loading a file and cancel the load after delay seconds.
+
+    :returns: True if the load was cancelled
+    """
+    task = asyncio.ensure_future(data_manager.aload(fpath))
+    await asyncio.sleep(delay)
+    task.cancel()
+    try:
+        await task
+    except asyncio.CancelledError:
+        return True
+    return False
@@ -0,0 +1,83 @@
+"""Fixtures for the tests using stand-ins for the bftools.
+
+The stand-ins in tests/data/fake_bftools take JSON input files describing
+the dimensions of the data, see tests/data/fake_bftools/bfconvert, and log
+their calls next to the input files.
+"""
+
+import unittest
+import os
+import os.path
+import sys
+import json
+import shutil
+import time
+
+try:
+    from mock import patch
+except ImportError:
+    from unittest.mock import patch
+
+HERE = os.path.dirname(__file__)
+FAKE_BFTOOLS_DIR = os.path.abspath(os.path.join(HERE, 'data',
+                                                'fake_bftools'))
+WORKER = os.path.join(FAKE_BFTOOLS_DIR, 'bfconvert-worker')
+TMP_DIR = os.path.join(HERE, 'tmp')
+
+
+def write_input(fname, **dims):
+    """Write an input file for the stand-ins and return its path."""
+    fpath = os.path.join(TMP_DIR, fname)
+    with open(fpath, 'w') as fh:
+        json.dump(dims, fh)
+    return fpath
+
+
+def lines(fname):
+    """Return the lines of a log written by the stand-ins."""
+    fpath = os.path.join(TMP_DIR, fname)
+    if not os.path.isfile(fpath):
+        return []
+    with open(fpath) as fh:
+        return fh.read().splitlines()
+
+
+def calls():
+    """Return the arguments of the bfconvert calls, one line per call."""
+    return lines('calls')
+
+
+def max_concurrent_calls():
+    """Return the largest number of bfconvert calls that ran at once."""
+    events = []
+    for line in lines('times'):
+        start, end = [float(t) for t in line.split()]
+        events.extend([(start, 1), (end, -1)])
+    running = most = 0
+    for _, change in sorted(events):
+        running += change
+        most = max(most, running)
+    return most
+
+
+def wait_for_calls(num_calls, timeout=10):
+    """Wait until bfconvert has been called num_calls times at least."""
+    deadline = time.time() + timeout
+    while len(calls()) < num_calls and time.time() < deadline:
+        time.sleep(0.05)
+
+
+@unittest.skipIf(sys.platform == 'win32', 'stand-ins are shell scripts')
+class FakeBFToolsTestCase(unittest.TestCase):
+    """Test case with the stand-ins first on the PATH."""
+
+    def setUp(self):
+        if not os.path.isdir(TMP_DIR):
+            os.mkdir(TMP_DIR)
+        path = FAKE_BFTOOLS_DIR + os.pathsep + os.environ.get('PATH', '')
+        self.path_patch = patch.dict(os.environ, {'PATH': path})
+        self.path_patch.start()
+
+    def tearDown(self):
+        self.path_patch.stop()
+        shutil.rmtree(TMP_DIR)
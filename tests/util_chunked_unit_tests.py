@@ -0,0 +1,116 @@
+"""Tests for the :mod:`jicbioimage.core.util.chunked` module."""
+
+import unittest
+import os
+import os.path
+import json
+import shutil
+
+import numpy as np
+
+try:
+    from mock import patch
+except ImportError:
+    from unittest.mock import patch
+
+HERE = os.path.dirname(__file__)
+TMP_DIR = os.path.join(HERE, 'tmp')
+
+
+class ChunkedArrayTests(unittest.TestCase):
+
+    def setUp(self):
+        if not os.path.isdir(TMP_DIR):
+            os.mkdir(TMP_DIR)
+        self.directory = os.path.join(TMP_DIR, 'S0.zarr')
+        self.expected = np.arange(2 * 3 * 5 * 37 * 29, dtype=np.uint16)
+        self.expected = self.expected.reshape((2, 3, 5, 37, 29))
+
+    def tearDown(self):
+        shutil.rmtree(TMP_DIR)
+
+    def test_header(self):
+        from jicbioimage.core.util.chunked import ChunkedArray
+        ChunkedArray.create(self.directory, (2, 3, 5, 37, 29),
+                            (1, 1, 10, 16, 16), 'uint16', compression='zlib')
+        with open(os.path.join(self.directory, '.zarray')) as fh:
+            header = json.load(fh)
+        self.assertEqual(header['zarr_format'], 2)
+        self.assertEqual(header['shape'], [2, 3, 5, 37, 29])
+        # Chunk dimensions are clipped to the array.
+        self.assertEqual(header['chunks'], [1, 1, 5, 16, 16])
+        self.assertEqual(header['dtype'], '<u2')
+        self.assertEqual(header['compressor'], dict(id='zlib', level=1))
+
+        ar = ChunkedArray(self.directory)
+        self.assertEqual(ar.shape, (2, 3, 5, 37, 29))
+        self.assertEqual(ar.chunks, (1, 1, 5, 16, 16))
+        self.assertEqual(ar.dtype, np.uint16)
+        self.assertEqual(ar.ndim, 5)
+        self.assertEqual(len(ar), 2)
+        self.assertEqual(ar.nbytes, self.expected.nbytes)
+
+        with self.assertRaises(ValueError):
+            ChunkedArray.create(self.directory, (2, 3), (1, 1), 'uint8',
+                                compression='lzw')
+        with self.assertRaises(ValueError):
+            ChunkedArray.create(self.directory, (2, 3), (1,), 'uint8')
+
+    def test_round_trip(self):
+        from jicbioimage.core.util.chunked import ChunkedArray
+        for compression in [None, 'zlib']:
+            directory = os.path.join(TMP_DIR, str(compression))
+            ar = ChunkedArray.create(directory, self.expected.shape,
+                                     (1, 2, 2, 16, 10), self.expected.dtype,
+                                     compression=compression)
+            ar[...] = self.expected
+            ar = ChunkedArray(directory)
+            self.assertTrue(np.array_equal(np.asarray(ar), self.expected))
+            for key in [(1, 2, 3),
+                        (0, slice(1, 3), Ellipsis, slice(5, 20)),
+                        (Ellipsis, slice(None, None, -3)),
+                        (slice(None, None, -1), 1, slice(0, 5, 2), -1),
+                        (slice(4, 2),)]:
+                self.assertTrue(np.array_equal(ar[key], self.expected[key]))
+
+    def test_unwritten_chunks_read_as_fill_value(self):
+        from jicbioimage.core.util.chunked import ChunkedArray
+        ar = ChunkedArray.create(self.directory, (4, 6), (2, 2), 'int32',
+                                 fill_value=-1)
+        ar[1, 1:5] = [1, 2, 3, 4]
+        expected = np.full((4, 6), -1, dtype=np.int32)
+        expected[1, 1:5] = [1, 2, 3, 4]
+        self.assertTrue(np.array_equal(ar[...], expected))
+        self.assertEqual(sorted(os.listdir(self.directory)),
+                         ['.zarray', '0.0', '0.1', '0.2'])
+
+        # Partly assigned chunks keep their other elements.
+        ar[0:2, 0] = 7
+        expected[0:2, 0] = 7
+        self.assertTrue(np.array_equal(ar[...], expected))
+
+        with self.assertRaises(IndexError):
+            ar[::2] = 0
+
+    def test_box_reads_only_touch_overlapping_chunks(self):
+        from jicbioimage.core.util.chunked import ChunkedArray
+        ar = ChunkedArray.create(self.directory, self.expected.shape,
+                                 (1, 1, 1, 16, 16), self.expected.dtype)
+        ar[...] = self.expected
+        self.assertEqual(ar.chunk_indices((1, 2, slice(1, 3), slice(10, 20),
+                                           slice(0, 10))),
+                         [(1, 2, 1, 0, 0), (1, 2, 1, 1, 0),
+                          (1, 2, 2, 0, 0), (1, 2, 2, 1, 0)])
+        with patch.object(ChunkedArray, 'read_chunk', autospec=True,
+                          side_effect=ChunkedArray.read_chunk) as read_chunk:
+            box = ar[1, 2, 1:3, 10:20, 0:10]
+        self.assertTrue(np.array_equal(box,
+                                       self.expected[1, 2, 1:3, 10:20, 0:10]))
+        self.assertEqual(sorted(call[0][1] for call in
+                                read_chunk.call_args_list),
+                         [(1, 2, 1, 0, 0), (1, 2, 1, 1, 0),
+                          (1, 2, 2, 0, 0), (1, 2, 2, 1, 0)])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,72 @@
+"""Tests for the :mod:`jicbioimage.core.util.ome` module."""
+
+import unittest
+
+OME = ('<?xml version="1.0" encoding="UTF-8"?>'
+       '<OME xmlns="http://www.openmicroscopy.org/Schemas/OME/2016-06" '
+       'UUID="urn:uuid:1234">{}</OME>')
+
+
+def _image(order, size_c, size_z, size_t, tiff_data=''):
+    return ('<Image ID="Image:0"><Pixels DimensionOrder="{}" SizeX="5" '
+            'SizeY="4" SizeC="{}" SizeZ="{}" SizeT="{}" Type="uint8">{}'
+            '</Pixels></Image>').format(order, size_c, size_z, size_t,
+                                        tiff_data)
+
+
+class PlaneIfdsTests(unittest.TestCase):
+
+    def test_is_ome_xml(self):
+        from jicbioimage.core.util.ome import is_ome_xml
+        self.assertTrue(is_ome_xml(OME.format('')))
+        self.assertFalse(is_ome_xml('ImageJ=1.11a\nimages=3\n'))
+        self.assertFalse(is_ome_xml(None))
+
+    def test_dimension_order(self):
+        from jicbioimage.core.util.ome import plane_ifds
+        xml = OME.format(_image('XYCZT', 2, 3, 1))
+        self.assertEqual(plane_ifds(xml, 6),
+                         [(0, 0, 0, 0, 0), (1, 0, 1, 0, 0), (2, 0, 0, 1, 0),
+                          (3, 0, 1, 1, 0), (4, 0, 0, 2, 0), (5, 0, 1, 2, 0)])
+        xml = OME.format(_image('XYTZC', 2, 1, 2))
+        self.assertEqual(plane_ifds(xml, 4),
+                         [(0, 0, 0, 0, 0), (1, 0, 0, 0, 1), (2, 0, 1, 0, 0),
+                          (3, 0, 1, 0, 1)])
+
+    def test_images_follow_each_other(self):
+        from jicbioimage.core.util.ome import plane_ifds
+        xml = OME.format(_image('XYZCT', 1, 2, 1) + _image('XYZCT', 1, 1, 1))
+        self.assertEqual(plane_ifds(xml, 3),
+                         [(0, 0, 0, 0, 0), (1, 0, 0, 1, 0), (2, 1, 0, 0, 0)])
+        with self.assertRaises(ValueError):
+            plane_ifds(xml, 2)
+
+    def test_tiff_data(self):
+        from jicbioimage.core.util.ome import plane_ifds
+        tiff_data = ('<TiffData IFD="4" FirstZ="1" PlaneCount="2"/>'
+                     '<TiffData IFD="0" FirstZ="0">'
+                     '<UUID FileName="a.ome.tif">urn:uuid:1234</UUID>'
+                     '</TiffData>')
+        xml = OME.format(_image('XYZCT', 1, 3, 1, tiff_data))
+        self.assertEqual(plane_ifds(xml, 6),
+                         [(0, 0, 0, 0, 0), (4, 0, 0, 1, 0), (5, 0, 0, 2, 0)])
+
+    def test_planes_in_other_files(self):
+        from jicbioimage.core.util.ome import plane_ifds
+        tiff_data = ('<TiffData IFD="0" PlaneCount="1">'
+                     '<UUID FileName="b.ome.tif">urn:uuid:5678</UUID>'
+                     '</TiffData>')
+        xml = OME.format(_image('XYZCT', 1, 1, 1, tiff_data))
+        with self.assertRaises(ValueError):
+            plane_ifds(xml, 1)
+
+    def test_malformed(self):
+        from jicbioimage.core.util.ome import plane_ifds
+        with self.assertRaises(ValueError):
+            plane_ifds('<OME><Image>', 1)
+        with self.assertRaises(ValueError):
+            plane_ifds(OME.format(_image('XYZCZ', 1, 1, 1)), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,60 @@
+"""Tests for the :mod:`jicbioimage.core.util.packed` module."""
+
+import unittest
+import os
+import os.path
+import pickle
+import shutil
+
+import numpy as np
+
+HERE = os.path.dirname(__file__)
+TMP_DIR = os.path.join(HERE, 'tmp')
+
+
+class PackedFileTests(unittest.TestCase):
+
+    def setUp(self):
+        if not os.path.isdir(TMP_DIR):
+            os.mkdir(TMP_DIR)
+        self.fpath = os.path.join(TMP_DIR, 'planes.bin')
+
+    def tearDown(self):
+        shutil.rmtree(TMP_DIR)
+
+    def test_round_trip(self):
+        from jicbioimage.core.util.packed import PackedFile, PackedWriter
+        images = [np.arange(15, dtype=np.uint8).reshape((3, 5)),
+                  np.arange(12, dtype='>u2').reshape((4, 3)),
+                  np.ones((2, 2, 3), dtype=np.float32)]
+        with PackedWriter(self.fpath) as writer:
+            offsets = [writer.add(ar) for ar in images]
+        self.assertEqual(offsets, [0, 64, 128])
+
+        packed_file = PackedFile(self.fpath)
+        for offset, ar in zip(offsets, images):
+            read = packed_file.read(offset, ar.shape, ar.dtype.str)
+            # Images are read in native byte order.
+            self.assertEqual(read.dtype, ar.dtype.newbyteorder('='))
+            self.assertTrue(np.array_equal(read, ar))
+        view = packed_file.view(offsets[0], (3, 5), np.uint8)
+        self.assertFalse(view.flags.writeable)
+        del view
+
+        # Pickled instances map the container again.
+        unpickled = pickle.loads(pickle.dumps(packed_file))
+        self.assertTrue(np.array_equal(unpickled.read(64, (4, 3), '>u2'),
+                                       images[1]))
+        packed_file.close()
+        unpickled.close()
+
+    def test_read_beyond_container(self):
+        from jicbioimage.core.util.packed import PackedFile, PackedWriter
+        with PackedWriter(self.fpath) as writer:
+            writer.add(np.zeros((4, 4), dtype=np.uint8))
+        with self.assertRaises(ValueError):
+            PackedFile(self.fpath).read(0, (4, 5), np.uint8)
+
+
+if __name__ == '__main__':
+    unittest.main()
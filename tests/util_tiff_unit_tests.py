@@ -0,0 +1,163 @@
+"""Tests for the :mod:`jicbioimage.core.util.tiff` module."""
+
+import unittest
+import os
+import os.path
+import shutil
+
+import numpy as np
+
+HERE = os.path.dirname(__file__)
+DATA_DIR = os.path.join(HERE, 'data')
+TMP_DIR = os.path.join(HERE, 'tmp')
+
+
+class ReadHeaderTests(unittest.TestCase):
+
+    def setUp(self):
+        if not os.path.isdir(TMP_DIR):
+            os.mkdir(TMP_DIR)
+
+    def tearDown(self):
+        shutil.rmtree(TMP_DIR)
+
+    def test_little_endian(self):
+        from jicbioimage.core.util.tiff import read_header
+        shape, dtype = read_header(os.path.join(DATA_DIR, 'white-16bit.tiff'))
+        self.assertEqual(shape, (50, 50))
+        self.assertEqual(dtype, np.uint16)
+        self.assertTrue(dtype.isnative)
+
+    def test_big_endian(self):
+        from jicbioimage.core.util.tiff import read_header
+        fpath = os.path.join(DATA_DIR, 'single-channel.ome.tif')
+        shape, dtype = read_header(fpath)
+        self.assertEqual(shape, (167, 439))
+        self.assertEqual(dtype, np.int8)
+
+    def test_read_ifds(self):
+        from jicbioimage.core.util.tiff import (
+            read_ifds,
+            IMAGE_WIDTH,
+            IMAGE_LENGTH,
+        )
+        ifds = read_ifds(os.path.join(DATA_DIR, 'multipage.tif'))
+        self.assertEqual(len(ifds), 3)
+        for ifd in ifds:
+            self.assertEqual(ifd[IMAGE_WIDTH], (50,))
+            self.assertEqual(ifd[IMAGE_LENGTH], (50,))
+        ifds = read_ifds(os.path.join(DATA_DIR, 'z-series.ome.tif'), limit=2)
+        self.assertEqual(len(ifds), 2)
+        self.assertTrue(ifds[0][270].startswith('<?xml'))
+
+    def test_read(self):
+        try:
+            import tifffile
+        except ImportError:
+            self.skipTest('tifffile is needed to read the expected pixels')
+        import numpy as np
+        import skimage.io
+        from jicbioimage.core.util.tiff import read
+        for fname in ['multipage.tif', 'white-16bit.tiff',
+                      'single-channel.ome.tif', 'z-series.ome.tif']:
+            fpath = os.path.join(DATA_DIR, fname)
+            ar = read(fpath)
+            expected = skimage.io.imread(fpath, plugin='tifffile', key=0)
+            self.assertEqual(ar.dtype, expected.dtype)
+            self.assertTrue(np.array_equal(ar, expected))
+        with self.assertRaises(ValueError):
+            read(os.path.join(DATA_DIR, 'tjelvar.png'))
+
+    def test_write(self):
+        import numpy as np
+        from jicbioimage.core.util.tiff import (
+            read,
+            read_ifds,
+            write,
+            COMPRESSION,
+            PREDICTOR,
+            IMAGE_DESCRIPTION,
+        )
+        fpath = os.path.join(TMP_DIR, 'written.tif')
+        random = np.random.RandomState(0)
+        for dtype in ['uint8', 'int8', 'uint16', 'int32', 'float32']:
+            # Tall enough to be written in several strips.
+            ar = (random.rand(600, 250) * 100).astype(dtype)
+            options = [(None, False), ('deflate', False)]
+            if dtype != 'float32':
+                options.append(('deflate', True))
+            for compression, predictor in options:
+                write(fpath, ar, compression, predictor, description='desc')
+                decoded = read(fpath)
+                self.assertEqual(decoded.dtype, ar.dtype)
+                self.assertTrue(np.array_equal(decoded, ar))
+                ifd = read_ifds(fpath)[0]
+                self.assertEqual(ifd[COMPRESSION],
+                                 (8 if compression else 1,))
+                self.assertEqual(ifd[PREDICTOR], (2 if predictor else 1,))
+                self.assertEqual(ifd[IMAGE_DESCRIPTION], 'desc')
+
+        rgb = (random.rand(20, 30, 3) * 255).astype('uint8')
+        write(fpath, rgb, 'deflate', True)
+        self.assertTrue(np.array_equal(read(fpath), rgb))
+
+        with self.assertRaises(ValueError):
+            write(fpath, ar, 'lzw')
+        with self.assertRaises(ValueError):
+            write(fpath, ar.astype('float32'), 'deflate', predictor=True)
+
+    def test_ifd_data_range(self):
+        import numpy as np
+        from jicbioimage.core.util.tiff import (
+            read_ifds,
+            read_byteorder,
+            ifd_data_range,
+            write,
+        )
+        fpath = os.path.join(DATA_DIR, 'z-series.ome.tif')
+        self.assertEqual(read_byteorder(fpath), '>')
+        for ifd in read_ifds(fpath):
+            offset, nbytes = ifd_data_range(ifd)
+            self.assertEqual(nbytes, 167 * 439)
+
+        fpath = os.path.join(TMP_DIR, 'written.tif')
+        ar = np.arange(600 * 25, dtype=np.uint16).reshape((600, 25))
+        write(fpath, ar)
+        self.assertEqual(read_byteorder(fpath), '<')
+        offset, nbytes = ifd_data_range(read_ifds(fpath)[0])
+        self.assertEqual(nbytes, ar.nbytes)
+        with open(fpath, 'rb') as fh:
+            fh.seek(offset)
+            data = np.frombuffer(fh.read(nbytes), dtype='<u2')
+        self.assertTrue(np.array_equal(data.reshape(ar.shape), ar))
+
+        write(fpath, ar, 'deflate')
+        self.assertEqual(ifd_data_range(read_ifds(fpath)[0]), None)
+
+    def test_imagej_metadata(self):
+        from jicbioimage.core.util.tiff import imagej_metadata
+        metadata = imagej_metadata('ImageJ=1.11a\nimages=12\nchannels=2\n'
+                                   'slices=3\nframes=2\nhyperstack=true\n')
+        self.assertEqual(metadata['images'], '12')
+        self.assertEqual(metadata['channels'], '2')
+        self.assertEqual(metadata['slices'], '3')
+        self.assertEqual(metadata['frames'], '2')
+        self.assertEqual(imagej_metadata('<?xml version="1.0"?><OME/>'), None)
+        self.assertEqual(imagej_metadata(None), None)
+
+    def test_not_a_tiff(self):
+        from jicbioimage.core.util.tiff import read_header
+        with self.assertRaises(ValueError):
+            read_header(os.path.join(DATA_DIR, 'tjelvar.png'))
+
+        fpath = os.path.join(TMP_DIR, 'truncated.tif')
+        with open(os.path.join(DATA_DIR, 'white-16bit.tiff'), 'rb') as fh:
+            data = fh.read()
+        with open(fpath, 'wb') as fh:
+            fh.write(data[:10])
+        with self.assertRaises(ValueError):
+            read_header(fpath)
+
+
+if __name__ == '__main__':
+    unittest.main()